@@ -0,0 +1,73 @@
+"""
+Measures how many answers ('c:' callbacks) per second the handler workers serve - with the previous
+'time.sleep(1)' before resuming the word sender, and with the resume scheduled on TimerService.
+Sending the feedback message is simulated by a 5ms sleep.
+
+Usage: python -m benchmarks.answer_throughput_benchmark
+"""
+import time
+import logging
+import threading
+
+from core.timer_service import TimerService
+from core.chat_dispatcher import ChatDispatcher
+
+NUM_OF_WORKERS = 8
+SEND_MESSAGE_DURATION = 0.005
+
+
+class Counter:
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def increment(self):
+        with self._lock:
+            self.value += 1
+
+
+def measure(handle_answer, num_of_answers: int, resumes: Counter) -> float:
+    chat_dispatcher = ChatDispatcher(max_workers=NUM_OF_WORKERS, max_queue_size=num_of_answers)
+    chat_dispatcher.start()
+
+    started_at = time.perf_counter()
+    for index in range(num_of_answers):
+        chat_dispatcher.submit(index, handle_answer)
+    chat_dispatcher.stop()
+    duration = time.perf_counter() - started_at
+
+    print(f"{handle_answer.__name__:<20} | {num_of_answers:>5} answers in {duration:6.3f}s | "
+          f"{num_of_answers / duration:8.1f} answers/s | senders resumed {resumes.value}")
+    return num_of_answers / duration
+
+
+def main():
+    logging.disable(logging.DEBUG)
+
+    resumes = Counter()
+
+    def sleeping_handler():
+        time.sleep(SEND_MESSAGE_DURATION)
+        time.sleep(1)
+        resumes.increment()
+
+    sleeping_throughput = measure(sleeping_handler, NUM_OF_WORKERS * 4, resumes)
+
+    resumes = Counter()
+    timer_service = TimerService()
+    timer_service.start()
+
+    def timer_handler():
+        time.sleep(SEND_MESSAGE_DURATION)
+        timer_service.call_later(1, resumes.increment)
+
+    timer_throughput = measure(timer_handler, 4000, resumes)
+    time.sleep(1.1)
+    print(f"senders resumed after the timers fired - {resumes.value} | timer metrics - {timer_service.metrics()}")
+    timer_service.stop()
+
+    print(f"x{timer_throughput / sleeping_throughput:.0f} answers/s")
+
+
+if __name__ == '__main__':
+    main()
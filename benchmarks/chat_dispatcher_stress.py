@@ -0,0 +1,110 @@
+"""
+Hammers a single chat from many threads - word sends mixed with a handler that deletes and re-adds words.
+First the threads call the user's methods directly (as the word sender threads and the polling thread did),
+then the same operations go through ChatDispatcher. The 'time.sleep(0)' calls stand for the Telegram and DB
+requests in the middle of the real operations, where the threads switch.
+Then shows that different chats still run in parallel on the dispatcher.
+
+Usage: python -m benchmarks.chat_dispatcher_stress
+"""
+import time
+import logging
+import threading
+
+from core.chat_dispatcher import ChatDispatcher
+from core.english_bot_user import EnglishBotUser
+
+NUM_OF_THREADS = 16
+OPERATIONS_PER_THREAD = 1000
+NUM_OF_WORDS = 4
+
+
+def create_user(chat_id: int) -> EnglishBotUser:
+    translations = [{'en_word': f'word{index}', 'translated_word': f'translation{index}'}
+                    for index in range(NUM_OF_WORDS)]
+    return EnglishBotUser(chat_id=chat_id, user_translations=translations)
+
+
+def send_word(user: EnglishBotUser, message_id: int):
+    # 'send_new_word' - choose a word, send it and count the usage
+    en_word = user.user_translations.choose()
+    time.sleep(0)
+    user.messages.append(message_id)
+    user.increase_word_usages(en_word)
+
+
+def replace_word(user: EnglishBotUser, message_id: int):
+    # 'delete_word' + 'add_new_word_to_db' of a word of the user
+    en_word = f'word{message_id % NUM_OF_WORDS}'
+    user.user_translations.remove(en_word)
+    time.sleep(0)
+    user.user_translations.add(en_word, [f'translation{en_word}'])
+
+
+def run_operation(user: EnglishBotUser, message_id: int):
+    operation = replace_word if message_id % 4 == 0 else send_word
+    operation(user, message_id)
+
+
+def hammer(submit) -> int:
+    """
+    :return: number of operations that raised
+    """
+    failures = []
+
+    def worker(thread_index: int):
+        for operation_index in range(OPERATIONS_PER_THREAD):
+            try:
+                submit(thread_index * OPERATIONS_PER_THREAD + operation_index)
+            except Exception as e:
+                failures.append(e)
+
+    threads = [threading.Thread(target=worker, args=(index,)) for index in range(NUM_OF_THREADS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    return len(failures)
+
+
+def report(title: str, user: EnglishBotUser, failures: int, duration: float):
+    sampler = user.user_translations._sampler
+    expected_weight = sum(sampler.get_weight(usages) for _, _, usages in user.user_translations.items())
+    is_consistent = (len(sampler) == len(user.user_translations) == NUM_OF_WORDS and
+                     abs(sampler._total_weight() - expected_weight) < 1e-6)
+    print(f"{title:<16} | {duration:6.3f}s | failed operations {failures:>5}/{NUM_OF_THREADS * OPERATIONS_PER_THREAD}"
+          f" | messages tracked {len(user.messages)} | words and sampler consistent - {is_consistent}")
+
+
+def main():
+    logging.disable(logging.DEBUG)
+
+    user = create_user(chat_id=1)
+    started_at = time.perf_counter()
+    failures = hammer(lambda message_id: run_operation(user, message_id))
+    report("direct calls", user, failures, time.perf_counter() - started_at)
+
+    user = create_user(chat_id=2)
+    chat_dispatcher = ChatDispatcher(max_workers=8, max_queue_size=NUM_OF_THREADS * OPERATIONS_PER_THREAD)
+    chat_dispatcher.start()
+    started_at = time.perf_counter()
+    hammer(lambda message_id: chat_dispatcher.submit(user.chat_id, run_operation, user, message_id))
+    chat_dispatcher.stop()
+    report("chat dispatcher", user, chat_dispatcher.metrics()['failed'], time.perf_counter() - started_at)
+
+    # tasks that wait on I/O (like the Telegram requests) - one chat runs them in order, many chats in parallel
+    for num_of_chats in (1, 8):
+        chat_dispatcher = ChatDispatcher(max_workers=8)
+        chat_dispatcher.start()
+        started_at = time.perf_counter()
+        for index in range(200):
+            chat_dispatcher.submit(index % num_of_chats, time.sleep, 0.005)
+        chat_dispatcher.stop()
+        metrics = chat_dispatcher.metrics()
+        print(f"200 x 5ms tasks on {num_of_chats} chat(s) | {time.perf_counter() - started_at:6.3f}s | "
+              f"max queue latency {metrics['max_queue_latency']:.3f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+"""
+Compares executing the bot's hot queries as interpolated SQL text (parsed by the server on every execution)
+with bound parameters over a prepared statement that is reused, directly and through the pooled DBWrapper
+(which builds a new command string on every call, as the bot does).
+Needs a MySQL server with the bot's schema: MYSQL_HOST, MYSQL_USER, MYSQL_PASS (and optionally MYSQL_DATABASE).
+
+Usage: python -m benchmarks.db_statements_benchmark
+"""
+import os
+import time
+
+from mysql.connector import connect as MySQLConnection
+
+from wrappers.db_wrapper import DBWrapper
+
+
+def time_interpolated(connection, repeats: int, chat_id: int) -> float:
+    cursor = connection.cursor(buffered=True)
+    started_at = time.perf_counter()
+    for _ in range(repeats):
+        cursor.execute(f"SELECT * FROM translations WHERE chat_id='{chat_id}'")
+        cursor.fetchall()
+    elapsed = time.perf_counter() - started_at
+    cursor.close()
+    return elapsed
+
+
+def time_prepared(connection, repeats: int, chat_id: int) -> float:
+    cursor = connection.cursor(prepared=True)
+    started_at = time.perf_counter()
+    for _ in range(repeats):
+        cursor.execute("SELECT * FROM translations WHERE chat_id = %s", (chat_id,))
+        cursor.fetchall()
+    elapsed = time.perf_counter() - started_at
+    cursor.close()
+    return elapsed
+
+
+def time_db_wrapper(db: DBWrapper, repeats: int, chat_id: int) -> float:
+    started_at = time.perf_counter()
+    for _ in range(repeats):
+        db.get_rows_by_field('translations', 'chat_id', chat_id)
+    return time.perf_counter() - started_at
+
+
+def time_inserts(connection, rows: list, batched: bool) -> float:
+    cursor = connection.cursor()
+    started_at = time.perf_counter()
+    if batched:
+        cursor.executemany("INSERT INTO translations (en_word, translated_word, chat_id) VALUES (%s, %s, %s)", rows)
+    else:
+        for row in rows:
+            cursor.execute(f"INSERT INTO translations (en_word, translated_word, chat_id) VALUES{tuple(row)}")
+    elapsed = time.perf_counter() - started_at
+    connection.rollback()
+    cursor.close()
+    return elapsed
+
+
+def main(repeats: int = 1000, chat_id: int = 0):
+    connection = MySQLConnection(user=os.environ["MYSQL_USER"], password=os.environ["MYSQL_PASS"],
+                                 host=os.environ["MYSQL_HOST"], database=os.environ.get("MYSQL_DATABASE", "english_bot"),
+                                 auth_plugin='mysql_native_password', autocommit=False)
+
+    interpolated_time = time_interpolated(connection, repeats, chat_id)
+    prepared_time = time_prepared(connection, repeats, chat_id)
+    db = DBWrapper(host=os.environ["MYSQL_HOST"], mysql_user=os.environ["MYSQL_USER"],
+                   mysql_pass=os.environ["MYSQL_PASS"], database=os.environ.get("MYSQL_DATABASE", "english_bot"),
+                   pool_size=1)
+    db_wrapper_time = time_db_wrapper(db, repeats, chat_id)
+    db.close()
+    print(f"select | interpolated - {interpolated_time / repeats * 1e6:8.1f}us | "
+          f"prepared - {prepared_time / repeats * 1e6:8.1f}us | "
+          f"db wrapper - {db_wrapper_time / repeats * 1e6:8.1f}us")
+
+    rows = [(f'benchmark{index}', f'translation{index}', chat_id) for index in range(repeats)]
+    single_time = time_inserts(connection, rows, batched=False)
+    batched_time = time_inserts(connection, rows, batched=True)
+    print(f"insert {repeats} rows | one by one - {single_time * 1e3:8.1f}ms | executemany - {batched_time * 1e3:8.1f}ms")
+
+    connection.close()
+
+
+if __name__ == '__main__':
+    main()
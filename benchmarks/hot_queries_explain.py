@@ -0,0 +1,163 @@
+"""
+Checks that the bot's hot queries are served by indexes of the migrated schema - EXPLAIN QUERY PLAN on a new
+SQLite database, on a SQLite database that was created before the migrations were versioned (only the legacy
+schema of the first migration) and, when MYSQL_HOST, MYSQL_USER and MYSQL_PASS are set, EXPLAIN on the MySQL
+database. The queries are built by the storage operations themselves, with the arguments EnglishBotUser passes
+them. Exits with an error if a query scans its whole table, or if the migrated legacy database misses a part of
+the schema the bot uses.
+
+Usage: python -m benchmarks.hot_queries_explain
+"""
+import os
+import sys
+import logging
+import tempfile
+
+from wrappers.sqlite_wrapper import SQLiteWrapper
+
+CHAT_ID = 1
+
+
+def record_hot_queries(storage) -> list:
+    """
+    :return: list of (title, command, params) of the hot queries, as the storage builds them
+    """
+    hot_queries = []
+    operations = [
+        ('load the words of a chat', lambda: storage.get_rows_by_field(table_name='translations',
+                                                                      condition_field='chat_id',
+                                                                      condition_value=CHAT_ID)),
+        ('load the usages of a chat', lambda: storage.get_rows_by_field(table_name='usages',
+                                                                       condition_field='chat_id',
+                                                                       condition_value=CHAT_ID)),
+        ('delete a word', lambda: storage.delete_by_field(table_name='translations', field_condition='en_word',
+                                                          value_condition='word', second_field_condition='chat_id',
+                                                          second_value_condition=CHAT_ID)),
+        ('delete the usages of a word', lambda: storage.delete_by_field(table_name='usages', field_condition='en_word',
+                                                                        value_condition='word',
+                                                                        second_field_condition='chat_id',
+                                                                        second_value_condition=CHAT_ID)),
+        ('update a user', lambda: storage.update_field(table_name='users', field='delay_time', value=20,
+                                                       condition_field='chat_id', condition_value=CHAT_ID)),
+    ]
+
+    for title, operation in operations:
+        storage.execute_command = lambda command, params=None, many=False, prepare=True: \
+            hot_queries.append((title, command, params))
+        operation()
+    # back to the execute_command of the class
+    del storage.execute_command
+
+    return hot_queries
+
+
+def explain_sqlite(storage, command: str, params) -> tuple:
+    plan = storage.execute_command(f"EXPLAIN QUERY PLAN {command}", params)
+    details = [row['detail'] for row in plan]
+    uses_index = not any(detail.startswith('SCAN') for detail in details)
+    return uses_index, '; '.join(details)
+
+
+def explain_mysql(storage, command: str, params) -> tuple:
+    plan = storage.execute_command(f"EXPLAIN {command}", params)
+    uses_index = all(row['type'] != 'ALL' and row['key'] for row in plan)
+    return uses_index, '; '.join(f"{row['table']} - type {row['type']}, key {row['key']}" for row in plan)
+
+
+def check(title: str, storage, explain) -> bool:
+    all_use_indexes = True
+    for query_title, command, params in record_hot_queries(storage):
+        uses_index, plan = explain(storage, command, params)
+        all_use_indexes &= uses_index
+        print(f"{title:<7} | {'ok  ' if uses_index else 'SCAN'} | {query_title:<28} | {plan}")
+
+    return all_use_indexes
+
+
+def create_legacy_database(storage):
+    """
+    Creates the schema of a database from before the migrations were versioned, which 'apply_migrations' marks
+    as migrated to the first version without running it.
+    """
+    _, _, legacy_statements = storage.get_migrations()[0]
+    for statement in legacy_statements:
+        assert storage.execute_command(statement), f"Couldn't create the legacy schema - {statement}"
+
+
+def check_legacy_upgrade(storage) -> bool:
+    """
+    Runs the statements the bot runs on the parts of the schema that were added after the legacy one - the
+    users' languages and the upsert of the buffered usages.
+    """
+    operations = [
+        ('insert a user with a language', lambda: storage.insert_row(table_name='users',
+                                                                     keys_values={'chat_id': CHAT_ID,
+                                                                                  'language': 'he'})),
+        ('read the users metadata', lambda: list(storage.stream_all_values(
+            table_name='users_extended', fields=['chat_id', 'auto_send_active', 'delay_time', 'language']))),
+        ('upsert the usages', lambda: storage.upsert_multiple_rows(
+            table_name='usages', keys_values=[{'chat_id': CHAT_ID, 'en_word': 'word', 'usages': 1}],
+            update_fields=['usages'])),
+    ]
+
+    all_succeeded = True
+    for title, operation in operations:
+        try:
+            succeeded = operation() is not False
+        except Exception:
+            succeeded = False
+        all_succeeded &= succeeded
+        print(f"{'legacy':<7} | {'ok  ' if succeeded else 'FAIL'} | {title}")
+
+    # a repeated upsert of the same word updates its row
+    usages = storage.get_rows_by_field(table_name='usages', condition_field='chat_id', condition_value=CHAT_ID)
+    storage.upsert_multiple_rows(table_name='usages', keys_values=[{'chat_id': CHAT_ID, 'en_word': 'word',
+                                                                    'usages': 2}], update_fields=['usages'])
+    upserted_usages = storage.get_rows_by_field(table_name='usages', condition_field='chat_id',
+                                                condition_value=CHAT_ID)
+    is_unique = len(usages or []) == len(upserted_usages or []) == 1
+    print(f"{'legacy':<7} | {'ok  ' if is_unique else 'FAIL'} | upsert the usages of the same word again")
+
+    return all_succeeded and is_unique
+
+
+def main():
+    logging.disable(logging.WARNING)
+
+    storage = SQLiteWrapper(path=os.path.join(tempfile.mkdtemp(), 'english_bot.sqlite3'))
+    try:
+        assert storage.apply_migrations(), "Couldn't migrate the SQLite database"
+        all_use_indexes = check("sqlite", storage, explain_sqlite)
+    finally:
+        storage.close()
+
+    storage = SQLiteWrapper(path=os.path.join(tempfile.mkdtemp(), 'english_bot.sqlite3'))
+    try:
+        create_legacy_database(storage)
+        assert storage.apply_migrations(), "Couldn't migrate the legacy SQLite database"
+        all_use_indexes &= check("legacy", storage, explain_sqlite)
+        is_legacy_upgraded = check_legacy_upgrade(storage)
+    finally:
+        storage.close()
+
+    if all(variable in os.environ for variable in ("MYSQL_HOST", "MYSQL_USER", "MYSQL_PASS")):
+        from wrappers.db_wrapper import DBWrapper
+        storage = DBWrapper(host=os.environ["MYSQL_HOST"], mysql_user=os.environ["MYSQL_USER"],
+                            mysql_pass=os.environ["MYSQL_PASS"],
+                            database=os.environ.get("MYSQL_DATABASE", "english_bot"), pool_size=1)
+        try:
+            assert storage.apply_migrations(), "Couldn't migrate the MySQL database"
+            all_use_indexes &= check("mysql", storage, explain_mysql)
+        finally:
+            storage.close()
+    else:
+        print("mysql   | skipped - set MYSQL_HOST, MYSQL_USER and MYSQL_PASS to check")
+
+    if not all_use_indexes:
+        sys.exit("Some of the hot queries scan their whole table")
+    if not is_legacy_upgraded:
+        sys.exit("The migrations don't bring a legacy database to the schema the bot uses")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,46 @@
+"""
+Measures the cost per call that the metrics add to an instrumented function - disabled (no METRICS_PORT, the
+function is left as is) and enabled (a histogram observation per call) - and the cost of rendering the endpoint.
+
+Usage: python -m benchmarks.metrics_overhead_benchmark [num_of_calls]
+"""
+import sys
+import time
+import logging
+
+from helpers import metrics
+
+
+def hot_path(chat_id):
+    return chat_id
+
+
+def time_calls(function, num_of_calls: int) -> float:
+    started_at = time.perf_counter()
+    for chat_id in range(num_of_calls):
+        function(chat_id)
+    return (time.perf_counter() - started_at) / num_of_calls
+
+
+def main():
+    logging.disable(logging.WARNING)
+    num_of_calls = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+
+    disabled = metrics.timed('benchmark_disabled', 'Disabled', enabled=False)(hot_path)
+    enabled = metrics.timed('benchmark_enabled', 'Enabled', enabled=True)(hot_path)
+
+    plain_time = time_calls(hot_path, num_of_calls)
+    disabled_time = time_calls(disabled, num_of_calls)
+    enabled_time = time_calls(enabled, num_of_calls)
+    print(f"plain    | {plain_time * 1e9:7.1f}ns per call")
+    print(f"disabled | {disabled_time * 1e9:7.1f}ns per call (+{(disabled_time - plain_time) * 1e9:6.1f}ns, "
+          f"the same function - {disabled is hot_path})")
+    print(f"enabled  | {enabled_time * 1e9:7.1f}ns per call (+{(enabled_time - plain_time) * 1e9:6.1f}ns)")
+
+    started_at = time.perf_counter()
+    body = metrics.registry.render()
+    print(f"render   | {(time.perf_counter() - started_at) * 1e3:.2f}ms for {body.count(chr(10))} lines")
+
+
+if __name__ == '__main__':
+    main()
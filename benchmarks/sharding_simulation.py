@@ -0,0 +1,187 @@
+"""
+Runs the sharded deployment locally - a ShardCoordinator with stand-in worker processes, each one a real
+WebhookServer + ChatDispatcher + ShardMembership whose bot only records the updates it processes into a shared
+SQLite file (standing in for the MySQL server of the bot). The coordinator routes fake updates of many chats
+while workers join, crash and are restarted, and the script checks that:
+- every update is processed exactly once, by the worker that owns its chat at that time
+- the workers' views of the ring partition the chats (each chat is scheduled by exactly one worker)
+- a join / leave only moves about 1/N of the chats
+
+Usage: python -m benchmarks.sharding_simulation
+"""
+import os
+import sys
+import json
+import time
+import signal
+import sqlite3
+import logging
+import tempfile
+import threading
+
+from core.sharding import ShardCoordinator, ShardMembership, HashRing
+from core.chat_dispatcher import ChatDispatcher
+from core.webhook_server import WebhookServer
+from core._base_telebot_extension import BaseTelebotExtension
+
+NUM_OF_WORKERS = 3
+NUM_OF_CHATS = 500
+UPDATES_PER_PHASE = 3000
+BASE_PORT = 18444
+
+
+def connect(db_path: str) -> sqlite3.Connection:
+    connection = sqlite3.connect(db_path, timeout=30, isolation_level=None, check_same_thread=False)
+    connection.execute("PRAGMA journal_mode=WAL")
+    return connection
+
+
+class RecordingBot:
+    def __init__(self, shard_id: int, membership: ShardMembership, db_path: str):
+        self.shard_id = shard_id
+        self.membership = membership
+        self.connection = connect(db_path)
+        self._lock = threading.Lock()
+
+    get_update_chat_id = staticmethod(BaseTelebotExtension.get_update_chat_id)
+
+    def process_update(self, update):
+        chat_id = self.get_update_chat_id(update)
+        with self._lock:
+            self.connection.execute("INSERT INTO processed VALUES (?, ?, ?, ?)",
+                                    (update.update_id, chat_id, self.shard_id, int(self.membership.owns(chat_id))))
+
+    def record_owned_chats(self):
+        # the chats whose words this worker would send
+        members = ','.join(map(str, self.membership.ring.members))
+        with self._lock:
+            self.connection.executemany("INSERT INTO owned VALUES (?, ?, ?)",
+                                        [(self.shard_id, members, chat_id) for chat_id in range(NUM_OF_CHATS)
+                                         if self.membership.owns(chat_id)])
+
+
+def run_worker(shard_id: int, members: list, db_path: str):
+    membership = ShardMembership(shard_id, members)
+    bot = RecordingBot(shard_id, membership, db_path)
+    membership.on_change = bot.record_owned_chats
+    bot.record_owned_chats()
+
+    dispatcher = ChatDispatcher(max_workers=4)
+    dispatcher.start()
+    webhook_server = WebhookServer(bot, dispatcher, host=os.environ['WEBHOOK_HOST'],
+                                   port=int(os.environ['WEBHOOK_PORT']), url_path=os.environ['WEBHOOK_PATH'],
+                                   secret_token=os.environ['WEBHOOK_SECRET'], membership=membership)
+    try:
+        webhook_server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        webhook_server.stop()
+        dispatcher.stop()
+
+
+def create_update(update_id: int) -> dict:
+    chat_id = update_id % NUM_OF_CHATS
+    return {'update_id': update_id, 'message': {'message_id': update_id, 'date': 0, 'text': '/menu',
+                                                'chat': {'id': chat_id, 'type': 'private'}}}
+
+
+def wait_until_processed(connection: sqlite3.Connection, num_of_updates: int, timeout: float = 30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if connection.execute("SELECT COUNT(*) FROM processed").fetchone()[0] >= num_of_updates:
+            return
+        time.sleep(0.1)
+
+
+def run_phase(title: str, coordinator: ShardCoordinator, connection: sqlite3.Connection, first_update_id: int,
+              previous_owners: dict) -> dict:
+    started_at = time.perf_counter()
+    for update_id in range(first_update_id, first_update_id + UPDATES_PER_PHASE):
+        coordinator.route_update(create_update(update_id))
+    routed_at = time.perf_counter()
+    wait_until_processed(connection, first_update_id + UPDATES_PER_PHASE)
+
+    rows = connection.execute("SELECT update_id, chat_id, shard_id, owned FROM processed WHERE update_id >= ?",
+                              (first_update_id,)).fetchall()
+    update_ids = [row[0] for row in rows]
+    owners = {chat_id: coordinator.get_owner(chat_id) for chat_id in range(NUM_OF_CHATS)}
+    moved = sum(owners[chat_id] != previous_owners[chat_id] for chat_id in owners) if previous_owners else 0
+    per_shard = {}
+    for row in rows:
+        per_shard[row[2]] = per_shard.get(row[2], 0) + 1
+
+    print(f"{title:<22} | members {coordinator.metrics()['members']} | "
+          f"{UPDATES_PER_PHASE / (routed_at - started_at):7.0f} updates/s routed | "
+          f"processed {len(rows)}/{UPDATES_PER_PHASE}, duplicates {len(update_ids) - len(set(update_ids))}, "
+          f"by a non-owner {sum(1 for row in rows if not row[3])} | "
+          f"chats moved {moved}/{NUM_OF_CHATS} | per shard {dict(sorted(per_shard.items()))}")
+    return owners
+
+
+def check_partition(connection: sqlite3.Connection, members: list):
+    members_key = ','.join(map(str, members))
+    rows = connection.execute("SELECT chat_id, COUNT(*) FROM owned WHERE members = ? GROUP BY chat_id",
+                              (members_key,)).fetchall()
+    print(f"scheduling partition of {members} | chats owned {len(rows)}/{NUM_OF_CHATS}, "
+          f"by more than one worker {sum(1 for _, count in rows if count > 1)}")
+
+
+def wait_for_members(coordinator: ShardCoordinator, members: list, timeout: float = 30):
+    deadline = time.monotonic() + timeout
+    while coordinator.metrics()['members'] != members and time.monotonic() < deadline:
+        time.sleep(0.1)
+
+
+def main():
+    logging.disable(logging.INFO)
+
+    db_path = os.path.join(tempfile.mkdtemp(), 'stand_in.sqlite3')
+    connection = connect(db_path)
+    connection.execute("CREATE TABLE processed (update_id INTEGER, chat_id INTEGER, shard_id INTEGER, owned INTEGER)")
+    connection.execute("CREATE TABLE owned (shard_id INTEGER, members TEXT, chat_id INTEGER)")
+
+    coordinator = ShardCoordinator(
+        worker_command=lambda shard_id, members: [sys.executable, '-m', 'benchmarks.sharding_simulation', '--worker',
+                                                  str(shard_id), json.dumps(members), db_path],
+        num_of_workers=NUM_OF_WORKERS, base_port=BASE_PORT, restart_delay=8)
+    try:
+        coordinator.start()
+        owners = run_phase(f"{NUM_OF_WORKERS} workers", coordinator, connection, 0, {})
+        check_partition(connection, list(range(NUM_OF_WORKERS)))
+
+        coordinator.add_worker()
+        owners = run_phase("a worker joined", coordinator, connection, UPDATES_PER_PHASE, owners)
+        check_partition(connection, list(range(NUM_OF_WORKERS + 1)))
+
+        # a crash - the coordinator notices, moves the chats and starts the worker again
+        os.kill(coordinator._workers[1].process.pid, signal.SIGKILL)
+        wait_for_members(coordinator, [0, 2, 3])
+        owners = run_phase("a worker crashed", coordinator, connection, UPDATES_PER_PHASE * 2, owners)
+        check_partition(connection, [0, 2, 3])
+
+        wait_for_members(coordinator, [0, 1, 2, 3])
+        run_phase("the worker restarted", coordinator, connection, UPDATES_PER_PHASE * 3, owners)
+        print(f"coordinator metrics - {coordinator.metrics()}")
+    finally:
+        coordinator.stop()
+
+    expected_move = NUM_OF_CHATS / (NUM_OF_WORKERS + 1)
+    print(f"a join / leave of one of {NUM_OF_WORKERS + 1} workers should move about {expected_move:.0f} chats "
+          f"(a modulo partition would move about {NUM_OF_CHATS * NUM_OF_WORKERS / (NUM_OF_WORKERS + 1):.0f})")
+
+    # hash ring balance with more chats
+    ring = HashRing(range(NUM_OF_WORKERS + 1))
+    counts = {}
+    for chat_id in range(100000):
+        owner = ring.get_owner(chat_id)
+        counts[owner] = counts.get(owner, 0) + 1
+    print(f"100000 chats over {NUM_OF_WORKERS + 1} workers - {dict(sorted(counts.items()))}")
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] == '--worker':
+        logging.disable(logging.WARNING)
+        run_worker(int(sys.argv[2]), json.loads(sys.argv[3]), sys.argv[4])
+    else:
+        main()
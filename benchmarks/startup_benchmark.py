@@ -0,0 +1,37 @@
+"""
+Measures the configuration and logging setup cost that every module pays at import time.
+
+Usage: python -m benchmarks.startup_benchmark
+"""
+import time
+
+
+def main(num_of_modules: int = 25):
+    started_at = time.perf_counter()
+    from helpers.loggers import get_logger
+    from helpers.multiple_languages import load_dictionary
+    imported_at = time.perf_counter()
+
+    get_logger('benchmark')
+    first_logger_at = time.perf_counter()
+
+    for index in range(num_of_modules):
+        get_logger(f'benchmark-{index}')
+    loggers_at = time.perf_counter()
+
+    load_dictionary('he')
+    first_dictionary_at = time.perf_counter()
+
+    for _ in range(num_of_modules):
+        load_dictionary('he')
+    dictionaries_at = time.perf_counter()
+
+    print(f"imports - {(imported_at - started_at) * 1e3:.2f}ms")
+    print(f"first get_logger - {(first_logger_at - imported_at) * 1e3:.2f}ms, "
+          f"next {num_of_modules} - {(loggers_at - first_logger_at) * 1e3:.2f}ms")
+    print(f"first load_dictionary - {(first_dictionary_at - loggers_at) * 1e3:.2f}ms, "
+          f"next {num_of_modules} - {(dictionaries_at - first_dictionary_at) * 1e3:.2f}ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+"""
+Measures the latency of every storage operation the bot uses (as EnglishBotUser and UsagesBuffer call them),
+on the embedded SQLite backend and - when MYSQL_HOST, MYSQL_USER and MYSQL_PASS are set - on the MySQL backend
+with its connection pool. The MySQL database needs the bot's schema, the benchmark chats are deleted at the end.
+
+Usage: python -m benchmarks.storage_latency_benchmark [num_of_chats]
+"""
+import os
+import sys
+import time
+import logging
+import tempfile
+import statistics
+
+from wrappers.sqlite_wrapper import SQLiteWrapper
+
+WORDS_PER_CHAT = 10
+FIRST_CHAT_ID = 10 ** 12
+
+
+def create_operations(chat_id: int) -> list:
+    translations = [{'en_word': f'word{index}', 'translated_word': f'translation{index}', 'chat_id': chat_id}
+                    for index in range(WORDS_PER_CHAT)]
+    usages = [{'chat_id': chat_id, 'en_word': f'word{index}', 'usages': index} for index in range(WORDS_PER_CHAT)]
+
+    return [
+        ('new user', lambda storage: storage.insert_row(table_name='users',
+                                                        keys_values={'chat_id': chat_id, 'language': 'he'})),
+        ('add words', lambda storage: storage.insert_multiple_rows(table_name='translations',
+                                                                   keys_values=translations)),
+        ('load user', lambda storage: storage.get_rows_by_field(table_name='translations', condition_field='chat_id',
+                                                                condition_value=chat_id)),
+        ('update user', lambda storage: storage.update_field(table_name='users', field='auto_send_active',
+                                                             value='True', condition_field='chat_id',
+                                                             condition_value=chat_id)),
+        ('flush usages', lambda storage: storage.upsert_multiple_rows(table_name='usages', keys_values=usages,
+                                                                      update_fields=['usages'])),
+        ('delete word', lambda storage: storage.delete_by_field(table_name='translations', field_condition='en_word',
+                                                                value_condition='word0',
+                                                                second_field_condition='chat_id',
+                                                                second_value_condition=chat_id)),
+    ]
+
+
+def measure(title: str, storage, num_of_chats: int):
+    latencies = {}
+    for chat_id in range(FIRST_CHAT_ID, FIRST_CHAT_ID + num_of_chats):
+        for name, operation in create_operations(chat_id):
+            started_at = time.perf_counter()
+            if operation(storage) is False:
+                raise RuntimeError(f"'{name}' failed on {title}")
+            latencies.setdefault(name, []).append(time.perf_counter() - started_at)
+
+    started_at = time.perf_counter()
+    storage.get_all_values_by_field(table_name='users_extended')
+    startup_latency = time.perf_counter() - started_at
+
+    for name, samples in latencies.items():
+        samples.sort()
+        print(f"{title:<7} | {name:<13} | avg {statistics.mean(samples) * 1e6:8.1f}us | "
+              f"p50 {samples[len(samples) // 2] * 1e6:8.1f}us | p99 {samples[int(len(samples) * 0.99)] * 1e6:8.1f}us")
+    print(f"{title:<7} | {'read users':<13} | {startup_latency * 1e3:8.1f}ms")
+
+
+def cleanup(storage):
+    for table_name in ('usages', 'translations', 'users'):
+        storage.execute_command(f"DELETE FROM {table_name} WHERE chat_id >= {storage.PLACEHOLDER}", (FIRST_CHAT_ID,))
+
+
+def main():
+    logging.disable(logging.ERROR)
+    num_of_chats = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+
+    storage = SQLiteWrapper(path=os.path.join(tempfile.mkdtemp(), 'english_bot.sqlite3'))
+    storage.apply_migrations()
+    try:
+        measure("sqlite", storage, num_of_chats)
+    finally:
+        storage.close()
+
+    if not all(variable in os.environ for variable in ("MYSQL_HOST", "MYSQL_USER", "MYSQL_PASS")):
+        print("mysql   | skipped - set MYSQL_HOST, MYSQL_USER and MYSQL_PASS to compare")
+        return
+
+    from wrappers.db_wrapper import DBWrapper
+    storage = DBWrapper(host=os.environ["MYSQL_HOST"], mysql_user=os.environ["MYSQL_USER"],
+                        mysql_pass=os.environ["MYSQL_PASS"],
+                        database=os.environ.get("MYSQL_DATABASE", "english_bot"), pool_size=5)
+    try:
+        measure("mysql", storage, num_of_chats)
+    finally:
+        cleanup(storage)
+        storage.close()
+
+
+if __name__ == '__main__':
+    main()
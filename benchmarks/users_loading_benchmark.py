@@ -0,0 +1,94 @@
+"""
+Measures the startup load of all the users from an SQLite database of synthetic users - the previous load, which
+fetched the users, translations and usages tables into lists of dicts before building the users, and the streaming
+load of EnglishBotUser, which builds the users while both tables are read in batches. The peak memory above the
+memory of the built users is the cost of holding the query results.
+
+Usage: python -m benchmarks.users_loading_benchmark [num_of_users] [words_per_user]
+"""
+import os
+import sys
+import time
+import random
+import logging
+import tempfile
+import tracemalloc
+from itertools import groupby
+from operator import itemgetter
+
+from core import user_translations
+from core.english_bot_user import EnglishBotUser
+from wrappers.sqlite_wrapper import SQLiteWrapper
+
+
+def create_database(num_of_users: int, words_per_user: int) -> SQLiteWrapper:
+    storage = SQLiteWrapper(path=os.path.join(tempfile.mkdtemp(), 'english_bot.sqlite3'))
+    storage.apply_migrations()
+
+    random.seed(0)
+    for first_chat_id in range(0, num_of_users, 1000):
+        chat_ids = range(first_chat_id, min(first_chat_id + 1000, num_of_users))
+        storage.insert_multiple_rows('users', [{'chat_id': chat_id, 'language': 'he'} for chat_id in chat_ids])
+        words = {chat_id: random.sample(range(5000), words_per_user) for chat_id in chat_ids}
+        storage.insert_multiple_rows('translations', [
+            {'chat_id': chat_id, 'en_word': f'word{index}', 'translated_word': f'translation{index}'}
+            for chat_id in chat_ids for index in words[chat_id]])
+        storage.insert_multiple_rows('usages', [
+            {'chat_id': chat_id, 'en_word': f'word{index}', 'usages': random.randint(0, 300)}
+            for chat_id in chat_ids for index in words[chat_id]])
+
+    return storage
+
+
+def load_buffered(storage):
+    fetched_users = storage.get_all_values_by_field(table_name='users_extended') or []
+    fetched_translations = storage.get_all_values_by_field(table_name='translations', order_by_field='chat_id') or []
+    fetched_usages = storage.get_all_values_by_field(table_name='usages', order_by_field='chat_id') or []
+
+    translations_by_chat_id = {chat_id: list(rows) for chat_id, rows in groupby(fetched_translations,
+                                                                                key=itemgetter('chat_id'))}
+    usages_by_chat_id = {chat_id: list(rows) for chat_id, rows in groupby(fetched_usages, key=itemgetter('chat_id'))}
+    for user in fetched_users:
+        EnglishBotUser(chat_id=user['chat_id'], word_sender_active=eval(user['auto_send_active']),
+                       delay_time=user['delay_time'], language=user['language'],
+                       user_translations=translations_by_chat_id.get(user['chat_id']),
+                       user_usages=usages_by_chat_id.get(user['chat_id']))
+
+
+def load_streaming(storage):
+    EnglishBotUser.load_users_and_global_instances(None, storage, None, None)
+
+
+def measure(title: str, load, storage):
+    EnglishBotUser.active_users = {}
+    # so the shared translations of the previous load aren't counted out
+    user_translations._shared_translations.clear()
+
+    tracemalloc.start()
+    started_at = time.perf_counter()
+    load(storage)
+    duration = time.perf_counter() - started_at
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    print(f"{title:<9} | {len(EnglishBotUser.active_users)} users loaded in {duration:.2f}s | "
+          f"users {current / 2 ** 20:7.1f}MB | peak {peak / 2 ** 20:7.1f}MB "
+          f"(+{(peak - current) / 2 ** 20:6.1f}MB for the query results)")
+    EnglishBotUser.active_users = {}
+
+
+def main():
+    logging.disable(logging.INFO)
+    num_of_users = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    words_per_user = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+
+    storage = create_database(num_of_users, words_per_user)
+    try:
+        measure("buffered", load_buffered, storage)
+        measure("streaming", load_streaming, storage)
+    finally:
+        storage.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+"""
+Measures the memory of 100k synthetic users (tracemalloc) - with the previous representation (a dict per word
+with a translations list, a messages list and a views cache per user, a word sampler with its own copy of the
+words and float lists) and with the compact EnglishBotUser. The rows are built like the DB driver returns them,
+with new strings on every row.
+
+Usage: python -m benchmarks.users_memory_benchmark [num_of_users] [words_per_user]
+"""
+import sys
+import time
+import random
+import logging
+import tracemalloc
+
+from core.english_bot_user import EnglishBotUser
+
+VOCABULARY_SIZE = 5000
+TRANSLATIONS_PER_WORD = 2
+
+
+class PreviousUser:
+    def __init__(self, chat_id: int, user_translations: list, user_usages: list):
+        self.chat_id = chat_id
+        self.messages = []
+        self.word_sender_active = False
+        self.delay_time = 20
+        self.language = 'he'
+        self.user_translations = {}
+        for translation in user_translations:
+            if translation['en_word'] in self.user_translations:
+                self.user_translations[translation['en_word']]['translated_words'].append(
+                    translation['translated_word'])
+            else:
+                self.user_translations[translation['en_word']] = {
+                    'translated_words': [translation['translated_word']], 'usages': 0}
+        for usage in user_usages:
+            self.user_translations[usage['en_word']]['usages'] = usage['usages']
+
+        # the word sampler had its own copy of the words and their slots, and float lists of the weights
+        self.sampler_words = list(self.user_translations)
+        self.sampler_slots = {en_word: slot for slot, en_word in enumerate(self.sampler_words)}
+        self.sampler_weights = [1.0 / (details['usages'] + 1) for details in self.user_translations.values()]
+        self.sampler_tree = [0.0] * (max(len(self.sampler_words), 16) + 1)
+        self.translations_version = 0
+        self.views_cache = {}
+        self._sorted_words = None
+        self.word_sender_paused = False
+
+
+def create_rows(chat_id: int, words_per_user: int) -> tuple:
+    word_indexes = random.sample(range(VOCABULARY_SIZE), words_per_user)
+    translations = [{'chat_id': chat_id, 'en_word': f'word{index}', 'translated_word': f'translation{index}_{number}'}
+                    for index in word_indexes for number in range(TRANSLATIONS_PER_WORD)]
+    usages = [{'chat_id': chat_id, 'en_word': f'word{index}', 'usages': random.randint(0, 300)}
+              for index in word_indexes]
+    return translations, usages
+
+
+def measure(title: str, create_user, num_of_users: int, words_per_user: int):
+    random.seed(0)
+    users = []
+
+    tracemalloc.start()
+    started_at = time.perf_counter()
+    for chat_id in range(num_of_users):
+        users.append(create_user(chat_id, *create_rows(chat_id, words_per_user)))
+    duration = time.perf_counter() - started_at
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    print(f"{title:<10} | {num_of_users} users x {words_per_user} words | {current / 2 ** 20:8.1f}MB "
+          f"({current / num_of_users:6.0f} bytes per user) | peak {peak / 2 ** 20:8.1f}MB | built in {duration:.2f}s")
+    return current
+
+
+def main():
+    logging.disable(logging.DEBUG)
+    num_of_users = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    words_per_user = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+
+    previous_memory = measure("previous", PreviousUser, num_of_users, words_per_user)
+
+    def create_compact_user(chat_id: int, translations: list, usages: list):
+        return EnglishBotUser(chat_id=chat_id, user_translations=translations, user_usages=usages)
+
+    compact_memory = measure("compact", create_compact_user, num_of_users, words_per_user)
+    EnglishBotUser.active_users.clear()
+
+    print(f"x{previous_memory / compact_memory:.1f} less memory")
+
+
+if __name__ == '__main__':
+    main()
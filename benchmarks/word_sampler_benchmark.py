@@ -0,0 +1,50 @@
+"""
+Compares the previous word choosing of 'send_new_word' (sorting all the words and a linear weighted choice
+on every send) with the WordSampler of UserTranslations.
+
+Usage: python -m benchmarks.word_sampler_benchmark
+"""
+import random
+import timeit
+
+from core.user_translations import UserTranslations
+
+
+def choose_by_sorting(user_translations: dict) -> tuple:
+    sorted_words = []
+    priorities = []
+    for word, details in sorted(user_translations.items()):
+        sorted_words.append(word)
+        priorities.append(details['usages'])
+    priorities = [1.0 / (priority + 1) for priority in priorities]
+
+    chosen_en_word = random.choices(sorted_words, weights=priorities, k=1)[0]
+    sorted_words.remove(chosen_en_word)
+
+    additional_random_en_words = []
+    while len(additional_random_en_words) < 3:
+        current_random_choice = random.choice(sorted_words)
+        if current_random_choice not in additional_random_en_words:
+            additional_random_en_words.append(current_random_choice)
+
+    return chosen_en_word, additional_random_en_words
+
+
+def main(repeats: int = 2000):
+    for num_of_words in (10, 100, 1000, 10000):
+        user_translations = {f'word{index}': {'translated_words': [f'translation{index}'],
+                                              'usages': random.randint(0, 50)} for index in range(num_of_words)}
+        compact_translations = UserTranslations.from_pairs(
+            ((word, translated_word) for word, details in user_translations.items()
+             for translated_word in details['translated_words']),
+            ((word, details['usages']) for word, details in user_translations.items()))
+
+        sorting_time = timeit.timeit(lambda: choose_by_sorting(user_translations), number=repeats)
+        sampler_time = timeit.timeit(lambda: compact_translations.choose_with_distractors(3), number=repeats)
+
+        print(f"{num_of_words:>6} words | sorting - {sorting_time / repeats * 1e6:9.2f}us per send | "
+              f"sampler - {sampler_time / repeats * 1e6:6.2f}us per send | x{sorting_time / sampler_time:.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+import asyncio
+from typing import Union, Optional, List
+
+from telebot import types
+from telebot.async_telebot import AsyncTeleBot, REPLY_MARKUP_TYPES
+
+from helpers.loggers import get_logger
+from helpers.metrics import timed
+from core.english_bot_user import EnglishBotUser
+
+logger = get_logger(__file__)
+
+
+class AsyncBaseTelebotExtension(AsyncTeleBot):
+    # Bot API limit of message ids per 'deleteMessages' request
+    DELETE_MESSAGES_BATCH_SIZE = 100
+
+    def __init__(self, token: str, *args, **kwargs):
+        super().__init__(token)
+        self.token = token
+        self._pending_cleanups = {}
+
+    @timed('send_message', 'Sending a message, not rate limited in the async mode')
+    async def send_message(
+            self, chat_id: Union[int, str], text: str,
+            parse_mode: Optional[str] = None,
+            entities: Optional[List[types.MessageEntity]] = None,
+            disable_web_page_preview: Optional[bool] = None,
+            disable_notification: Optional[bool] = None,
+            protect_content: Optional[bool] = None,
+            reply_to_message_id: Optional[int] = None,
+            allow_sending_without_reply: Optional[bool] = None,
+            reply_markup: Optional[REPLY_MARKUP_TYPES] = None,
+            timeout: Optional[int] = None) -> types.Message:
+        logger.debug(f"Sending message to '{chat_id}'. (text- '{text}')")
+
+        msg_obj = await super().send_message(chat_id, text, reply_markup=reply_markup, parse_mode=parse_mode)
+
+        logger.debug(f"Storing message that was sent. id - {msg_obj.message_id}")
+
+        user = EnglishBotUser.get_user_by_chat_id(chat_id)
+        user.messages.append(msg_obj.message_id)
+
+        return msg_obj
+
+    async def _delete_tracked_message(self, chat_id, msg_id):
+        try:
+            logger.debug(f"Deleting message id - '{msg_id}'")
+            await self.delete_message(chat_id=chat_id, message_id=msg_id)
+        except Exception as e:
+            logger.warning(f"Didn't manage to delete message {msg_id} id. Error (debug level):")
+            logger.debug(e.__str__())
+
+    async def _delete_messages(self, chat_id, messages: list):
+        """
+        Deletes the messages with the multi-message 'deleteMessages' request, up to 100 ids per request.
+        Falls back to concurrent single deletions when the request isn't available or fails.
+        """
+        for start in range(0, len(messages), self.DELETE_MESSAGES_BATCH_SIZE):
+            batch = messages[start:start + self.DELETE_MESSAGES_BATCH_SIZE]
+
+            if hasattr(AsyncTeleBot, 'delete_messages'):
+                try:
+                    logger.debug(f"Deleting message ids - {batch}")
+                    await self.delete_messages(chat_id=chat_id, message_ids=batch)
+                    continue
+                except Exception as e:
+                    logger.warning(f"Didn't manage to delete messages in a batch, deleting them one by one. "
+                                   f"Error - {e}")
+
+            await asyncio.gather(*[self._delete_tracked_message(chat_id, msg_id) for msg_id in batch])
+
+    @timed('clean_chat', 'Deleting the tracked messages of a chat')
+    async def clean_chat(self, chat_id):
+        """
+        Deletes all the tracked messages of the chat.
+        When a cleanup of the same chat is already running, the messages are handed to it and deleted
+        in its next batch instead of starting another cleanup.
+        """
+        logger.debug(f"Cleaning chat {chat_id}")
+        user = EnglishBotUser.get_user_by_chat_id(chat_id)
+
+        messages, user.messages = user.messages, []
+        if not messages:
+            return
+
+        if chat_id in self._pending_cleanups:
+            logger.debug(f"Cleanup of chat {chat_id} is already running, coalescing {len(messages)} messages")
+            self._pending_cleanups[chat_id].extend(messages)
+            return
+
+        self._pending_cleanups[chat_id] = []
+        try:
+            while messages:
+                await self._delete_messages(chat_id, messages)
+                messages, self._pending_cleanups[chat_id] = self._pending_cleanups[chat_id], []
+        finally:
+            del self._pending_cleanups[chat_id]
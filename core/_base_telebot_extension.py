@@ -1,21 +1,39 @@
 
+import threading
 from typing import Union, Optional, List
+from concurrent.futures import ThreadPoolExecutor
 
 from telebot import TeleBot, types
 from telebot.async_telebot import REPLY_MARKUP_TYPES
 
 from helpers.loggers import get_logger
+from helpers.metrics import timed
 from core.english_bot_user import EnglishBotUser
+from core.outbound_queue import send_priority, CLEANUP_PRIORITY
 
 logger = get_logger(__file__)
 
 
 class BaseTelebotExtension(TeleBot):
-
-    def __init__(self, token: str, *args, **kwargs):
-        super().__init__(token)
+    # Bot API limit of message ids per 'deleteMessages' request
+    DELETE_MESSAGES_BATCH_SIZE = 100
+    DELETE_WORKERS = 8
+
+    def __init__(self, token: str, *args, threaded: bool = True, outbound_queue=None, **kwargs):
+        """
+        :param token: Telegram API Token
+        :param threaded: run the handlers on the TeleBot worker threads, or on the thread that processes the updates
+        :param outbound_queue: OutboundQueue that rate limits the sent and deleted messages, they're sent directly
+        if not provided
+        """
+        super().__init__(token, threaded=threaded)
         self.token = token
+        self.outbound_queue = outbound_queue
+        self._cleanup_lock = threading.Lock()
+        self._pending_cleanups = {}
+        self._delete_executor = ThreadPoolExecutor(max_workers=self.DELETE_WORKERS, thread_name_prefix='chat-cleaner')
 
+    @timed('send_message', 'Sending a message, including its wait in the outbound queue')
     def send_message(
             self, chat_id: Union[int, str], text: str,
             parse_mode: Optional[str] = None,
@@ -29,7 +47,11 @@ class BaseTelebotExtension(TeleBot):
             timeout: Optional[int] = None) -> types.Message:
         logger.debug(f"Sending message to '{chat_id}'. (text- '{text}')")
 
-        msg_obj = super().send_message(chat_id, text, reply_markup=reply_markup, parse_mode=parse_mode)
+        if self.outbound_queue:
+            msg_obj = self.outbound_queue.send(chat_id, super().send_message, chat_id, text, reply_markup=reply_markup,
+                                               parse_mode=parse_mode)
+        else:
+            msg_obj = super().send_message(chat_id, text, reply_markup=reply_markup, parse_mode=parse_mode)
 
         logger.debug(f"Storing message that was sent. id - {msg_obj.message_id}")
 
@@ -38,20 +60,121 @@ class BaseTelebotExtension(TeleBot):
 
         return msg_obj
 
+    def _send_deletion(self, chat_id, call, **kwargs):
+        """
+        Sends a deletion request through the outbound queue, after the sent messages (it runs on the delete
+        workers too, so the priority is set here rather than inherited from the caller).
+        """
+        if not self.outbound_queue:
+            return call(**kwargs)
+
+        with send_priority(CLEANUP_PRIORITY):
+            return self.outbound_queue.send(chat_id, call, **kwargs)
+
+    def _delete_single_message(self, chat_id, msg_id):
+        try:
+            logger.debug(f"Deleting message id - '{msg_id}'")
+            self._send_deletion(chat_id, self.delete_message, chat_id=chat_id, message_id=msg_id)
+        except Exception as e:
+            logger.warning(f"Didn't manage to delete message {msg_id} id. Error (debug level):")
+            logger.debug(e.__str__())
+
+    def _delete_messages(self, chat_id, messages: list):
+        """
+        Deletes the messages with the multi-message 'deleteMessages' request, up to 100 ids per request.
+        Falls back to concurrent single deletions when the request isn't available or fails.
+        """
+        for start in range(0, len(messages), self.DELETE_MESSAGES_BATCH_SIZE):
+            batch = messages[start:start + self.DELETE_MESSAGES_BATCH_SIZE]
+
+            if hasattr(TeleBot, 'delete_messages'):
+                try:
+                    logger.debug(f"Deleting message ids - {batch}")
+                    self._send_deletion(chat_id, self.delete_messages, chat_id=chat_id, message_ids=batch)
+                    continue
+                except Exception as e:
+                    logger.warning(f"Didn't manage to delete messages in a batch, deleting them one by one. "
+                                   f"Error - {e}")
+
+            list(self._delete_executor.map(lambda msg_id: self._delete_single_message(chat_id, msg_id), batch))
+
+    @timed('clean_chat', 'Deleting the tracked messages of a chat')
     def clean_chat(self, chat_id):
+        """
+        Deletes all the tracked messages of the chat.
+        When a cleanup of the same chat is already running, the messages are handed to it and deleted
+        in its next batch instead of starting another cleanup.
+        """
         logger.debug(f"Cleaning chat {chat_id}")
         user = EnglishBotUser.get_user_by_chat_id(chat_id)
 
-        try:
-            while user.messages:
-                msg_id = user.messages.pop(0)
+        with self._cleanup_lock:
+            messages, user.messages = user.messages, []
+            if not messages:
+                return
 
-                try:
-                    logger.debug(f"Deleting message id - '{msg_id}'")
-                    self.delete_message(chat_id=chat_id, message_id=msg_id)
-                except Exception as e:
-                    logger.warning(f"Didn't manage to delete message {msg_id} id. Error (debug level):")
-                    logger.debug(e.__str__())
+            if chat_id in self._pending_cleanups:
+                logger.debug(f"Cleanup of chat {chat_id} is already running, coalescing {len(messages)} messages")
+                self._pending_cleanups[chat_id].extend(messages)
+                return
+
+            self._pending_cleanups[chat_id] = []
 
-        except AssertionError as e:
-            logger.warning(f"Second Cleaning | assertion error - {e.__str__()}")
+        try:
+            while messages:
+                self._delete_messages(chat_id, messages)
+
+                with self._cleanup_lock:
+                    messages = self._pending_cleanups[chat_id]
+                    if messages:
+                        self._pending_cleanups[chat_id] = []
+                    else:
+                        del self._pending_cleanups[chat_id]
+        except Exception:
+            with self._cleanup_lock:
+                self._pending_cleanups.pop(chat_id, None)
+            raise
+
+    @staticmethod
+    def get_update_chat_id(update: types.Update):
+        """
+        Returns the chat id of the update, so the updates of a chat are processed in order.
+        Updates without a chat (e.g. inline queries) are keyed by their sender, or by their own id.
+        """
+        for update_type in ('message', 'edited_message', 'callback_query', 'channel_post', 'edited_channel_post',
+                            'my_chat_member', 'chat_member', 'chat_join_request', 'inline_query',
+                            'chosen_inline_result', 'shipping_query', 'pre_checkout_query', 'poll_answer'):
+            content = getattr(update, update_type, None)
+            if not content:
+                continue
+
+            chat = getattr(content, 'chat', None) or getattr(getattr(content, 'message', None), 'chat', None)
+            if chat:
+                return chat.id
+
+            user = getattr(content, 'from_user', None) or getattr(content, 'user', None)
+            if user:
+                return user.id
+
+        return update.update_id
+
+    def process_update(self, update: types.Update):
+        """
+        Runs the handlers of a single update on the current thread.
+        """
+        super().process_new_updates([update])
+
+    def process_new_updates(self, updates: List[types.Update]):
+        """
+        Hands every update to the mailbox of its chat, so the handlers of a chat never run concurrently with
+        each other or with the words that are sent to it. When the dispatcher is full, waits for room - which
+        holds back the polling of the next updates.
+        """
+        chat_dispatcher = EnglishBotUser.chat_dispatcher
+        if not chat_dispatcher:
+            super().process_new_updates(updates)
+            return
+
+        for update in updates:
+            if not chat_dispatcher.submit(self.get_update_chat_id(update), self.process_update, update, block=True):
+                logger.error(f"The chat dispatcher is stopped, dropping update {update.update_id}")
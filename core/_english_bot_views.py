@@ -0,0 +1,234 @@
+import re
+import random
+
+from telebot.types import InlineKeyboardMarkup, InlineKeyboardButton
+
+from helpers.multiple_languages import is_english
+from core.english_bot_user import EnglishBotUser
+
+
+class EnglishBotViews:
+    """
+    Builds the texts and keyboards of the bot without sending them, so the same views are shared
+    by the synchronous and the asynchronous bot extensions.
+    Every view is rendered in the language of its user, from the dictionaries that are loaded once per process.
+    The keyboards are returned as serialized markup JSON and cached - the static menus per language,
+    and the views of a user's words until the user's translations version changes.
+    """
+    lang = None
+    dictionaries = None
+    menus_cache = {}
+
+    def get_language(self, user: EnglishBotUser = None) -> str:
+        """
+        Returns the user's language, or the bot's default language if there is no dictionary for it.
+        """
+        if user and user.language in self.dictionaries:
+            return user.language
+
+        return self.lang
+
+    def get_dictionary(self, user: EnglishBotUser = None):
+        return self.dictionaries[self.get_language(user)]
+
+    @staticmethod
+    def get_cached_user_view(user: EnglishBotUser, view_key: tuple, build_view) -> tuple:
+        cached_view = user.views_cache.get(view_key)
+        if cached_view and cached_view[0] == user.translations_version:
+            return cached_view[1]
+
+        view = build_view()
+        user.views_cache[view_key] = (user.translations_version, view)
+        return view
+
+    def build_menu(self, user: EnglishBotUser = None) -> tuple:
+        language = self.get_language(user)
+        cached_menu = EnglishBotViews.menus_cache.get(('menu', language))
+        if cached_menu:
+            return cached_menu
+
+        dictionary = self.dictionaries[language]
+        menu_buttons = dictionary['menu_options']
+
+        reply_markup = InlineKeyboardMarkup()
+        options = [InlineKeyboardButton(button_text, callback_data=f'menu:{button_id}') for button_id, button_text in
+                   menu_buttons.items()]
+
+        for option in options:
+            reply_markup.row(option)
+
+        EnglishBotViews.menus_cache[('menu', language)] = dictionary['menu'], reply_markup.to_json()
+        return EnglishBotViews.menus_cache[('menu', language)]
+
+    def build_languages_menu(self, user: EnglishBotUser = None) -> tuple:
+        language = self.get_language(user)
+        cached_menu = EnglishBotViews.menus_cache.get(('languages', language))
+        if cached_menu:
+            return cached_menu
+
+        reply_markup = InlineKeyboardMarkup()
+        for button_language, dictionary in self.dictionaries.items():
+            reply_markup.row(InlineKeyboardButton(dictionary['language_name'], callback_data=f'lang:{button_language}'))
+
+        EnglishBotViews.menus_cache[('languages', language)] = (self.dictionaries[language]['choose_language'],
+                                                                reply_markup.to_json())
+        return EnglishBotViews.menus_cache[('languages', language)]
+
+    def build_wordlist(self, user: EnglishBotUser, word_range: list) -> tuple:
+        return self.get_cached_user_view(user, ('wordlist', tuple(word_range)),
+                                         lambda: self._build_wordlist(user, word_range))
+
+    def _build_wordlist(self, user: EnglishBotUser, word_range: list) -> tuple:
+        dictionary = self.get_dictionary(user)
+        en_words = user.get_user_sorted_words()[word_range[0]:word_range[1]]
+
+        cross_icon = u"\u274c"
+
+        words_buttons = [InlineKeyboardButton(en_word, callback_data=f'word:{en_word}') for en_word in en_words]
+        cross_icon_buttons = [InlineKeyboardButton(cross_icon, callback_data=f'delete_word:{en_word}|{word_range}')
+                              for en_word in en_words]
+
+        reply_markup = InlineKeyboardMarkup()
+
+        for button_index in range(len(words_buttons)):
+            reply_markup.row(words_buttons[button_index], cross_icon_buttons[button_index])
+
+        reply_markup.row(InlineKeyboardButton(dictionary['back_to_previous_menu'], callback_data=f'exit-to-word-range'))
+
+        return dictionary['the_words_list'], reply_markup.to_json()
+
+    def build_existing_words_to_practice(self, user: EnglishBotUser) -> tuple:
+        return self.get_cached_user_view(user, ('words_to_practice',),
+                                         lambda: self._build_existing_words_to_practice(user))
+
+    def _build_existing_words_to_practice(self, user: EnglishBotUser) -> tuple:
+        dictionary = self.get_dictionary(user)
+        table = "```\n"
+
+        for en_word, translated_words, _ in sorted(user.user_translations.items()):
+            table += f"{en_word}" + " - " + f"{'/'.join(translated_words)}\n"
+        table += "```\n"
+
+        reply_markup = InlineKeyboardMarkup()
+        reply_markup.row(InlineKeyboardButton(dictionary['back_to_main_menu'], callback_data=f'exit-to-main-menu'))
+
+        return table, reply_markup.to_json()
+
+    def build_existing_words_with_their_priorities(self, user: EnglishBotUser) -> tuple:
+        dictionary = self.get_dictionary(user)
+        table = "```\n"
+
+        for en_word, _, usages in sorted(user.user_translations.items()):
+            table += f"{en_word}" + " - " + f"{usages}\n"
+        table += "```\n"
+
+        reply_markup = InlineKeyboardMarkup()
+        reply_markup.row(InlineKeyboardButton(dictionary['back_to_main_menu'], callback_data=f'exit-to-main-menu'))
+
+        return table, reply_markup
+
+    def build_word_ranges(self, user: EnglishBotUser) -> tuple:
+        return self.get_cached_user_view(user, ('word_ranges',), lambda: self._build_word_ranges(user))
+
+    def _build_word_ranges(self, user: EnglishBotUser) -> tuple:
+        dictionary = self.get_dictionary(user)
+        en_words = user.get_user_sorted_words()
+
+        # calculate words ranges to split the buttons
+        divide_by = 20
+        ranges = [[start, start + divide_by] for start in range(0, len(en_words), divide_by)]
+        ranges[-1][1] -= (divide_by - len(en_words) % divide_by)
+
+        ranges_buttons = [InlineKeyboardButton(dictionary['words_list'] +
+                                               f" {en_words[words_range[0]][:1]}-{en_words[words_range[1] - 1][:1]} ",
+                                               callback_data=f'range_words:{words_range}') for words_range in ranges]
+        reply_markup = InlineKeyboardMarkup()
+        for button_index in range(len(ranges_buttons)):
+            reply_markup.row(ranges_buttons[button_index])
+
+        reply_markup.row(InlineKeyboardButton(dictionary['back_to_main_menu'], callback_data=f'exit-to-main-menu'))
+
+        return dictionary['choose_word_list'], reply_markup.to_json()
+
+    def build_new_word_exercise(self, user: EnglishBotUser) -> tuple:
+        dictionary = self.get_dictionary(user)
+        chosen_en_word, additional_random_en_words = user.user_translations.choose_with_distractors(3)
+
+        chosen_translated_word = random.choice(user.get_translated_words(chosen_en_word))
+
+        random_translated_words = []
+        while additional_random_en_words:
+            current_en_word = additional_random_en_words.pop()
+            current_random_translated_word = random.choice(user.get_translated_words(current_en_word))
+            random_translated_words.append(current_random_translated_word)
+
+        random_translated_words.append(chosen_translated_word)
+
+        random.shuffle(random_translated_words)
+
+        reply_markup = InlineKeyboardMarkup()
+        options = [InlineKeyboardButton(button_translated_word,
+                                        callback_data=f'c:{chosen_translated_word}|{button_translated_word}') for
+                   button_translated_word in random_translated_words]
+
+        for option in options:
+            reply_markup.row(option)
+
+        return chosen_en_word, dictionary['choose_translation'].format(chosen_en_word=chosen_en_word), reply_markup
+
+    def build_answer_feedback(self, user: EnglishBotUser, translated_word: str, chosen_translated_word: str) -> str:
+        dictionary = self.get_dictionary(user)
+        prefix = dictionary['next_word_eta'].format(delay_time=user.delay_time)
+
+        if translated_word == chosen_translated_word:
+            return dictionary['correct_choice'] + prefix
+
+        return dictionary['wrong_choice'].format(translated_word=translated_word) + prefix
+
+    @staticmethod
+    def is_valid_word(word: str) -> bool:
+        return bool(word) and word.replace(' ', '').isalpha() and len(word) < 46
+
+    @staticmethod
+    def split_words_to_import(user: EnglishBotUser, text: str, max_words_per_user: int) -> tuple:
+        """
+        Splits an imported list of words (one per line or separated by commas) into the words that should be
+        added - valid words the user doesn't have yet, without duplicates and up to the user's words limit.
+        :return: tuple of (words to add, number of skipped words)
+        """
+        words = [word.strip().lower() for word in re.split(r'[\n,;]+', text) if word.strip()]
+
+        new_words = [word for word in dict.fromkeys(words)
+                     if word not in user.user_translations and EnglishBotViews.is_valid_word(word)]
+        new_words = new_words[:max(max_words_per_user - user.num_of_words, 0)]
+
+        return new_words, len(words) - len(new_words)
+
+    @staticmethod
+    def build_imported_translations(chat_id: int, words: list, translations: dict) -> tuple:
+        """
+        :return: tuple of (translations rows of the words that have a translation, the added words)
+        """
+        rows = []
+        added_words = []
+        for word in words:
+            word_translations = translations.get(word)
+            if not word_translations or is_english(word_translations[0]):
+                continue
+
+            added_words.append(word)
+            rows.extend({'en_word': word, 'translated_word': translation, 'chat_id': chat_id}
+                        for translation in word_translations)
+
+        return rows, added_words
+
+    def assertions_before_addition_a_new_word(self, new_word: str, user: EnglishBotUser):
+        dictionary = self.get_dictionary(user)
+        result_message = None
+        if new_word in user.user_translations:
+            result_message = dictionary['word_already_added'].format(new_word=new_word)
+
+        if not self.is_valid_word(new_word):
+            result_message = dictionary['word_input_error']
+
+        return result_message
@@ -0,0 +1,564 @@
+import asyncio
+import random
+from typing import Mapping
+
+from helpers.loggers import get_logger
+from helpers.metrics import timed
+from helpers.translations import get_translations, get_translations_in_bulk
+from helpers.multiple_languages import load_all_dictionaries, is_english
+
+from core.english_bot_user import EnglishBotUser
+from core._english_bot_views import EnglishBotViews
+from core._async_base_telebot_extension import AsyncBaseTelebotExtension
+
+logger = get_logger(__file__)
+
+
+class AsyncEnglishBotTelebotExtension(EnglishBotViews, AsyncBaseTelebotExtension):
+    MIN_WORDS_PER_USER = 4
+    MAX_WORDS_PER_USER = 100
+    ANSWER_FOLLOW_UP_DELAY = 1
+    # seconds the first words after a startup are spread over, so the senders don't fire all at once
+    ACTIVATION_JITTER = 60
+    MAX_IMPORT_FILE_SIZE = 64 * 1024
+
+    def __init__(self, token: str, lang: str = "he", *args, **kwargs):
+        """
+        The asyncio variant of EnglishBotTelebotExtension.
+        The handlers and the scheduled word sends are coroutines, the blocking DB and translation calls
+        run in the default executor so they never block the event loop.
+        :param token: Telegram API Token
+        :param lang: Language of new users, default language is Hebrew.
+        """
+        super(AsyncEnglishBotTelebotExtension, self).__init__(token, *args, **kwargs)
+        self.lang = lang
+        self.dictionaries = load_all_dictionaries()
+        self.next_step_handlers = {}
+        # chat_id -> asyncio.TimerHandle of the pending follow-up of the chat
+        self.follow_ups = {}
+
+    def register_next_step_handler(self, chat_id, callback):
+        """
+        AsyncTeleBot has no next step handlers, the next text message of the chat is passed to the callback instead.
+        """
+        self.next_step_handlers[chat_id] = callback
+
+    async def show_menu(self, chat_id):
+        logger.debug(f"showing menu for '{chat_id}'")
+        user = EnglishBotUser.get_user_by_chat_id(chat_id)
+
+        text, reply_markup = self.build_menu(user)
+        await self.send_message(chat_id, text, reply_markup=reply_markup)
+
+    async def show_languages_menu(self, chat_id):
+        logger.debug(f"showing languages menu for '{chat_id}'")
+        user = EnglishBotUser.get_user_by_chat_id(chat_id)
+
+        text, reply_markup = self.build_languages_menu(user)
+        await self.send_message(chat_id, text, reply_markup=reply_markup)
+
+    async def show_wordlist(self, chat_id, word_range: list):
+        logger.debug(f"showing wordlist for '{chat_id}'")
+        user = EnglishBotUser.get_user_by_chat_id(chat_id)
+
+        text, reply_markup = self.build_wordlist(user, word_range)
+        await self.send_message(chat_id, text, reply_markup=reply_markup)
+
+    async def show_existing_words_to_practice(self, chat_id):
+        user = EnglishBotUser.get_user_by_chat_id(chat_id)
+
+        table, reply_markup = self.build_existing_words_to_practice(user)
+        await self.send_message(chat_id, table, reply_markup=reply_markup, parse_mode='MarkdownV2')
+
+    async def show_existing_words_with_their_priorities(self, chat_id):
+        user = EnglishBotUser.get_user_by_chat_id(chat_id)
+
+        table, reply_markup = self.build_existing_words_with_their_priorities(user)
+        await self.send_message(chat_id, table, reply_markup=reply_markup, parse_mode='MarkdownV2')
+
+    async def show_word_ranges(self, chat_id):
+        user = EnglishBotUser.get_user_by_chat_id(chat_id)
+
+        text, reply_markup = self.build_word_ranges(user)
+
+        logger.debug(f"showing words ranges for '{chat_id}'")
+        await self.send_message(chat_id, text, reply_markup=reply_markup)
+
+    async def menu_command_add_a_new_word(self, user, chat_id):
+        dictionary = self.get_dictionary(user)
+        if user.num_of_words >= self.MAX_WORDS_PER_USER:
+            await self.clean_chat(chat_id)
+            await self.send_message(chat_id, dictionary['maximum_words_exceeded'].format(
+                max_words_per_user=self.MAX_WORDS_PER_USER))
+        else:
+            self.pause_user_word_sender(chat_id)
+            await self.clean_chat(chat_id)
+
+            await self.send_message(chat_id, dictionary['send_new_word'])
+            self.register_next_step_handler(chat_id, self.add_new_word_to_db)
+
+    async def add_new_word_to_db(self, message):
+        chat_id = message.chat.id
+        user = EnglishBotUser.get_user_by_chat_id(chat_id)
+        dictionary = self.get_dictionary(user)
+        user.messages.append(message.message_id)
+
+        new_word = message.text.lower()
+
+        logger.debug(f"The provided word - '{new_word}'. Will check the input string...")
+
+        assertion_result = self.assertions_before_addition_a_new_word(new_word, user)
+
+        if assertion_result:
+            await self.clean_chat(chat_id)
+            await self.send_message(chat_id, assertion_result)
+            self.resume_user_word_sender(chat_id)
+            return
+
+        try:
+            extracted_translations = await asyncio.to_thread(get_translations, new_word,
+                                                             dest=self.get_language(user))
+        except Exception as e:
+            logger.error(f"Couldn't get translation by the following english word: {new_word}. Error: {e}")
+            await self.clean_chat(chat_id)
+            await self.send_message(chat_id, dictionary['unable_add_new_word'])
+            self.resume_user_word_sender(chat_id)
+            return
+
+        logger.debug(f"Got these translations - '{extracted_translations}' for the word '{new_word}'")
+
+        translations = [{'en_word': new_word, 'translated_word': translation,
+                         'chat_id': chat_id} for translation in extracted_translations or []]
+        if not translations or is_english(extracted_translations[0]):
+            await self.clean_chat(chat_id)
+            await self.send_message(chat_id, dictionary['no_translate_found'])
+            self.resume_user_word_sender(chat_id)
+            return
+
+        insertion_status = await asyncio.to_thread(user.update_translations, translations)
+
+        await self.clean_chat(chat_id)
+
+        if insertion_status:
+            translated_words = ", ".join([item['translated_word'] for item in translations])
+            await self.send_message(chat_id, dictionary['added_successfully'].format(
+                translated_words=translated_words, new_word=new_word))
+        else:
+            await self.send_message(chat_id, dictionary['unable_add_new_word'])
+
+        self.resume_user_word_sender(chat_id)
+
+    async def menu_command_import_words(self, user, chat_id):
+        dictionary = self.get_dictionary(user)
+        if user.num_of_words >= self.MAX_WORDS_PER_USER:
+            await self.clean_chat(chat_id)
+            await self.send_message(chat_id, dictionary['maximum_words_exceeded'].format(
+                max_words_per_user=self.MAX_WORDS_PER_USER))
+        else:
+            self.pause_user_word_sender(chat_id)
+            await self.clean_chat(chat_id)
+
+            await self.send_message(chat_id, dictionary['send_words_to_import'].format(
+                max_words=self.MAX_WORDS_PER_USER - user.num_of_words))
+            self.register_next_step_handler(chat_id, self.import_words_to_db)
+
+    async def read_imported_text(self, message) -> str:
+        """
+        Returns the words list of the message - its text, or the content of its text file.
+        """
+        if not message.document:
+            return message.text or ''
+
+        assert message.document.file_size <= self.MAX_IMPORT_FILE_SIZE, "The file is too big"
+        file_info = await self.get_file(message.document.file_id)
+        return (await self.download_file(file_info.file_path)).decode('utf8', errors='ignore')
+
+    async def import_words_to_db(self, message):
+        chat_id = message.chat.id
+        user = EnglishBotUser.get_user_by_chat_id(chat_id)
+        dictionary = self.get_dictionary(user)
+        user.messages.append(message.message_id)
+
+        try:
+            words, num_of_skipped = self.split_words_to_import(user, await self.read_imported_text(message),
+                                                               self.MAX_WORDS_PER_USER)
+            logger.debug(f"Importing {len(words)} words, skipped {num_of_skipped} words (chat_id - '{chat_id}')")
+
+            translations = await asyncio.to_thread(get_translations_in_bulk, words, dest=self.get_language(user))
+        except Exception as e:
+            logger.error(f"Couldn't import the words of chat id '{chat_id}'. Error: {e}")
+            await self.clean_chat(chat_id)
+            await self.send_message(chat_id, dictionary['unable_import_words'])
+            self.resume_user_word_sender(chat_id)
+            return
+
+        rows, added_words = self.build_imported_translations(chat_id, words, translations)
+        num_of_skipped += len(words) - len(added_words)
+
+        # all the translations of all the words are inserted at once
+        insertion_status = await asyncio.to_thread(user.update_translations, rows) if rows else True
+
+        await self.clean_chat(chat_id)
+        if insertion_status:
+            await self.send_message(chat_id, dictionary['words_imported'].format(
+                num_of_added=len(added_words), added_words=", ".join(added_words), num_of_skipped=num_of_skipped))
+        else:
+            await self.send_message(chat_id, dictionary['unable_import_words'])
+
+        self.resume_user_word_sender(chat_id)
+
+    async def change_waiting_time(self, message):
+        chat_id = message.chat.id
+        user = EnglishBotUser.get_user_by_chat_id(chat_id)
+        dictionary = self.get_dictionary(user)
+        user.messages.append(message.message_id)
+
+        new_time = message.text
+        logger.debug(f"Changing time to '{new_time}'. | chat_id - '{chat_id}'")
+
+        try:
+            assert new_time, "The object is empty"
+            assert new_time.isnumeric(), "The object is not numeric"
+
+            new_time = int(new_time)
+            assert new_time <= 24 * 60, "The number is more than 24 hours"
+
+            await self.clean_chat(chat_id)
+            update_status = await asyncio.to_thread(user.update_delay_time, new_time)
+            if update_status:
+                await self.send_message(chat_id, dictionary['delay_time_changed_successfully'].format(
+                    new_time=new_time))
+            else:
+                await self.send_message(chat_id, dictionary['unable_change_delay_time'])
+        except AssertionError as e:
+            logger.error(
+                f"There was an assertion error. Error - '{e}'. | method - 'change_waiting_time' | message.text - "
+                f"'{new_time}'")
+        finally:
+            self.resume_user_word_sender(chat_id)
+
+    @timed('send_new_word', 'Sending a word exercise')
+    async def send_new_word(self, chat_id):
+        user = EnglishBotUser.get_user_by_chat_id(chat_id)
+
+        chosen_en_word, text, reply_markup = self.build_new_word_exercise(user)
+
+        await self.clean_chat(chat_id)
+
+        await self.send_message(chat_id, text, reply_markup=reply_markup)
+        logger.debug(f"sent word '{chosen_en_word}' to chat id - '{chat_id}'")
+
+        # increase usage of the chosen word
+        user.increase_word_usages(chosen_en_word)
+
+        self.pause_user_word_sender(chat_id)
+
+    async def send_scheduled_word(self, chat_id: int):
+        """
+        The async word scheduler callback - the coroutine counterpart of EnglishBotUser.send_scheduled_word.
+        """
+        user = EnglishBotUser.get_user_by_chat_id(chat_id)
+        if not user or not user.word_sender_active or user.word_sender_paused:
+            logger.debug(f"Skipping the scheduled word of chat id '{chat_id}'")
+            return
+
+        for attempt in range(1, EnglishBotUser.SEND_RETRIES + 1):
+            try:
+                await self.send_new_word(chat_id)
+                return
+            except Exception as e:
+                logger.debug(f"Got exception (attempt {attempt}/{EnglishBotUser.SEND_RETRIES}) - {e}")
+
+        logger.error(f"Didn't manage to send a new word to chat id '{chat_id}', "
+                     f"will try again in {user.delay_time} minutes")
+        EnglishBotUser.word_scheduler.schedule(chat_id, user.delay_time * 60)
+
+    async def change_language(self, chat_id, language: str):
+        user = EnglishBotUser.get_user_by_chat_id(chat_id)
+        if language not in self.dictionaries:
+            logger.warning(f"There is no dictionary for the language '{language}' (chat_id - '{chat_id}')")
+            return
+
+        update_status = await asyncio.to_thread(user.update_language, language)
+        dictionary = self.get_dictionary(user)
+
+        await self.clean_chat(chat_id)
+        if update_status:
+            await self.send_message(chat_id, dictionary['language_changed'])
+        else:
+            await self.send_message(chat_id, dictionary['unable_change_language'])
+
+        await self.show_menu(chat_id)
+
+    async def delete_word(self, chat_id, en_word):
+        user = EnglishBotUser.get_user_by_chat_id(chat_id)
+        dictionary = self.get_dictionary(user)
+
+        delete_status = await asyncio.to_thread(user.delete_word, en_word)
+
+        await self.clean_chat(chat_id)
+        if delete_status:
+            await self.send_message(chat_id, dictionary['word_deleted_successfully'].format(en_word=en_word))
+            if user.word_sender_active and user.num_of_words < self.MIN_WORDS_PER_USER:
+                await self.send_message(chat_id, dictionary['automatic_words_sender_has_stopped'].format(
+                    num_of_words=user.num_of_words))
+        else:
+            await self.send_message(chat_id, dictionary['word_deletion_failed'])
+
+    async def infinity_polling(self, **kwargs):
+        active_users: "Mapping[int, EnglishBotUser]" = EnglishBotUser.active_users
+
+        EnglishBotUser.word_scheduler.start()
+
+        logger.debug("Activating users...")
+        for chat_id, active_user in active_users.items():
+            if active_user.word_sender_active:
+                active_user.activate_word_sender(delay=random.uniform(0, self.ACTIVATION_JITTER))
+
+        await super().infinity_polling(timeout=10, request_timeout=15, **kwargs)
+
+    def schedule_follow_up(self, chat_id, delay: float, action, *args):
+        """
+        Calls the action after the delay on a loop timer, so the handler returns right away. A chat has a single
+        pending follow-up - it replaces the previous one, and it's dropped by 'cancel_follow_up'.
+        """
+        self.cancel_follow_up(chat_id)
+        self.follow_ups[chat_id] = asyncio.get_running_loop().call_later(delay, self._run_follow_up, chat_id,
+                                                                         action, *args)
+
+    def cancel_follow_up(self, chat_id):
+        follow_up = self.follow_ups.pop(chat_id, None)
+        if follow_up:
+            follow_up.cancel()
+
+    def _run_follow_up(self, chat_id, action, *args):
+        self.follow_ups.pop(chat_id, None)
+        action(*args)
+
+    def pause_user_word_sender(self, chat_id):
+        active_users: "Mapping[int, EnglishBotUser]" = EnglishBotUser.active_users
+
+        # a pending resume of an answered word would send words in the middle of the menu
+        self.cancel_follow_up(chat_id)
+        active_users[chat_id].pause_sender()
+
+    @staticmethod
+    def resume_user_word_sender(chat_id):
+        active_users: "Mapping[int, EnglishBotUser]" = EnglishBotUser.active_users
+
+        active_users[chat_id].resume_sender()
+
+    async def close(self):
+        await EnglishBotUser.word_scheduler.stop()
+
+        active_users = EnglishBotUser.active_users.items()
+        for chat_id, active_user in active_users:
+            active_user.close()
+        await asyncio.gather(*[self.clean_chat(chat_id) for chat_id, _ in active_users])
+
+        await self.close_session()
+
+    def init_handlers(self):
+        @self.callback_query_handler(func=lambda call: True)
+        @timed('handle_query', 'Handling a callback query (a button press)')
+        async def handle_query(call):
+            chat_id = call.message.chat.id
+            current_user: "EnglishBotUser" = EnglishBotUser.get_user_by_chat_id(chat_id)
+            dictionary = self.get_dictionary(current_user)
+
+            data = call.data
+            if data.startswith("menu:"):
+                button_id = data.replace('menu:', '')
+                if not current_user.is_locked():
+
+                    # Add new english word
+                    if button_id == '1':
+                        await self.menu_command_add_a_new_word(current_user, chat_id)
+
+                    # Start / stop automatic exercises sender
+                    elif button_id == '2':
+                        current_sender_status = current_user.word_sender_active
+                        if not current_sender_status:
+                            if current_user.num_of_words >= self.MIN_WORDS_PER_USER:
+                                await asyncio.to_thread(current_user.activate_word_sender)
+                                await self.send_message(chat_id, dictionary['automatic_word_sender_started'])
+                            else:
+                                await self.send_message(chat_id, dictionary['not_enough_words_to_start'].format(
+                                    min_words_per_user=self.MIN_WORDS_PER_USER))
+                        elif current_sender_status:
+                            await asyncio.to_thread(current_user.deactivate_word_sender)
+                            await self.send_message(chat_id, dictionary['automatic_word_sender_stopped'])
+
+                    # Word list & remove method
+                    elif button_id == '3':
+                        self.pause_user_word_sender(chat_id)
+                        await self.clean_chat(chat_id)
+                        await self.show_word_ranges(chat_id)
+
+                    # Change waiting time
+                    elif button_id == '4':
+                        self.pause_user_word_sender(chat_id)
+                        await self.send_message(chat_id, dictionary['send_a_new_delay_time'])
+                        self.register_next_step_handler(chat_id, self.change_waiting_time)
+
+                    # Word list just for practise
+                    elif button_id == '5':
+                        self.pause_user_word_sender(chat_id)
+                        await self.clean_chat(chat_id)
+                        await self.show_existing_words_to_practice(chat_id)
+
+                    # Help button
+                    elif button_id == '6':
+                        await self.send_message(chat_id, dictionary['help_message'])
+
+                    # Change language
+                    elif button_id == '7':
+                        await self.clean_chat(chat_id)
+                        await self.show_languages_menu(chat_id)
+                else:
+                    logger.debug(f"The user trying to press on button {button_id} but the chat is locked")
+
+            # Words comparison
+            elif data.startswith("c:"):
+                logger.debug(f"comparison words for '{chat_id}'")
+
+                button_callback = data.replace('c:', '')
+                translated_word, chosen_translated_word = button_callback.split('|')
+
+                await self.clean_chat(chat_id)
+
+                await self.send_message(chat_id, self.build_answer_feedback(current_user, translated_word,
+                                                                            chosen_translated_word))
+
+                self.schedule_follow_up(chat_id, self.ANSWER_FOLLOW_UP_DELAY, self.resume_user_word_sender, chat_id)
+
+            # Language choice
+            elif data.startswith("lang:"):
+                await self.change_language(chat_id, data.replace('lang:', ''))
+
+            # Ranges list
+            elif data.startswith("range_words:"):
+                button_callback = data.replace('range_words:', '')
+
+                await self.clean_chat(chat_id)
+                await self.show_wordlist(chat_id, eval(button_callback))
+
+            # Remove word request
+            elif data.startswith("delete_word:"):
+                button_callback = data.replace('delete_word:', '')
+                chosen_word, last_menu_range = button_callback.split('|')
+                await self.delete_word(chat_id, chosen_word)
+
+                await self.show_wordlist(chat_id, eval(last_menu_range))
+
+            # Exit to main menu
+            elif data.startswith("exit-to-main-menu"):
+                await self.clean_chat(chat_id)
+
+                await self.show_menu(chat_id)
+                self.resume_user_word_sender(chat_id)
+
+            # Return to previous menu
+            elif data.startswith("exit-to-word-range"):
+                await self.clean_chat(chat_id)
+
+                await self.show_word_ranges(chat_id)
+
+        @self.message_handler(commands=['start'])
+        async def start_the_bot(message):
+            chat_id = message.chat.id
+            current_user: "EnglishBotUser" = EnglishBotUser.get_user_by_chat_id(chat_id)
+
+            if current_user:
+                current_user.messages.append(message.message_id)
+                await self.show_menu(chat_id)
+            else:
+                await asyncio.to_thread(EnglishBotUser.new_user, chat_id, language=self.lang)
+
+                await self.show_menu(chat_id)
+                await self.send_message(chat_id, self.get_dictionary()['must_add_4_words_before_statring'])
+
+        @self.message_handler(commands=['priorities'])
+        async def priorities_command(message):
+            chat_id = message.chat.id
+            current_user: "EnglishBotUser" = EnglishBotUser.get_user_by_chat_id(chat_id)
+
+            if current_user:
+                current_user.messages.append(message.message_id)
+
+            if not current_user.is_locked():
+                await self.clean_chat(chat_id)
+                await self.show_existing_words_with_their_priorities(chat_id)
+
+        @self.message_handler(commands=['send_exercise'])
+        async def exersice_request_command(message):
+            chat_id = message.chat.id
+            current_user: "EnglishBotUser" = EnglishBotUser.get_user_by_chat_id(chat_id)
+
+            if current_user:
+                current_user.messages.append(message.message_id)
+
+            if not current_user.is_locked():
+                await self.send_new_word(message.chat.id)
+
+        @self.message_handler(commands=['menu'])
+        async def menu_command(message):
+            chat_id = message.chat.id
+            current_user: "EnglishBotUser" = EnglishBotUser.get_user_by_chat_id(chat_id)
+
+            if current_user:
+                current_user.messages.append(message.message_id)
+
+            if not current_user.is_locked():
+                await self.clean_chat(chat_id)
+                await self.show_menu(chat_id)
+
+        @self.message_handler(commands=['import'])
+        async def import_command(message):
+            chat_id = message.chat.id
+            current_user: "EnglishBotUser" = EnglishBotUser.get_user_by_chat_id(chat_id)
+
+            if current_user:
+                current_user.messages.append(message.message_id)
+
+            if not current_user.is_locked():
+                await self.menu_command_import_words(current_user, chat_id)
+
+        @self.message_handler(commands=['language'])
+        async def language_command(message):
+            chat_id = message.chat.id
+            current_user: "EnglishBotUser" = EnglishBotUser.get_user_by_chat_id(chat_id)
+
+            if current_user:
+                current_user.messages.append(message.message_id)
+
+            if not current_user.is_locked():
+                await self.clean_chat(chat_id)
+                await self.show_languages_menu(chat_id)
+
+        @self.message_handler(commands=['add'])
+        async def new_word_command(message):
+            chat_id = message.chat.id
+            current_user: "EnglishBotUser" = EnglishBotUser.get_user_by_chat_id(chat_id)
+
+            if current_user:
+                current_user.messages.append(message.message_id)
+
+            if not current_user.is_locked():
+                await self.menu_command_add_a_new_word(current_user, chat_id)
+
+        # text files are caught as well, for the next step handler of the words import
+        @self.message_handler(func=lambda message: message.text or message.document, content_types=['text', 'document'])
+        async def catch_every_user_message(message):
+            logger.debug(f"catching user message ({message.text})")
+            chat_id = message.chat.id
+
+            next_step_handler = self.next_step_handlers.pop(chat_id, None)
+            if next_step_handler:
+                await next_step_handler(message)
+                return
+
+            current_user: "EnglishBotUser" = EnglishBotUser.get_user_by_chat_id(chat_id)
+
+            if current_user:
+                current_user.messages.append(message.message_id)
@@ -0,0 +1,143 @@
+import time
+import asyncio
+import threading
+from typing import Callable, Awaitable
+
+from helpers.loggers import get_logger
+
+logger = get_logger(__file__)
+
+
+class AsyncWordScheduler:
+    def __init__(self, callback: Callable[[int], Awaitable], max_concurrency: int = 100):
+        """
+        The asyncio counterpart of WordScheduler - every user's deadline is a timer of the event loop,
+        and the callback coroutine runs as a task, at most 'max_concurrency' at once.
+        The scheduling methods are thread-safe, so they may be called from 'asyncio.to_thread' workers as well.
+        :param callback: coroutine function that gets the chat id whose deadline has passed
+        :param max_concurrency: maximum number of callbacks that run at the same time
+        """
+        self.callback = callback
+        self.max_concurrency = max_concurrency
+
+        self._deadlines = {}
+        self._handles = {}
+        self._tasks = set()
+        self._lock = threading.Lock()
+        self._loop = None
+        self._semaphore = None
+
+        self.dispatched = 0
+        self.in_flight = 0
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+
+    def start(self):
+        logger.debug(f"Starting async word scheduler (max concurrency - {self.max_concurrency})")
+        self._loop = asyncio.get_running_loop()
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        with self._lock:
+            pending_deadlines = list(self._deadlines.items())
+        for chat_id, deadline in pending_deadlines:
+            self._arm(chat_id, deadline)
+
+    async def stop(self):
+        logger.debug("Stopping async word scheduler")
+        with self._lock:
+            self._deadlines.clear()
+
+        for handle in self._handles.values():
+            handle.cancel()
+        self._handles.clear()
+
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def _call_in_loop(self, func, *args):
+        if not self._loop:
+            return
+
+        try:
+            running_loop = asyncio.get_running_loop()
+        except RuntimeError:
+            running_loop = None
+
+        if running_loop is self._loop:
+            func(*args)
+        else:
+            self._loop.call_soon_threadsafe(func, *args)
+
+    def schedule(self, chat_id: int, delay: float):
+        """
+        Sets (or replaces) the next-send deadline of the provided chat id.
+        :param delay: seconds from now
+        """
+        deadline = time.monotonic() + delay
+        with self._lock:
+            self._deadlines[chat_id] = deadline
+        self._call_in_loop(self._arm, chat_id, deadline)
+
+    def cancel(self, chat_id: int):
+        with self._lock:
+            self._deadlines.pop(chat_id, None)
+        self._call_in_loop(self._disarm, chat_id)
+
+    def is_scheduled(self, chat_id: int) -> bool:
+        return chat_id in self._deadlines
+
+    def _arm(self, chat_id: int, deadline: float):
+        self._disarm(chat_id)
+
+        with self._lock:
+            if self._deadlines.get(chat_id) != deadline:
+                # the deadline was replaced or cancelled in the meantime
+                return
+
+        self._handles[chat_id] = self._loop.call_later(max(deadline - time.monotonic(), 0), self._fire,
+                                                       chat_id, deadline)
+
+    def _disarm(self, chat_id: int):
+        handle = self._handles.pop(chat_id, None)
+        if handle:
+            handle.cancel()
+
+    def _fire(self, chat_id: int, deadline: float):
+        self._handles.pop(chat_id, None)
+
+        with self._lock:
+            if self._deadlines.get(chat_id) != deadline:
+                return
+            del self._deadlines[chat_id]
+
+        self.last_lag = time.monotonic() - deadline
+        self.max_lag = max(self.max_lag, self.last_lag)
+        self.dispatched += 1
+
+        task = self._loop.create_task(self._dispatch(chat_id))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _dispatch(self, chat_id: int):
+        async with self._semaphore:
+            self.in_flight += 1
+            try:
+                await self.callback(chat_id)
+            except Exception as e:
+                logger.error(f"The scheduled word sending of chat id '{chat_id}' failed. Error - {e}")
+            finally:
+                self.in_flight -= 1
+
+    def metrics(self) -> dict:
+        with self._lock:
+            scheduled_users = len(self._deadlines)
+
+        return {
+            'scheduled_users': scheduled_users,
+            'queue_depth': len(self._handles),
+            'in_flight': self.in_flight,
+            'dispatched': self.dispatched,
+            'last_lag': self.last_lag,
+            'max_lag': self.max_lag
+        }
@@ -0,0 +1,151 @@
+import time
+import queue
+import threading
+from collections import deque
+
+from helpers.loggers import get_logger
+
+logger = get_logger(__file__)
+
+
+class ChatDispatcher:
+    def __init__(self, max_workers: int = 8, max_queue_size: int = 1000):
+        """
+        Runs tasks on a bounded pool of worker threads with a mailbox per chat.
+        The tasks of one chat run one at a time and in the order they were submitted, while the tasks of
+        different chats run in parallel. A worker runs a single task of a chat and then hands the chat back
+        to the ready queue, so a busy chat can't starve the others.
+        At most 'max_queue_size' tasks may wait - 'submit' rejects the rest or waits for room, so the caller
+        can push back.
+        :param max_workers: number of worker threads
+        :param max_queue_size: maximum number of tasks that wait for a worker
+        """
+        self.max_workers = max_workers
+        self.max_queue_size = max_queue_size
+
+        self._mailboxes = {}
+        self._ready_chats = queue.Queue()
+        self._lock = threading.Lock()
+        self._drained = threading.Condition(self._lock)
+        self._not_full = threading.Condition(self._lock)
+        self._workers = []
+        self._num_of_waiting_tasks = 0
+        self._is_stopped = False
+
+        self.submitted = 0
+        self.rejected = 0
+        self.processed = 0
+        self.failed = 0
+        self.in_flight = 0
+        self.last_queue_latency = 0.0
+        self.max_queue_latency = 0.0
+        self._total_queue_latency = 0.0
+
+    def start(self):
+        logger.debug(f"Starting chat dispatcher with {self.max_workers} workers")
+        self._is_stopped = False
+        self._workers = [threading.Thread(target=self._run, name=f'chat-dispatcher-{index}', daemon=True)
+                         for index in range(self.max_workers)]
+        for worker in self._workers:
+            worker.start()
+
+    def stop(self, timeout: float = None):
+        """
+        Stops the workers after the tasks that were already submitted are done.
+        """
+        logger.debug("Stopping chat dispatcher...")
+        with self._lock:
+            self._is_stopped = True
+            self._not_full.notify_all()
+            if self._workers:
+                self._drained.wait_for(lambda: not self._mailboxes, timeout)
+
+        for _ in self._workers:
+            self._ready_chats.put(None)
+
+        for worker in self._workers:
+            worker.join(timeout)
+        self._workers = []
+
+    def submit(self, chat_id, task, *args, block: bool = False, timeout: float = None, **kwargs) -> bool:
+        """
+        Adds the task to the chat's mailbox.
+        :param block: wait for room when the dispatcher is full, instead of rejecting the task right away
+        :param timeout: maximum seconds to wait for room, no limit if not provided
+        :return: False if the dispatcher is full or stopped and the task was rejected, True otherwise
+        """
+        with self._lock:
+            if block:
+                self._not_full.wait_for(lambda: self._is_stopped or self._num_of_waiting_tasks < self.max_queue_size,
+                                        timeout)
+
+            if self._is_stopped or self._num_of_waiting_tasks >= self.max_queue_size:
+                self.rejected += 1
+                return False
+
+            self._num_of_waiting_tasks += 1
+            self.submitted += 1
+
+            mailbox = self._mailboxes.get(chat_id)
+            is_idle = mailbox is None
+            if is_idle:
+                mailbox = self._mailboxes[chat_id] = deque()
+            mailbox.append((time.perf_counter(), task, args, kwargs))
+
+        # a chat is in the ready queue (or running) at most once, that's what keeps its tasks in order
+        if is_idle:
+            self._ready_chats.put(chat_id)
+
+        return True
+
+    def _run(self):
+        while True:
+            chat_id = self._ready_chats.get()
+            if chat_id is None:
+                break
+
+            with self._lock:
+                submitted_at, task, args, kwargs = self._mailboxes[chat_id].popleft()
+                self._num_of_waiting_tasks -= 1
+                self.in_flight += 1
+                self._not_full.notify()
+
+            queue_latency = time.perf_counter() - submitted_at
+            is_failed = False
+            try:
+                task(*args, **kwargs)
+            except Exception as e:
+                logger.exception(f"Task of chat id '{chat_id}' failed. Error - {e}")
+                is_failed = True
+
+            with self._lock:
+                self.in_flight -= 1
+                self.failed += is_failed
+                self.processed += 1
+                self.last_queue_latency = queue_latency
+                self.max_queue_latency = max(self.max_queue_latency, queue_latency)
+                self._total_queue_latency += queue_latency
+
+                has_more_tasks = bool(self._mailboxes[chat_id])
+                if not has_more_tasks:
+                    del self._mailboxes[chat_id]
+                    if not self._mailboxes:
+                        self._drained.notify_all()
+
+            if has_more_tasks:
+                self._ready_chats.put(chat_id)
+
+    def metrics(self) -> dict:
+        with self._lock:
+            return {
+                'queue_depth': self._num_of_waiting_tasks,
+                'active_chats': len(self._mailboxes),
+                'in_flight': self.in_flight,
+                'submitted': self.submitted,
+                'rejected': self.rejected,
+                'processed': self.processed,
+                'failed': self.failed,
+                'last_queue_latency': self.last_queue_latency,
+                'max_queue_latency': self.max_queue_latency,
+                'avg_queue_latency': self._total_queue_latency / self.processed if self.processed else 0.0
+            }
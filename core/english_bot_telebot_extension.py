@@ -1,141 +1,100 @@
-import time
 import random
+import itertools
+import threading
 from typing import Mapping
 
 from helpers.loggers import get_logger
-from helpers.translations import get_translations
-from helpers.multiple_languages import load_dictionary, is_english
+from helpers.metrics import timed
+from helpers.translations import get_translations, get_translations_in_bulk
+from helpers.multiple_languages import load_all_dictionaries, is_english
 
 from core.english_bot_user import EnglishBotUser
+from core._english_bot_views import EnglishBotViews
 from core._base_telebot_extension import BaseTelebotExtension
 
-from telebot.types import InlineKeyboardMarkup, InlineKeyboardButton
-
 logger = get_logger(__file__)
 
 
-class EnglishBotTelebotExtension(BaseTelebotExtension):
+class EnglishBotTelebotExtension(EnglishBotViews, BaseTelebotExtension):
     MIN_WORDS_PER_USER = 4
     MAX_WORDS_PER_USER = 100
+    ANSWER_FOLLOW_UP_DELAY = 1
+    FOLLOW_UP_RETRY_DELAY = 1
+    # seconds the first words after a startup are spread over, so the senders don't fire all at once
+    ACTIVATION_JITTER = 60
+    MAX_IMPORT_FILE_SIZE = 64 * 1024
 
     def __init__(self, token: str, lang: str = "he", *args, **kwargs):
         """
         :param token: Telegram API Token
-        :param lang: Default language is Hebrew.
+        :param lang: Language of new users, default language is Hebrew.
         """
         super(EnglishBotTelebotExtension, self).__init__(token, *args, **kwargs)
-        self.word_sender = None
-        self.dictionary = load_dictionary(lang=lang)
+        self.lang = lang
+        self.dictionaries = load_all_dictionaries()
+        # chat_id -> (token, Timer) of the pending follow-up of the chat
+        self._follow_ups = {}
+        self._follow_up_tokens = itertools.count()
+        self._follow_ups_lock = threading.Lock()
 
     def show_menu(self, chat_id):
         logger.debug(f"showing menu for '{chat_id}'")
+        user = EnglishBotUser.get_user_by_chat_id(chat_id)
 
-        menu_buttons = self.dictionary['menu_options']
-
-        reply_markup = InlineKeyboardMarkup()
-        options = [InlineKeyboardButton(button_text, callback_data=f'menu:{button_id}') for button_id, button_text in
-                   menu_buttons.items()]
+        text, reply_markup = self.build_menu(user)
+        self.send_message(chat_id, text, reply_markup=reply_markup)
 
-        for option in options:
-            reply_markup.row(option)
+    def show_languages_menu(self, chat_id):
+        logger.debug(f"showing languages menu for '{chat_id}'")
+        user = EnglishBotUser.get_user_by_chat_id(chat_id)
 
-        self.send_message(chat_id, self.dictionary['menu'], reply_markup=reply_markup)
+        text, reply_markup = self.build_languages_menu(user)
+        self.send_message(chat_id, text, reply_markup=reply_markup)
 
     def show_wordlist(self, chat_id, word_range: list):
         logger.debug(f"showing wordlist for '{chat_id}'")
         user = EnglishBotUser.get_user_by_chat_id(chat_id)
-        en_words = user.get_user_sorted_words()[word_range[0]:word_range[1]]
-
-        cross_icon = u"\u274c"
-
-        words_buttons = [InlineKeyboardButton(en_word, callback_data=f'word:{en_word}') for en_word in en_words]
-        cross_icon_buttons = [InlineKeyboardButton(cross_icon, callback_data=f'delete_word:{en_word}|{word_range}')
-                              for en_word in en_words]
-
-        reply_markup = InlineKeyboardMarkup()
 
-        for button_index in range(len(words_buttons)):
-            reply_markup.row(words_buttons[button_index], cross_icon_buttons[button_index])
-
-        reply_markup.row(InlineKeyboardButton(self.dictionary['back_to_previous_menu'], callback_data=f'exit-to-word-range'))
-
-        self.send_message(chat_id, self.dictionary['the_words_list'], reply_markup=reply_markup)
+        text, reply_markup = self.build_wordlist(user, word_range)
+        self.send_message(chat_id, text, reply_markup=reply_markup)
 
     def show_existing_words_to_practice(self, chat_id):
-        table = "```\n"
-
-        for en_word, details in sorted(EnglishBotUser.get_user_by_chat_id(chat_id).user_translations.items()):
-            table += f"{en_word}" + " - " + f"{'/'.join(details['translated_words'])}\n"
-        table += "```\n"
-
-        reply_markup = InlineKeyboardMarkup()
-        reply_markup.row(InlineKeyboardButton(self.dictionary['back_to_main_menu'], callback_data=f'exit-to-main-menu'))
+        user = EnglishBotUser.get_user_by_chat_id(chat_id)
 
+        table, reply_markup = self.build_existing_words_to_practice(user)
         self.send_message(chat_id, table, reply_markup=reply_markup, parse_mode='MarkdownV2')
 
     def show_existing_words_with_their_priorities(self, chat_id):
-        table = "```\n"
-
-        for en_word, details in sorted(EnglishBotUser.get_user_by_chat_id(chat_id).user_translations.items()):
-            table += f"{en_word}" + " - " + f"{details['usages']}\n"
-        table += "```\n"
-
-        reply_markup = InlineKeyboardMarkup()
-        reply_markup.row(InlineKeyboardButton(self.dictionary['back_to_main_menu'], callback_data=f'exit-to-main-menu'))
+        user = EnglishBotUser.get_user_by_chat_id(chat_id)
 
+        table, reply_markup = self.build_existing_words_with_their_priorities(user)
         self.send_message(chat_id, table, reply_markup=reply_markup, parse_mode='MarkdownV2')
 
     def show_word_ranges(self, chat_id):
         user = EnglishBotUser.get_user_by_chat_id(chat_id)
 
-        en_words = user.get_user_sorted_words()
-
-        # calculate words ranges to split the buttons
-        divide_by = 20
-        ranges = [[start, start + divide_by] for start in range(0, len(en_words), divide_by)]
-        ranges[-1][1] -= (divide_by - len(en_words) % divide_by)
-
-        ranges_buttons = [InlineKeyboardButton(self.dictionary['words_list'] +
-                                               f" {en_words[words_range[0]][:1]}-{en_words[words_range[1] - 1][:1]} ",
-                                               callback_data=f'range_words:{words_range}') for words_range in ranges]
-        reply_markup = InlineKeyboardMarkup()
-        for button_index in range(len(ranges_buttons)):
-            reply_markup.row(ranges_buttons[button_index])
-
-        reply_markup.row(InlineKeyboardButton(self.dictionary['back_to_main_menu'], callback_data=f'exit-to-main-menu'))
+        text, reply_markup = self.build_word_ranges(user)
 
         logger.debug(f"showing words ranges for '{chat_id}'")
-        self.send_message(chat_id, self.dictionary['choose_word_list'], reply_markup=reply_markup)
-
-    def assertions_before_addition_a_new_word(self, new_word: str, user: EnglishBotUser):
-        result_message = None
-        if new_word in user.user_translations.keys():
-            result_message = self.dictionary['word_already_added'].format(new_word=new_word)
-
-        try:
-            assert new_word
-            assert new_word.replace(' ', '').isalpha()
-            assert len(new_word) < 46
-        except AssertionError:
-            result_message = self.dictionary['word_input_error']
-
-        return result_message
+        self.send_message(chat_id, text, reply_markup=reply_markup)
 
     def menu_command_add_a_new_word(self, user, chat_id):
+        dictionary = self.get_dictionary(user)
         if user.num_of_words >= self.MAX_WORDS_PER_USER:
             self.clean_chat(chat_id)
-            self.send_message(chat_id, self.dictionary['maximum_words_exceeded'].format(
+            self.send_message(chat_id, dictionary['maximum_words_exceeded'].format(
                 max_words_per_user=self.MAX_WORDS_PER_USER))
         else:
             self.pause_user_word_sender(chat_id)
             self.clean_chat(chat_id)
 
-            callback_msg = self.send_message(chat_id, self.dictionary['send_new_word'])
+            callback_msg = self.send_message(chat_id, dictionary['send_new_word'])
             self.register_next_step_handler(callback_msg, self.add_new_word_to_db)
 
     def add_new_word_to_db(self, message):
         chat_id = message.chat.id
         user = EnglishBotUser.get_user_by_chat_id(chat_id)
+        dictionary = self.get_dictionary(user)
         user.messages.append(message.message_id)
 
         new_word = message.text.lower()
@@ -151,21 +110,21 @@ class EnglishBotTelebotExtension(BaseTelebotExtension):
             return
 
         try:
-            extracted_translations = get_translations(new_word)
+            extracted_translations = get_translations(new_word, dest=self.get_language(user))
         except Exception as e:
             logger.error(f"Couldn't get translation by the following english word: {new_word}. Error: {e}")
             self.clean_chat(chat_id)
-            self.send_message(chat_id, self.dictionary['unable_add_new_word'])
+            self.send_message(chat_id, dictionary['unable_add_new_word'])
             self.resume_user_word_sender(chat_id)
             return
 
         logger.debug(f"Got these translations - '{extracted_translations}' for the word '{new_word}'")
 
         translations = [{'en_word': new_word, 'translated_word': translation,
-                         'chat_id': chat_id} for translation in extracted_translations]
+                         'chat_id': chat_id} for translation in extracted_translations or []]
         if not translations or is_english(extracted_translations[0]):
             self.clean_chat(chat_id)
-            self.send_message(chat_id, self.dictionary['no_translate_found'])
+            self.send_message(chat_id, dictionary['no_translate_found'])
             self.resume_user_word_sender(chat_id)
             return
 
@@ -175,15 +134,75 @@ class EnglishBotTelebotExtension(BaseTelebotExtension):
 
         if insertion_status:
             translated_words = ", ".join([item['translated_word'] for item in translations])
-            self.send_message(chat_id, self.dictionary['added_successfully'].format(translated_words=translated_words, new_word=new_word))
+            self.send_message(chat_id, dictionary['added_successfully'].format(translated_words=translated_words, new_word=new_word))
+        else:
+            self.send_message(chat_id, dictionary['unable_add_new_word'])
+
+        self.resume_user_word_sender(chat_id)
+
+    def menu_command_import_words(self, user, chat_id):
+        dictionary = self.get_dictionary(user)
+        if user.num_of_words >= self.MAX_WORDS_PER_USER:
+            self.clean_chat(chat_id)
+            self.send_message(chat_id, dictionary['maximum_words_exceeded'].format(
+                max_words_per_user=self.MAX_WORDS_PER_USER))
+        else:
+            self.pause_user_word_sender(chat_id)
+            self.clean_chat(chat_id)
+
+            callback_msg = self.send_message(chat_id, dictionary['send_words_to_import'].format(
+                max_words=self.MAX_WORDS_PER_USER - user.num_of_words))
+            self.register_next_step_handler(callback_msg, self.import_words_to_db)
+
+    def read_imported_text(self, message) -> str:
+        """
+        Returns the words list of the message - its text, or the content of its text file.
+        """
+        if not message.document:
+            return message.text or ''
+
+        assert message.document.file_size <= self.MAX_IMPORT_FILE_SIZE, "The file is too big"
+        file_info = self.get_file(message.document.file_id)
+        return self.download_file(file_info.file_path).decode('utf8', errors='ignore')
+
+    def import_words_to_db(self, message):
+        chat_id = message.chat.id
+        user = EnglishBotUser.get_user_by_chat_id(chat_id)
+        dictionary = self.get_dictionary(user)
+        user.messages.append(message.message_id)
+
+        try:
+            words, num_of_skipped = self.split_words_to_import(user, self.read_imported_text(message),
+                                                               self.MAX_WORDS_PER_USER)
+            logger.debug(f"Importing {len(words)} words, skipped {num_of_skipped} words (chat_id - '{chat_id}')")
+
+            translations = get_translations_in_bulk(words, dest=self.get_language(user))
+        except Exception as e:
+            logger.error(f"Couldn't import the words of chat id '{chat_id}'. Error: {e}")
+            self.clean_chat(chat_id)
+            self.send_message(chat_id, dictionary['unable_import_words'])
+            self.resume_user_word_sender(chat_id)
+            return
+
+        rows, added_words = self.build_imported_translations(chat_id, words, translations)
+        num_of_skipped += len(words) - len(added_words)
+
+        # all the translations of all the words are inserted at once
+        insertion_status = user.update_translations(rows) if rows else True
+
+        self.clean_chat(chat_id)
+        if insertion_status:
+            self.send_message(chat_id, dictionary['words_imported'].format(
+                num_of_added=len(added_words), added_words=", ".join(added_words), num_of_skipped=num_of_skipped))
         else:
-            self.send_message(chat_id, self.dictionary['unable_add_new_word'])
+            self.send_message(chat_id, dictionary['unable_import_words'])
 
         self.resume_user_word_sender(chat_id)
 
     def change_waiting_time(self, message):
         chat_id = message.chat.id
         user = EnglishBotUser.get_user_by_chat_id(chat_id)
+        dictionary = self.get_dictionary(user)
         user.messages.append(message.message_id)
 
         new_time = message.text
@@ -199,9 +218,9 @@ class EnglishBotTelebotExtension(BaseTelebotExtension):
             self.clean_chat(chat_id)
             update_status = user.update_delay_time(new_time)
             if update_status:
-                self.send_message(chat_id, self.dictionary['delay_time_changed_successfully'].format(new_time=new_time))
+                self.send_message(chat_id, dictionary['delay_time_changed_successfully'].format(new_time=new_time))
             else:
-                self.send_message(chat_id, self.dictionary['unable_change_delay_time'])
+                self.send_message(chat_id, dictionary['unable_change_delay_time'])
         except AssertionError as e:
             logger.error(
                 f"There was an assertion error. Error - '{e}'. | method - 'change_waiting_time' | message.text - "
@@ -209,44 +228,15 @@ class EnglishBotTelebotExtension(BaseTelebotExtension):
         finally:
             self.resume_user_word_sender(chat_id)
 
+    @timed('send_new_word', 'Sending a word exercise')
     def send_new_word(self, chat_id):
         user = EnglishBotUser.get_user_by_chat_id(chat_id)
 
-        en_words, priorities = user.get_sorted_words_and_their_priority()
-
-        chosen_en_word = random.choices(en_words, weights=priorities, k=1)[0]
-        en_words.remove(chosen_en_word)
-
-        chosen_translated_word = random.choice(user.user_translations[chosen_en_word]['translated_words'])
-
-        additional_random_en_words = []
-        while len(additional_random_en_words) < 3:
-            current_random_choice = random.choice(en_words)
-            if current_random_choice not in additional_random_en_words:
-                additional_random_en_words.append(current_random_choice)
-
-        random_translated_words = []
-        while additional_random_en_words:
-            current_en_word = additional_random_en_words.pop()
-            current_random_translated_word = random.choice(user.user_translations[current_en_word]['translated_words'])
-            random_translated_words.append(current_random_translated_word)
-
-        random_translated_words.append(chosen_translated_word)
-
-        random.shuffle(random_translated_words)
-
-        reply_markup = InlineKeyboardMarkup()
-        options = [InlineKeyboardButton(button_translated_word,
-                                        callback_data=f'c:{chosen_translated_word}|{button_translated_word}') for
-                   button_translated_word in random_translated_words]
-
-        for option in options:
-            reply_markup.row(option)
+        chosen_en_word, text, reply_markup = self.build_new_word_exercise(user)
 
         self.clean_chat(chat_id)
 
-        self.send_message(chat_id, self.dictionary['choose_translation'].format(chosen_en_word=chosen_en_word),
-                          reply_markup=reply_markup)
+        self.send_message(chat_id, text, reply_markup=reply_markup)
         logger.debug(f"sent word '{chosen_en_word}' to chat id - '{chat_id}'")
 
         # increase usage of the chosen word
@@ -254,34 +244,118 @@ class EnglishBotTelebotExtension(BaseTelebotExtension):
 
         self.pause_user_word_sender(chat_id)
 
+    def change_language(self, chat_id, language: str):
+        user = EnglishBotUser.get_user_by_chat_id(chat_id)
+        if language not in self.dictionaries:
+            logger.warning(f"There is no dictionary for the language '{language}' (chat_id - '{chat_id}')")
+            return
+
+        update_status = user.update_language(language)
+        dictionary = self.get_dictionary(user)
+
+        self.clean_chat(chat_id)
+        if update_status:
+            self.send_message(chat_id, dictionary['language_changed'])
+        else:
+            self.send_message(chat_id, dictionary['unable_change_language'])
+
+        self.show_menu(chat_id)
+
     def delete_word(self, chat_id, en_word):
         user = EnglishBotUser.get_user_by_chat_id(chat_id)
+        dictionary = self.get_dictionary(user)
 
         delete_status = user.delete_word(en_word)
 
         self.clean_chat(chat_id)
         if delete_status:
-            self.send_message(chat_id, self.dictionary['word_deleted_successfully'].format(en_word=en_word))
+            self.send_message(chat_id, dictionary['word_deleted_successfully'].format(en_word=en_word))
             if user.word_sender_active and user.num_of_words < self.MIN_WORDS_PER_USER:
-                self.send_message(chat_id, self.dictionary['automatic_words_sender_has_stopped'].format(
+                self.send_message(chat_id, dictionary['automatic_words_sender_has_stopped'].format(
                     num_of_words=user.num_of_words))
         else:
-            self.send_message(chat_id, self.dictionary['word_deletion_failed'])
+            self.send_message(chat_id, dictionary['word_deletion_failed'])
 
-    def infinity_polling(self, **kwargs):
-        active_users: "Mapping[int, EnglishBotUser]" = EnglishBotUser.active_users
+    def start_word_senders(self):
+        EnglishBotUser.word_scheduler.start()
 
         logger.debug("Activating users...")
-        for chat_id, active_user in active_users.items():
-            if active_user.word_sender_active:
-                active_user.activate_word_sender()
+        # the users are scheduled without loading them, a user is loaded once its first word is sent
+        for chat_id in EnglishBotUser.active_users.get_active_senders():
+            EnglishBotUser.word_scheduler.schedule(chat_id, random.uniform(0, self.ACTIVATION_JITTER))
+
+    def infinity_polling(self, **kwargs):
+        self.start_word_senders()
 
         super().infinity_polling(timeout=10, long_polling_timeout=5, **kwargs)
 
-    @staticmethod
-    def pause_user_word_sender(chat_id):
+    def run_webhook(self, webhook_server, webhook_url: str = None):
+        """
+        Receives the updates with the webhook server instead of polling them.
+        :param webhook_server: WebhookServer instance, its dispatcher must be started
+        :param webhook_url: public URL of the server to register in Telegram. Without it the webhook isn't
+        registered, so the server only gets updates that are posted to it locally.
+        """
+        self.start_word_senders()
+
+        if webhook_url:
+            logger.debug(f"Registering the webhook - {webhook_url}")
+            self.remove_webhook()
+            self.set_webhook(url=webhook_url, secret_token=webhook_server.secret_token,
+                             max_connections=webhook_server.dispatcher.max_workers)
+
+        webhook_server.serve_forever()
+
+    def schedule_follow_up(self, chat_id, delay: float, action, *args):
+        """
+        Runs the action after the delay, on the chat dispatcher so it's serialized with the handlers of the chat.
+        The handler that schedules it returns right away instead of sleeping. A chat has a single pending
+        follow-up - it replaces the previous one, and it's dropped by 'cancel_follow_up'.
+        """
+        with self._follow_ups_lock:
+            token = next(self._follow_up_tokens)
+            timer = EnglishBotUser.timer_service.call_later(delay, self._dispatch_follow_up, chat_id, token,
+                                                            action, *args)
+            previous_follow_up = self._follow_ups.get(chat_id)
+            self._follow_ups[chat_id] = (token, timer)
+
+        if previous_follow_up:
+            previous_follow_up[1].cancel()
+
+    def cancel_follow_up(self, chat_id):
+        with self._follow_ups_lock:
+            follow_up = self._follow_ups.pop(chat_id, None)
+
+        if follow_up:
+            follow_up[1].cancel()
+
+    def _dispatch_follow_up(self, chat_id, token: int, action, *args):
+        if not EnglishBotUser.chat_dispatcher.submit(chat_id, self._run_follow_up, chat_id, token, action, *args):
+            logger.warning(f"The chat dispatcher is full, will try the follow-up of chat id '{chat_id}' again in "
+                           f"{self.FOLLOW_UP_RETRY_DELAY} seconds")
+            with self._follow_ups_lock:
+                follow_up = self._follow_ups.get(chat_id)
+                if follow_up and follow_up[0] == token:
+                    timer = EnglishBotUser.timer_service.call_later(self.FOLLOW_UP_RETRY_DELAY,
+                                                                    self._dispatch_follow_up, chat_id, token,
+                                                                    action, *args)
+                    self._follow_ups[chat_id] = (token, timer)
+
+    def _run_follow_up(self, chat_id, token: int, action, *args):
+        # a handler of the chat may have cancelled or replaced the follow-up after its timer fired
+        with self._follow_ups_lock:
+            follow_up = self._follow_ups.get(chat_id)
+            if not follow_up or follow_up[0] != token:
+                return
+            del self._follow_ups[chat_id]
+
+        action(*args)
+
+    def pause_user_word_sender(self, chat_id):
         active_users: "Mapping[int, EnglishBotUser]" = EnglishBotUser.active_users
 
+        # a pending resume of an answered word would send words in the middle of the menu
+        self.cancel_follow_up(chat_id)
         active_users[chat_id].pause_sender()
 
     @staticmethod
@@ -291,15 +365,19 @@ class EnglishBotTelebotExtension(BaseTelebotExtension):
         active_users[chat_id].resume_sender()
 
     def close(self):
+        EnglishBotUser.word_scheduler.stop()
+
         for chat_id, active_user in EnglishBotUser.active_users.items():
             active_user.close()
             self.clean_chat(chat_id)
 
     def init_handlers(self):
         @self.callback_query_handler(func=lambda call: True)
+        @timed('handle_query', 'Handling a callback query (a button press)')
         def handle_query(call):
             chat_id = call.message.chat.id
             current_user: "EnglishBotUser" = EnglishBotUser.get_user_by_chat_id(chat_id)
+            dictionary = self.get_dictionary(current_user)
 
             data = call.data
             if data.startswith("menu:"):
@@ -316,13 +394,13 @@ class EnglishBotTelebotExtension(BaseTelebotExtension):
                         if not current_sender_status:
                             if current_user.num_of_words >= self.MIN_WORDS_PER_USER:
                                 current_user.activate_word_sender()
-                                self.send_message(chat_id, self.dictionary['automatic_word_sender_started'])
+                                self.send_message(chat_id, dictionary['automatic_word_sender_started'])
                             else:
-                                self.send_message(chat_id, self.dictionary['not_enough_words_to_start'].format(
+                                self.send_message(chat_id, dictionary['not_enough_words_to_start'].format(
                                     min_words_per_user=self.MIN_WORDS_PER_USER))
                         elif current_sender_status:
                             current_user.deactivate_word_sender()
-                            self.send_message(chat_id, self.dictionary['automatic_word_sender_stopped'])
+                            self.send_message(chat_id, dictionary['automatic_word_sender_stopped'])
 
                     # Word list & remove method
                     elif button_id == '3':
@@ -333,7 +411,7 @@ class EnglishBotTelebotExtension(BaseTelebotExtension):
                     # Change waiting time
                     elif button_id == '4':
                         self.pause_user_word_sender(chat_id)
-                        callback_msg = self.send_message(chat_id, self.dictionary['send_a_new_delay_time'])
+                        callback_msg = self.send_message(chat_id, dictionary['send_a_new_delay_time'])
                         self.register_next_step_handler(callback_msg, self.change_waiting_time)
 
                     # Word list just for practise
@@ -344,7 +422,12 @@ class EnglishBotTelebotExtension(BaseTelebotExtension):
 
                     # Help button
                     elif button_id == '6':
-                        self.send_message(chat_id, self.dictionary['help_message'])
+                        self.send_message(chat_id, dictionary['help_message'])
+
+                    # Change language
+                    elif button_id == '7':
+                        self.clean_chat(chat_id)
+                        self.show_languages_menu(chat_id)
                 else:
                     logger(f"The user trying to press on button {button_id} but the chat is locked")
 
@@ -356,16 +439,15 @@ class EnglishBotTelebotExtension(BaseTelebotExtension):
                 translated_word, chosen_translated_word = button_callback.split('|')
 
                 self.clean_chat(chat_id)
-                prefix = self.dictionary['next_word_eta'].format(delay_time=current_user.delay_time)
 
-                if translated_word == chosen_translated_word:
-                    self.send_message(chat_id, self.dictionary['correct_choice'] + prefix)
-                    time.sleep(1)
-                else:
-                    self.send_message(chat_id, self.dictionary['wrong_choice'].format(translated_word=translated_word) + prefix)
-                    time.sleep(1)
+                self.send_message(chat_id, self.build_answer_feedback(current_user, translated_word,
+                                                                      chosen_translated_word))
 
-                self.resume_user_word_sender(chat_id)
+                self.schedule_follow_up(chat_id, self.ANSWER_FOLLOW_UP_DELAY, self.resume_user_word_sender, chat_id)
+
+            # Language choice
+            elif data.startswith("lang:"):
+                self.change_language(chat_id, data.replace('lang:', ''))
 
             # Ranges list
             elif data.startswith("range_words:"):
@@ -404,10 +486,10 @@ class EnglishBotTelebotExtension(BaseTelebotExtension):
                 current_user.messages.append(message.message_id)
                 self.show_menu(chat_id)
             else:
-                EnglishBotUser.new_user(chat_id)
+                EnglishBotUser.new_user(chat_id, language=self.lang)
 
                 self.show_menu(chat_id)
-                self.send_message(chat_id, self.dictionary['must_add_4_words_before_statring'])
+                self.send_message(chat_id, self.get_dictionary()['must_add_4_words_before_statring'])
 
         @self.message_handler(commands=['priorities'])
         def new_word_command(message):
@@ -444,6 +526,29 @@ class EnglishBotTelebotExtension(BaseTelebotExtension):
                 self.clean_chat(chat_id)
                 self.show_menu(chat_id)
 
+        @self.message_handler(commands=['import'])
+        def import_command(message):
+            chat_id = message.chat.id
+            current_user: "EnglishBotUser" = EnglishBotUser.get_user_by_chat_id(chat_id)
+
+            if current_user:
+                current_user.messages.append(message.message_id)
+
+            if not current_user.is_locked():
+                self.menu_command_import_words(current_user, chat_id)
+
+        @self.message_handler(commands=['language'])
+        def language_command(message):
+            chat_id = message.chat.id
+            current_user: "EnglishBotUser" = EnglishBotUser.get_user_by_chat_id(chat_id)
+
+            if current_user:
+                current_user.messages.append(message.message_id)
+
+            if not current_user.is_locked():
+                self.clean_chat(chat_id)
+                self.show_languages_menu(chat_id)
+
         @self.message_handler(commands=['add'])
         def new_word_command(message):
             chat_id = message.chat.id
@@ -1,158 +1,374 @@
 import time
+from itertools import groupby
+from operator import itemgetter
+from typing import Iterator, NamedTuple, Optional
 
 from helpers.loggers import get_logger
+from helpers.multiple_languages import DEFAULT_LANGUAGE
 
-from core.word_sender import WordSender
+from core.user_registry import UserRegistry
+from core.user_translations import UserTranslations
+from core.outbound_queue import send_priority, SCHEDULED_PRIORITY
 
 logger = get_logger(__file__)
 
 
+class UserMetadata(NamedTuple):
+    """
+    What is kept in memory of a user that isn't loaded.
+    """
+    word_sender_active: bool
+    delay_time: int
+    language: str
+    messages: Optional[tuple] = None
+    word_sender_paused: bool = False
+
+
 class EnglishBotUser:
-    active_users = {}
+    # hundreds of thousands of users are kept in memory, so they have no per-instance __dict__
+    __slots__ = ('chat_id', '_messages', 'word_sender_active', 'delay_time', 'language', 'user_translations',
+                 'translations_version', '_views_cache', '_sorted_words', 'word_sender_paused')
+
+    active_users = UserRegistry()
     db_connector = None
     global_bot = None
+    word_scheduler = None
+    usages_buffer = None
+    chat_dispatcher = None
+    timer_service = None
+    shard_membership = None
+    SEND_RETRIES = 3
+    DISPATCH_RETRY_DELAY = 5
 
     @staticmethod
     def get_user_by_chat_id(chat_id: int):
         return EnglishBotUser.active_users.get(chat_id)
 
     @staticmethod
-    def load_users_and_global_instances(global_bot, db_connector):
+    def merge_rows_by_chat_id(translations: Iterator[tuple], usages: Iterator[tuple]) -> Iterator[tuple]:
+        """
+        Joins the translations and the usages of every chat in a single pass, one chat at a time.
+        :param translations: (chat_id, en_word, translated_word) rows ordered by chat_id
+        :param usages: (chat_id, en_word, usages) rows ordered by chat_id
+        :return: iterator of (chat_id, list of (en_word, translated_word), list of (en_word, usages)) of the chats
+        that have translations
+        """
+        usages_groups = groupby(usages, key=itemgetter(0))
+        usages_chat_id, chat_usages = next(usages_groups, (None, None))
+
+        for chat_id, chat_translations in groupby(translations, key=itemgetter(0)):
+            while usages_chat_id is not None and usages_chat_id < chat_id:
+                usages_chat_id, chat_usages = next(usages_groups, (None, None))
+
+            yield (chat_id, [row[1:] for row in chat_translations],
+                   [row[1:] for row in chat_usages] if usages_chat_id == chat_id else [])
+
+    @staticmethod
+    def read_users_metadata() -> dict:
+        """
+        Streams the users table.
+        :return: dict of chat_id -> UserMetadata of the users (of the chats of this shard)
+        """
+        fetched_users = EnglishBotUser.db_connector.stream_all_values(
+            table_name='users_extended', fields=['chat_id', 'auto_send_active', 'delay_time', 'language'],
+            as_tuples=True)
+
+        return {chat_id: UserMetadata(word_sender_active=eval(auto_send_active), delay_time=delay_time,
+                                      language=language or DEFAULT_LANGUAGE)
+                for chat_id, auto_send_active, delay_time, language in fetched_users
+                if EnglishBotUser.is_owned_chat(chat_id)}
+
+    @staticmethod
+    def load_users_and_global_instances(global_bot, db_connector, word_scheduler, usages_buffer,
+                                        chat_dispatcher=None, timer_service=None, user_registry=None,
+                                        shard_membership=None):
+        """
+        :param user_registry: UserRegistry that loads the users on demand - only the users table is read at
+        startup. All the users and their words are loaded right away if not provided.
+        :param shard_membership: ShardMembership of a shard worker, which only knows the users of its chats
+        (requires the user registry)
+        """
         logger.debug(f"Setting global instances...")
         EnglishBotUser.db_connector = db_connector
         EnglishBotUser.global_bot = global_bot
+        EnglishBotUser.word_scheduler = word_scheduler
+        EnglishBotUser.usages_buffer = usages_buffer
+        EnglishBotUser.chat_dispatcher = chat_dispatcher
+        EnglishBotUser.timer_service = timer_service
+        EnglishBotUser.shard_membership = shard_membership
+
+        if user_registry is not None:
+            EnglishBotUser.active_users = user_registry
+            EnglishBotUser.load_users_metadata()
+            return
 
         logger.debug(f"Loading existing users from DB...")
-        fetched_users = db_connector.get_all_values_by_field(table_name='users_extended')
-        for user in fetched_users:
-            user_translations = db_connector.get_all_values_by_field(table_name='translations',
-                                                                     condition_field='chat_id',
-                                                                     condition_value=user['chat_id'])
-            EnglishBotUser.active_users[user['chat_id']] = EnglishBotUser(chat_id=user['chat_id'],
-                                                                          word_sender_active=eval(
-                                                                              user['auto_send_active']),
-                                                                          delay_time=user['delay_time'],
-                                                                          user_translations=user_translations)
+        started_at = time.perf_counter()
+        users_metadata = EnglishBotUser.read_users_metadata()
+        num_of_users = len(users_metadata)
+        users_loaded_at = time.perf_counter()
+
+        # both tables are streamed side by side, only the rows of a single chat are held at a time
+        fetched_translations = db_connector.stream_all_values(table_name='translations',
+                                                              fields=['chat_id', 'en_word', 'translated_word'],
+                                                              order_by_field='chat_id', as_tuples=True)
+        fetched_usages = db_connector.stream_all_values(table_name='usages', fields=['chat_id', 'en_word', 'usages'],
+                                                        order_by_field='chat_id', as_tuples=True)
+
+        num_of_translations = 0
+        for chat_id, translations, usages in EnglishBotUser.merge_rows_by_chat_id(fetched_translations,
+                                                                                  fetched_usages):
+            metadata = users_metadata.pop(chat_id, None)
+            if metadata is None:
+                continue
+
+            num_of_translations += len(translations)
+            EnglishBotUser(chat_id=chat_id, word_sender_active=metadata.word_sender_active,
+                           delay_time=metadata.delay_time, language=metadata.language,
+                           user_translations=UserTranslations.from_pairs(translations, usages))
+
+        # the users without words
+        for chat_id, metadata in users_metadata.items():
+            EnglishBotUser(chat_id=chat_id, word_sender_active=metadata.word_sender_active,
+                           delay_time=metadata.delay_time, language=metadata.language)
+        finished_at = time.perf_counter()
+
+        logger.info(f"Loaded {num_of_users} users and {num_of_translations} translations in "
+                    f"{finished_at - started_at:.3f}s (users query - {users_loaded_at - started_at:.3f}s, "
+                    f"translations and usages streaming - {finished_at - users_loaded_at:.3f}s)")
+
+    @staticmethod
+    def is_owned_chat(chat_id: int) -> bool:
+        return not EnglishBotUser.shard_membership or EnglishBotUser.shard_membership.owns(chat_id)
 
     @staticmethod
-    def new_user(chat_id):
-        EnglishBotUser(chat_id=chat_id)
-        EnglishBotUser.db_connector.insert_row(table_name='users', keys_values={'chat_id': chat_id})
+    def load_users_metadata() -> dict:
+        """
+        Loads the metadata of the users (of the chats of this shard) that aren't known yet.
+        :return: dict of chat_id -> UserMetadata of the new users
+        """
+        logger.debug(f"Loading the metadata of the existing users from DB...")
+        started_at = time.perf_counter()
+        try:
+            users_metadata = EnglishBotUser.read_users_metadata()
+        except Exception as e:
+            logger.error(f"Couldn't load the metadata of the users. Error - {e}")
+            return {}
+
+        new_users_metadata = EnglishBotUser.active_users.add_known_users(users_metadata, EnglishBotUser.load_user)
+
+        logger.info(f"Loaded the metadata of {len(new_users_metadata)} users in "
+                    f"{time.perf_counter() - started_at:.3f}s, their words are loaded on their first use")
+        return new_users_metadata
+
+    @staticmethod
+    def rebalance_users():
+        """
+        Called when the shards members change - drops the users whose chats moved to other shards (their
+        buffered usages are flushed first) and takes over the users of the chats that moved to this shard.
+        """
+        user_registry = EnglishBotUser.active_users
+
+        moved_chat_ids = [chat_id for chat_id in user_registry.get_chat_ids()
+                          if not EnglishBotUser.is_owned_chat(chat_id)]
+        for chat_id in moved_chat_ids:
+            EnglishBotUser.word_scheduler.cancel(chat_id)
+            # on the dispatcher, so a handler of the chat that is already running finishes first
+            chat_dispatcher = EnglishBotUser.chat_dispatcher
+            if not chat_dispatcher or not chat_dispatcher.submit(chat_id, user_registry.forget, chat_id):
+                user_registry.forget(chat_id)
+
+        new_users_metadata = EnglishBotUser.load_users_metadata()
+        for chat_id, metadata in new_users_metadata.items():
+            if metadata.word_sender_active:
+                EnglishBotUser.word_scheduler.schedule(chat_id, metadata.delay_time * 60)
+
+        logger.info(f"Rebalanced the users - {len(moved_chat_ids)} moved out, {len(new_users_metadata)} moved in")
+
+    @staticmethod
+    def load_user(chat_id: int, metadata: UserMetadata) -> "EnglishBotUser":
+        """
+        Loads the words of a single user and creates it.
+        """
+        user_translations = EnglishBotUser.db_connector.get_rows_by_field(table_name='translations',
+                                                                          condition_field='chat_id',
+                                                                          condition_value=chat_id)
+        user_usages = EnglishBotUser.db_connector.get_rows_by_field(table_name='usages', condition_field='chat_id',
+                                                                    condition_value=chat_id)
+        if user_translations is False or user_usages is False:
+            raise RuntimeError(f"Couldn't load the words of chat id '{chat_id}'")
+
+        user = EnglishBotUser(chat_id=chat_id, word_sender_active=metadata.word_sender_active,
+                              delay_time=metadata.delay_time, language=metadata.language,
+                              user_translations=user_translations, user_usages=user_usages)
+        if metadata.messages:
+            user.messages = list(metadata.messages)
+        # dropped in the middle of a menu, the word sender resumes once the menu is done
+        user.word_sender_paused = metadata.word_sender_paused
+
+        return user
+
+    def get_metadata(self) -> UserMetadata:
+        return UserMetadata(word_sender_active=self.word_sender_active, delay_time=self.delay_time,
+                            language=self.language, messages=tuple(self._messages) if self._messages else None,
+                            word_sender_paused=self.word_sender_paused)
+
+    def flush_state(self) -> bool:
+        """
+        Writes the buffered usages of the user, before it's dropped from memory.
+        """
+        return EnglishBotUser.usages_buffer.flush(self.chat_id) if EnglishBotUser.usages_buffer else True
+
+    @staticmethod
+    def new_user(chat_id, language: str = DEFAULT_LANGUAGE):
+        EnglishBotUser(chat_id=chat_id, language=language)
+        EnglishBotUser.db_connector.insert_row(table_name='users', keys_values={'chat_id': chat_id,
+                                                                              'language': language})
 
     def __init__(self, chat_id: int, word_sender_active: bool = False, delay_time: int = 20,
-                 user_translations: list = None):
+                 user_translations: list = None, user_usages: list = None, language: str = DEFAULT_LANGUAGE):
         self.chat_id = chat_id
-        self.word_sender = None
-        self.messages = []
+        # the messages list and the views cache are created once the user interacts with the bot
+        self._messages = None
         self.word_sender_active = word_sender_active
         self.delay_time = delay_time
-        self.user_translations = self.convert_db_translation_into_a_dict(user_translations) if user_translations else {}
+        self.language = language
+        if isinstance(user_translations, UserTranslations):
+            self.user_translations = user_translations
+        else:
+            self.user_translations = UserTranslations.from_rows(user_translations, user_usages)
+        self.translations_version = 0
+        self._views_cache = None
+        self._sorted_words = None
         self.word_sender_paused = False
 
         EnglishBotUser.active_users[chat_id] = self
 
     @property
     def num_of_words(self):
-        return len(self.user_translations.keys())
+        return len(self.user_translations)
 
-    @staticmethod
-    def convert_db_translation_into_a_dict(translations: list) -> dict:
-        trans_as_a_dict = {}
-        for translation in translations:
-            if translation['en_word'] in trans_as_a_dict.keys():
-                trans_as_a_dict[translation['en_word']]['translated_words'].append(translation['translated_word'])
-            else:
-                trans_as_a_dict[translation['en_word']] = {
-                    'translated_words': [translation['translated_word']],
-                    'usages': 0
-                }
-        return trans_as_a_dict
+    @property
+    def messages(self) -> list:
+        if self._messages is None:
+            self._messages = []
+        return self._messages
 
-    def increase_word_usages(self, en_word: str):
-        self.user_translations[en_word]['usages'] += 1
-        logger.debug(f"Increased the number of usages of the word - '{en_word}'."
-                     f" The current value is {self.user_translations[en_word]['usages']}.")
+    @messages.setter
+    def messages(self, messages: list):
+        self._messages = messages or None
+
+    @property
+    def views_cache(self) -> dict:
+        if self._views_cache is None:
+            self._views_cache = {}
+        return self._views_cache
 
-    def get_sorted_words_and_their_priority(self) -> tuple:
-        sorted_words = []
-        priorities = []
-        for word, details in sorted(self.user_translations.items()):
-            sorted_words.append(word)
-            priorities.append(details['usages'])
+    def get_translated_words(self, en_word: str) -> tuple:
+        return self.user_translations.translated_words(en_word)
 
-        priorities = [1.0 / (priority + 1) for priority in priorities]
-        return sorted_words, priorities
+    def get_word_usages(self, en_word: str) -> int:
+        return self.user_translations.usages(en_word)
+
+    def increase_word_usages(self, en_word: str):
+        usages = self.user_translations.increase_usages(en_word)
+        if EnglishBotUser.usages_buffer:
+            EnglishBotUser.usages_buffer.mark_dirty(self.chat_id, en_word, usages)
+        logger.debug(f"Increased the number of usages of the word - '{en_word}'. The current value is {usages}.")
 
     def get_user_sorted_words(self):
-        return sorted(self.user_translations.keys())
+        if not self._sorted_words or self._sorted_words[0] != self.translations_version:
+            self._sorted_words = (self.translations_version, sorted(self.user_translations.keys()))
 
-    def new_words_worker(self):
-        got_exception = 0
+        return self._sorted_words[1]
 
-        while True:
-            if self.word_sender.is_stopped:
-                logger.debug(f"The word sender of chat id '{self.chat_id}' was stopped")
-                break
+    def bump_translations_version(self):
+        """
+        Invalidates everything that was computed from the user's words (sorted words, cached keyboards).
+        """
+        self.translations_version += 1
+        self._views_cache = None
 
+    @staticmethod
+    def dispatch_scheduled_word(chat_id: int):
+        """
+        The word scheduler callback - sends the word on the chat dispatcher, so it never runs concurrently
+        with the handlers of the same chat.
+        """
+        if EnglishBotUser.chat_dispatcher.submit(chat_id, EnglishBotUser.send_scheduled_word, chat_id):
+            return
+
+        logger.warning(f"The chat dispatcher is full, will try to send the word of chat id '{chat_id}' "
+                       f"again in {EnglishBotUser.DISPATCH_RETRY_DELAY} seconds")
+        EnglishBotUser.word_scheduler.schedule(chat_id, EnglishBotUser.DISPATCH_RETRY_DELAY)
+
+    @staticmethod
+    def send_scheduled_word(chat_id: int):
+        """
+        The word scheduler callback - sends a new word to the user whose deadline has passed.
+        """
+        user = EnglishBotUser.get_user_by_chat_id(chat_id)
+        if not user or not user.word_sender_active or user.word_sender_paused:
+            logger.debug(f"Skipping the scheduled word of chat id '{chat_id}'")
+            return
+
+        for attempt in range(1, EnglishBotUser.SEND_RETRIES + 1):
             try:
-                EnglishBotUser.global_bot.send_new_word(self.chat_id)
+                # interactive replies of other users are sent before the scheduled exercises
+                with send_priority(SCHEDULED_PRIORITY):
+                    EnglishBotUser.global_bot.send_new_word(chat_id)
+                return
             # TODO: change this exception to something better
             except Exception as e:
-                logger.debug(f"Got exception - {e}")
-                if got_exception >= 3:
-                    raise Exception(e)
-
-                got_exception += 1
-                continue
-
-            got_exception = 0
-            while self.word_sender_paused:
-                if self.word_sender.is_stopped:
-                    break
-                time.sleep(1)
+                logger.debug(f"Got exception (attempt {attempt}/{EnglishBotUser.SEND_RETRIES}) - {e}")
 
-            logger.debug(f"WordSender | Sleeping {self.delay_time} minutes")
-            time.sleep(self.delay_time * 60)
+        logger.error(f"Didn't manage to send a new word to chat id '{chat_id}', "
+                     f"will try again in {user.delay_time} minutes")
+        EnglishBotUser.word_scheduler.schedule(chat_id, user.delay_time * 60)
 
     def is_locked(self):
         return self.word_sender_paused
 
-    def activate_word_sender(self):
+    def activate_word_sender(self, delay: float = 0):
+        """
+        :param delay: seconds until the first word is sent
+        """
         logger.debug(f"Activating word sender (chat_id={self.chat_id})")
 
-        self.word_sender = WordSender(chat_id=self.chat_id,
-                                      delay_time=self.delay_time,
-                                      target=self.new_words_worker)
-        self.word_sender.start()
+        EnglishBotUser.word_scheduler.schedule(self.chat_id, delay)
 
         # TODO: change the following to celery task
         if not self.word_sender_active:
+            # auto_send_active is stored as text ('True' / 'False')
             self.db_connector.update_field(table_name='users', field='auto_send_active', condition_field='chat_id',
-                                           condition_value=self.chat_id, value=True)
+                                           condition_value=self.chat_id, value=str(True))
             self.word_sender_active = True
 
     def pause_sender(self):
         logger.debug(f"Pausing word sender (chat_id={self.chat_id})")
         self.word_sender_paused = True
+        EnglishBotUser.word_scheduler.cancel(self.chat_id)
 
     def resume_sender(self):
         logger.debug(f"Resuming word sender (chat_id={self.chat_id})")
         self.word_sender_paused = False
 
+        if self.word_sender_active and not EnglishBotUser.word_scheduler.is_scheduled(self.chat_id):
+            logger.debug(f"WordSender | Next word in {self.delay_time} minutes (chat_id={self.chat_id})")
+            EnglishBotUser.word_scheduler.schedule(self.chat_id, self.delay_time * 60)
+
     def deactivate_word_sender(self):
         logger.debug(f"Deactivating word sender (chat_id={self.chat_id})")
 
         # change the status in DB
         self.db_connector.update_field(table_name='users', field='auto_send_active', condition_field='chat_id',
-                                       condition_value=self.chat_id, value=False)
+                                       condition_value=self.chat_id, value=str(False))
 
         # change in the object (mem)
         self.word_sender_active = False
 
-        # stop the thread
-        if self.word_sender:
-            self.word_sender.stop()
-            self.word_sender = None
+        # drop the scheduled deadline
+        EnglishBotUser.word_scheduler.cancel(self.chat_id)
 
     def delete_word(self, en_word: str) -> bool:
         logger.debug(f"Deleting word ({en_word})")
@@ -162,7 +378,13 @@ class EnglishBotUser:
                                                           second_value_condition=self.chat_id)
 
         if delete_status:
-            self.user_translations.pop(en_word)
+            self.user_translations.remove(en_word)
+            self.bump_translations_version()
+
+            if EnglishBotUser.usages_buffer:
+                EnglishBotUser.usages_buffer.discard(self.chat_id, en_word)
+            self.db_connector.delete_by_field(table_name='usages', field_condition='en_word', value_condition=en_word,
+                                              second_field_condition='chat_id', second_value_condition=self.chat_id)
 
         return delete_status
 
@@ -176,23 +398,32 @@ class EnglishBotUser:
 
         return update_status
 
+    def update_language(self, language: str) -> bool:
+        update_status = self.db_connector.update_field(table_name='users', condition_field='chat_id',
+                                                       condition_value=self.chat_id, field='language',
+                                                       value=language)
+
+        if update_status:
+            self.language = language
+            # the cached keyboards were rendered in the previous language
+            self.bump_translations_version()
+
+        return update_status
+
     def update_translations(self, translations) -> bool:
+        # the unique key of the translations would fail the whole batch on a repeated translation
+        translations = list({(translation['en_word'], translation['translated_word']): translation
+                             for translation in translations}.values())
         translations_insertion_status = self.db_connector.insert_multiple_rows(table_name='translations',
                                                                                keys_values=translations)
 
-        # usages_insertion_status = self.db_connector.insert_row(table_name='usages',
-        #                                                        keys_values={'en_word': translations[0]['en_word']})
-
         if translations_insertion_status:
-            self.user_translations.update(self.convert_db_translation_into_a_dict(translations))
+            new_translations = UserTranslations.from_rows(translations)
+            for en_word, translated_words, _ in new_translations.items():
+                self.user_translations.add(en_word, translated_words)
+            self.bump_translations_version()
 
         return translations_insertion_status
 
     def close(self):
-        if self.word_sender:
-            self.word_sender.stop()
-
-        # logger.debug(f"Updating usages table for user - '{self.chat_id}'...")
-        # self.db_connector.update_multiple_rows(table_name='usages',
-        #                                        keys_values={en_word: details['usages']
-        #                                                     for en_word, details in self.user_translations.items()})
+        EnglishBotUser.word_scheduler.cancel(self.chat_id)
@@ -0,0 +1,70 @@
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+from helpers.loggers import get_logger
+from helpers.metrics import MetricsRegistry
+
+logger = get_logger(__file__)
+
+
+class MetricsServer:
+    CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+    def __init__(self, registry: MetricsRegistry, host: str = '127.0.0.1', port: int = 9100, url_path: str = '/metrics'):
+        """
+        A local HTTP server that exposes the metrics of the bot in the Prometheus text format, e.g.
+        curl localhost:9100/metrics
+        :param registry: MetricsRegistry that renders the metrics on every request
+        :param host: listening host, local only by default
+        :param port: listening port
+        :param url_path: path of the metrics
+        """
+        self.registry = registry
+        self.host = host
+        self.port = port
+        self.url_path = url_path
+
+        self._server = ThreadingHTTPServer((host, port), self._create_request_handler())
+        self._server.daemon_threads = True
+        self._thread = None
+        self._is_serving = False
+
+    def _create_request_handler(self):
+        metrics_server = self
+
+        class RequestHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path != metrics_server.url_path:
+                    self.send_response(404)
+                    self.end_headers()
+                    return
+
+                body = metrics_server.registry.render().encode('utf8')
+                self.send_response(200)
+                self.send_header('Content-Type', MetricsServer.CONTENT_TYPE)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                logger.debug(f"{self.address_string()} - {format % args}")
+
+        return RequestHandler
+
+    def serve_forever(self):
+        logger.info(f"Serving the metrics on {self.host}:{self.port}{self.url_path}")
+        self._is_serving = True
+        try:
+            self._server.serve_forever()
+        finally:
+            self._is_serving = False
+
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever, name='metrics-server', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        logger.debug("Stopping metrics server...")
+        if self._is_serving:
+            self._server.shutdown()
+        self._server.server_close()
@@ -0,0 +1,269 @@
+import time
+import threading
+import contextvars
+from collections import deque
+from contextlib import contextmanager
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable
+
+from helpers.loggers import get_logger
+
+logger = get_logger(__file__)
+
+INTERACTIVE_PRIORITY = 0
+SCHEDULED_PRIORITY = 1
+CLEANUP_PRIORITY = 2
+
+_send_priority = contextvars.ContextVar('send_priority', default=INTERACTIVE_PRIORITY)
+
+
+@contextmanager
+def send_priority(priority: int):
+    """
+    Sets the priority of the requests that are sent by the current thread (or task) inside the block.
+    """
+    token = _send_priority.set(priority)
+    try:
+        yield
+    finally:
+        _send_priority.reset(token)
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float):
+        """
+        :param rate: tokens that are added per second
+        :param capacity: maximum number of tokens, i.e. the allowed burst
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+        self.blocked_until = 0.0
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def time_until_available(self, now: float) -> float:
+        self._refill(now)
+        missing_tokens_time = (1 - self.tokens) / self.rate if self.tokens < 1 else 0.0
+        return max(missing_tokens_time, self.blocked_until - now, 0.0)
+
+    def consume(self, now: float):
+        self._refill(now)
+        self.tokens -= 1
+
+    def is_idle(self, now: float) -> bool:
+        self._refill(now)
+        return self.tokens >= self.capacity and self.blocked_until <= now
+
+
+class OutboundRequest:
+    def __init__(self, chat_id, call: Callable, priority: int, sequence: int):
+        self.chat_id = chat_id
+        self.call = call
+        self.priority = priority
+        self.sequence = sequence
+        self.enqueued_at = time.monotonic()
+        self.rate_limit_retries = 0
+        self.future = Future()
+
+
+class OutboundQueue:
+    def __init__(self, global_rate: float = 30, chat_rate: float = 1, chat_burst: int = 3, max_workers: int = 8,
+                 max_rate_limit_retries: int = 3):
+        """
+        The single way out of the bot to Telegram - requests wait here until both the global token bucket and
+        the bucket of their chat allow them, and then run on a small worker pool.
+        Interactive replies go before scheduled exercises and both go before message deletions, while the requests
+        of a chat keep their order.
+        A request that is answered with 429 waits the 'retry_after' of the response and is sent again.
+        :param global_rate: requests per second of the whole bot
+        :param chat_rate: requests per second of a single chat
+        :param chat_burst: requests a chat may send at once before it's limited to 'chat_rate'
+        :param max_workers: number of requests that run at the same time
+        :param max_rate_limit_retries: number of 429 responses after which the request fails
+        """
+        self.max_workers = max_workers
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.max_rate_limit_retries = max_rate_limit_retries
+
+        self._global_bucket = TokenBucket(global_rate, global_rate)
+        self._chat_buckets = {}
+        self._chat_queues = {}
+        self._in_flight_chats = set()
+        self._condition = threading.Condition()
+        self._sequence = 0
+        self._executor = None
+        self._thread = None
+        self._is_stopped = True
+
+        self.sent = 0
+        self.failed = 0
+        self.rate_limited = 0
+        self.last_wait = 0.0
+        self.max_wait = 0.0
+
+    def start(self):
+        logger.debug(f"Starting outbound queue with {self.max_workers} workers")
+        self._is_stopped = False
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='outbound-sender')
+        self._thread = threading.Thread(target=self._run, name='outbound-queue', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        logger.debug("Stopping outbound queue")
+        with self._condition:
+            self._is_stopped = True
+            pending_requests = [request for chat_queue in self._chat_queues.values() for request in chat_queue]
+            self._chat_queues.clear()
+            self._condition.notify()
+
+        for request in pending_requests:
+            request.future.set_exception(RuntimeError("The outbound queue is stopped"))
+
+        if self._thread:
+            self._thread.join()
+        if self._executor:
+            self._executor.shutdown(wait=True)
+
+    def send(self, chat_id, call: Callable, *args, **kwargs):
+        """
+        Runs the API call once the rate limits allow it and returns its result.
+        The priority is the one that was set with 'send_priority', interactive by default.
+        """
+        with self._condition:
+            is_stopped = self._is_stopped
+            if not is_stopped:
+                self._sequence += 1
+                request = OutboundRequest(chat_id, lambda: call(*args, **kwargs), _send_priority.get(),
+                                          self._sequence)
+                self._chat_queues.setdefault(chat_id, deque()).append(request)
+                self._condition.notify()
+
+        # before the queue is started (and after it's stopped) the requests go out directly
+        if is_stopped:
+            return call(*args, **kwargs)
+
+        return request.future.result()
+
+    def _get_chat_bucket(self, chat_id) -> TokenBucket:
+        chat_bucket = self._chat_buckets.get(chat_id)
+        if not chat_bucket:
+            chat_bucket = self._chat_buckets[chat_id] = TokenBucket(self.chat_rate, self.chat_burst)
+        return chat_bucket
+
+    def _pick_request(self, now: float):
+        """
+        :return: tuple of (the request that may be sent now or None, seconds to wait otherwise)
+        """
+        if not self._chat_queues:
+            return None, None
+
+        global_wait = self._global_bucket.time_until_available(now)
+        if global_wait > 0:
+            return None, global_wait
+
+        # only the oldest request of a chat may go, so the chat's requests keep their order
+        chats_heads = sorted((chat_queue[0] for chat_id, chat_queue in self._chat_queues.items()
+                              if chat_id not in self._in_flight_chats),
+                             key=lambda request: (request.priority, request.sequence))
+
+        min_wait = None
+        for request in chats_heads:
+            chat_wait = self._get_chat_bucket(request.chat_id).time_until_available(now)
+            if chat_wait <= 0:
+                return request, 0.0
+            min_wait = chat_wait if min_wait is None else min(min_wait, chat_wait)
+
+        return None, min_wait
+
+    def _forget_idle_chats(self, now: float):
+        for chat_id in [chat_id for chat_id, chat_bucket in self._chat_buckets.items()
+                        if chat_id not in self._chat_queues and chat_bucket.is_idle(now)]:
+            del self._chat_buckets[chat_id]
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._is_stopped:
+                    request, wait = self._pick_request(time.monotonic())
+                    if request:
+                        break
+                    self._condition.wait(wait)
+
+                if self._is_stopped:
+                    return
+
+                now = time.monotonic()
+                chat_queue = self._chat_queues[request.chat_id]
+                chat_queue.popleft()
+                if not chat_queue:
+                    del self._chat_queues[request.chat_id]
+
+                self._global_bucket.consume(now)
+                self._get_chat_bucket(request.chat_id).consume(now)
+                self._in_flight_chats.add(request.chat_id)
+
+                self.last_wait = now - request.enqueued_at
+                self.max_wait = max(self.max_wait, self.last_wait)
+
+                if len(self._chat_buckets) > 10000:
+                    self._forget_idle_chats(now)
+
+            self._executor.submit(self._execute, request)
+
+    def _execute(self, request: OutboundRequest):
+        try:
+            result = request.call()
+        except Exception as e:
+            # ApiTelegramException of a 'Too Many Requests' response
+            if getattr(e, 'error_code', None) == 429 and request.rate_limit_retries < self.max_rate_limit_retries:
+                self._retry_later(request, e)
+                return
+
+            self._finish(request, is_failed=True)
+            request.future.set_exception(e)
+        else:
+            self._finish(request)
+            request.future.set_result(result)
+
+    def _retry_later(self, request: OutboundRequest, error: Exception):
+        retry_after = ((getattr(error, 'result_json', None) or {}).get('parameters') or {}).get('retry_after', 1)
+        logger.warning(f"Got 429 for chat id '{request.chat_id}', sending again in {retry_after} seconds")
+
+        with self._condition:
+            if self._is_stopped:
+                self._in_flight_chats.discard(request.chat_id)
+                request.future.set_exception(error)
+                return
+
+            request.rate_limit_retries += 1
+            self.rate_limited += 1
+            self._get_chat_bucket(request.chat_id).blocked_until = time.monotonic() + retry_after
+            self._chat_queues.setdefault(request.chat_id, deque()).appendleft(request)
+            self._in_flight_chats.discard(request.chat_id)
+            self._condition.notify()
+
+    def _finish(self, request: OutboundRequest, is_failed: bool = False):
+        with self._condition:
+            self._in_flight_chats.discard(request.chat_id)
+            if is_failed:
+                self.failed += 1
+            else:
+                self.sent += 1
+            self._condition.notify()
+
+    def metrics(self) -> dict:
+        with self._condition:
+            return {
+                'pending': sum(len(chat_queue) for chat_queue in self._chat_queues.values()),
+                'in_flight': len(self._in_flight_chats),
+                'sent': self.sent,
+                'failed': self.failed,
+                'rate_limited': self.rate_limited,
+                'last_wait': self.last_wait,
+                'max_wait': self.max_wait
+            }
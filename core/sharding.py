@@ -0,0 +1,401 @@
+import os
+import json
+import time
+import bisect
+import signal
+import hashlib
+import threading
+import subprocess
+import urllib.error
+import urllib.request
+from typing import Callable, Iterable, List, Optional
+
+from helpers.loggers import get_logger
+
+logger = get_logger(__file__)
+
+MEMBERSHIP_PATH = '/shards'
+SECRET_TOKEN_HEADER = 'X-Telegram-Bot-Api-Secret-Token'
+
+
+def get_raw_update_chat_id(update: dict) -> int:
+    """
+    Returns the chat id of an update as Telegram sends it (JSON), like 'get_update_chat_id' of the bot does
+    for a parsed update - so the coordinator routes an update without parsing it.
+    """
+    for update_type in ('message', 'edited_message', 'callback_query', 'channel_post', 'edited_channel_post',
+                        'my_chat_member', 'chat_member', 'chat_join_request', 'inline_query',
+                        'chosen_inline_result', 'shipping_query', 'pre_checkout_query', 'poll_answer'):
+        content = update.get(update_type)
+        if not content:
+            continue
+
+        chat = content.get('chat') or (content.get('message') or {}).get('chat')
+        if chat:
+            return chat['id']
+
+        user = content.get('from') or content.get('user')
+        if user:
+            return user['id']
+
+    return update['update_id']
+
+
+class HashRing:
+    def __init__(self, members: Iterable[int] = (), virtual_nodes: int = 128):
+        """
+        Consistent hashing of the chat ids over the shards - every shard owns 'virtual_nodes' points of the ring,
+        and a chat belongs to the shard of the first point after the hash of the chat id.
+        So when a shard joins or leaves, only the chats of its points move (about 1/N of them).
+        :param members: shard ids
+        :param virtual_nodes: points per shard, more points spread the chats more evenly
+        """
+        self.virtual_nodes = virtual_nodes
+        self._points = []
+        self._owners = []
+        self._members = set()
+
+        for member in members:
+            self.add(member)
+
+    @staticmethod
+    def _hash(key: str) -> int:
+        return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), 'big')
+
+    @property
+    def members(self) -> List[int]:
+        return sorted(self._members)
+
+    def add(self, member: int):
+        if member in self._members:
+            return
+
+        self._members.add(member)
+        for index in range(self.virtual_nodes):
+            point = self._hash(f'shard-{member}-{index}')
+            position = bisect.bisect(self._points, point)
+            self._points.insert(position, point)
+            self._owners.insert(position, member)
+
+    def remove(self, member: int):
+        if member not in self._members:
+            return
+
+        self._members.discard(member)
+        remaining = [(point, owner) for point, owner in zip(self._points, self._owners) if owner != member]
+        self._points = [point for point, _ in remaining]
+        self._owners = [owner for _, owner in remaining]
+
+    def get_owner(self, chat_id) -> Optional[int]:
+        if not self._points:
+            return None
+
+        position = bisect.bisect(self._points, self._hash(str(chat_id))) % len(self._points)
+        return self._owners[position]
+
+
+class ShardMembership:
+    def __init__(self, shard_id: int, members: Iterable[int], virtual_nodes: int = 128, on_change: Callable = None):
+        """
+        The view of a worker process of the shards - which chats it owns, for the scheduled words and the users
+        it loads. The coordinator sends the new members whenever a worker joins or leaves.
+        :param shard_id: id of this worker
+        :param members: ids of all the workers
+        :param on_change: called (without arguments) after the members changed
+        """
+        self.shard_id = shard_id
+        self.virtual_nodes = virtual_nodes
+        self.on_change = on_change
+        self.ring = HashRing(members, virtual_nodes)
+        self.epoch = 0
+        self._lock = threading.Lock()
+
+    def owns(self, chat_id) -> bool:
+        return self.ring.get_owner(chat_id) == self.shard_id
+
+    def update(self, members: Iterable[int]):
+        members = sorted(members)
+        with self._lock:
+            if members == self.ring.members:
+                return
+            self.ring = HashRing(members, self.virtual_nodes)
+            self.epoch += 1
+
+        logger.info(f"Shard {self.shard_id} - the members are {members} now (epoch {self.epoch})")
+        if self.on_change:
+            self.on_change()
+
+
+class ShardWorker:
+    def __init__(self, shard_id: int, process: subprocess.Popen, url: str):
+        self.shard_id = shard_id
+        self.process = process
+        self.url = url
+
+    def is_alive(self) -> bool:
+        return self.process.poll() is None
+
+
+class ShardCoordinator:
+    def __init__(self, worker_command: Callable[[int, List[int]], List[str]], num_of_workers: int,
+                 base_port: int = 8444, host: str = '127.0.0.1', url_path: str = '/webhook',
+                 secret_token: str = None, env: dict = None, virtual_nodes: int = 128, restart_delay: float = 5,
+                 startup_timeout: float = 60):
+        """
+        Runs the bot as several worker processes, each one owns a hash partition of the chat ids (see HashRing).
+        Every worker is a webhook mode bot on its own local port. The coordinator receives the updates (it's the
+        single process that polls Telegram) and forwards each one to the webhook of the worker that owns its chat.
+        When a worker exits it leaves the ring, its chats move to the other workers, and it's started again
+        after 'restart_delay' seconds - the new members are sent to all the workers on every change.
+        :param worker_command: function of (shard_id, members) that returns the command line of a worker
+        :param num_of_workers: number of workers to start with
+        :param base_port: port of the first worker, the next workers listen on the next ports
+        :param host: host the workers listen on
+        :param url_path: webhook path of the workers
+        :param secret_token: secret token of the forwarded requests, random if not provided
+        :param env: environment variables of the workers, on top of the environment of the coordinator
+        :param virtual_nodes: points of every worker on the ring
+        :param restart_delay: seconds before a worker that exited is started again
+        :param startup_timeout: seconds a starting worker has to start listening
+        """
+        self.worker_command = worker_command
+        self.num_of_workers = num_of_workers
+        self.base_port = base_port
+        self.host = host
+        self.url_path = url_path
+        self.secret_token = secret_token or os.urandom(16).hex()
+        self.env = env or {}
+        self.restart_delay = restart_delay
+        self.startup_timeout = startup_timeout
+
+        self._ring = HashRing(virtual_nodes=virtual_nodes)
+        self._workers = {}
+        self._restarts = {}
+        self._lock = threading.RLock()
+        # held while the members change and are sent to the workers, so an update is never routed by a ring that
+        # the workers don't know yet. The routing only holds it to pick the worker, never while posting to it.
+        self._membership_lock = threading.RLock()
+        self._stop_event = threading.Event()
+        self._monitor_thread = None
+
+        self.forwarded = 0
+        self.rejected = 0
+        self.dropped = 0
+        self.rebalances = 0
+
+    def start(self):
+        logger.info(f"Starting {self.num_of_workers} shard workers")
+        for shard_id in range(self.num_of_workers):
+            self._launch(shard_id, list(range(self.num_of_workers)))
+        self._broadcast_members()
+
+        self._monitor_thread = threading.Thread(target=self._monitor, name='shard-monitor', daemon=True)
+        self._monitor_thread.start()
+
+    def stop(self, timeout: float = 30):
+        logger.debug("Stopping shard workers...")
+        self._stop_event.set()
+        if self._monitor_thread:
+            self._monitor_thread.join()
+
+        with self._lock:
+            workers = list(self._workers.values())
+
+        # SIGINT lets every worker flush its state on its way out
+        for worker in workers:
+            if worker.is_alive():
+                worker.process.send_signal(signal.SIGINT)
+        for worker in workers:
+            try:
+                worker.process.wait(timeout)
+            except subprocess.TimeoutExpired:
+                logger.warning(f"Shard {worker.shard_id} didn't stop in {timeout} seconds, killing it")
+                worker.process.kill()
+
+    def _launch(self, shard_id: int, members: List[int]):
+        port = self.base_port + shard_id
+        env = {**os.environ, **self.env, 'WEBHOOK_HOST': self.host, 'WEBHOOK_PORT': str(port),
+               'WEBHOOK_PATH': self.url_path, 'WEBHOOK_SECRET': self.secret_token}
+        # the workers only get the updates from the coordinator, never register a webhook in Telegram
+        env.pop('WEBHOOK_URL', None)
+
+        process = subprocess.Popen(self.worker_command(shard_id, sorted(members)), env=env)
+        logger.info(f"Started shard {shard_id} (pid {process.pid}) on {self.host}:{port}")
+
+        with self._lock:
+            self._workers[shard_id] = ShardWorker(shard_id, process, f'http://{self.host}:{port}')
+            self._ring.add(shard_id)
+
+    def add_worker(self, shard_id: int = None) -> int:
+        """
+        Starts a worker that joins the ring, the chats of its part of the ring move to it.
+        """
+        with self._lock:
+            if shard_id is None:
+                shard_id = next(index for index in range(len(self._workers) + 1) if index not in self._workers)
+            members = self._ring.members + [shard_id]
+
+        with self._membership_lock:
+            self._launch(shard_id, members)
+            self._broadcast_members()
+
+        return shard_id
+
+    def remove_worker(self, shard_id: int):
+        """
+        Takes the worker out of the ring and stops it, its chats move to the other workers.
+        """
+        worker = self._leave(shard_id)
+        if worker and worker.is_alive():
+            worker.process.send_signal(signal.SIGINT)
+
+    def _leave(self, shard_id: int) -> Optional[ShardWorker]:
+        with self._membership_lock:
+            with self._lock:
+                worker = self._workers.pop(shard_id, None)
+                self._ring.remove(shard_id)
+
+            if worker:
+                logger.warning(f"Shard {shard_id} left, its chats move to shards {self._ring.members}")
+                self._broadcast_members()
+
+        return worker
+
+    def _post(self, worker: ShardWorker, path: str, body: bytes) -> Optional[int]:
+        """
+        :return: HTTP status code, or None if the worker can't be reached
+        """
+        request = urllib.request.Request(worker.url + path, data=body, method='POST',
+                                         headers={'Content-Type': 'application/json',
+                                                  SECRET_TOKEN_HEADER: self.secret_token})
+        try:
+            with urllib.request.urlopen(request, timeout=10) as response:
+                return response.status
+        except urllib.error.HTTPError as e:
+            return e.code
+        except (urllib.error.URLError, ConnectionError, TimeoutError):
+            return None
+
+    def _broadcast_members(self):
+        with self._lock:
+            members = self._ring.members
+            workers = list(self._workers.values())
+            self.rebalances += 1
+
+        body = json.dumps({'members': members}).encode()
+        for worker in workers:
+            # a worker that just started might not listen yet
+            deadline = time.monotonic() + self.startup_timeout
+            while worker.is_alive() and not self._stop_event.is_set():
+                if self._post(worker, MEMBERSHIP_PATH, body) == 200:
+                    break
+                if time.monotonic() > deadline:
+                    logger.error(f"Shard {worker.shard_id} didn't get the members {members}")
+                    break
+                time.sleep(0.2)
+
+    def route_update(self, update: dict) -> bool:
+        """
+        Forwards the update to the worker that owns its chat. While the worker is full (503) or still starting,
+        waits and tries again - which holds back the next updates, like the polling of a single process does.
+        :return: False if there are no workers to forward to
+        """
+        chat_id = get_raw_update_chat_id(update)
+        body = json.dumps(update).encode()
+
+        while not self._stop_event.is_set():
+            # a slow or restarting worker mustn't hold back the routing to the other workers or a membership
+            # change - an update that is posted while the members change reaches the chat's previous owner
+            with self._membership_lock, self._lock:
+                worker = self._workers.get(self._ring.get_owner(chat_id))
+            if not worker:
+                return False
+
+            status_code = self._post(worker, self.url_path, body)
+
+            if status_code == 200:
+                with self._lock:
+                    self.forwarded += 1
+                return True
+
+            if status_code == 503:
+                with self._lock:
+                    self.rejected += 1
+                time.sleep(1)
+            elif status_code is None:
+                if not worker.is_alive():
+                    self._leave(worker.shard_id)
+                    self._schedule_restart(worker.shard_id)
+                else:
+                    time.sleep(0.2)
+            else:
+                logger.error(f"Shard {worker.shard_id} refused update {update.get('update_id')} ({status_code}), "
+                             f"dropping it")
+                with self._lock:
+                    self.dropped += 1
+                return True
+
+        return False
+
+    def poll_updates(self, token: str, long_polling_timeout: int = 20):
+        """
+        Polls the updates of the bot and routes them, until the coordinator is stopped.
+        """
+        from telebot import apihelper
+
+        apihelper.delete_webhook(token)
+        offset = None
+        while not self._stop_event.is_set():
+            try:
+                updates = apihelper.get_updates(token, offset=offset, timeout=long_polling_timeout + 5,
+                                                long_polling_timeout=long_polling_timeout)
+            except Exception as e:
+                logger.error(f"Couldn't get the updates. Error - {e}")
+                time.sleep(3)
+                continue
+
+            for update in updates:
+                while not self.route_update(update):
+                    if self._stop_event.is_set():
+                        return
+                    logger.error("There are no shard workers, waiting for them to start")
+                    time.sleep(1)
+                offset = update['update_id'] + 1
+
+    def _monitor(self):
+        while not self._stop_event.wait(1):
+            with self._lock:
+                workers = list(self._workers.values())
+
+            for worker in workers:
+                if not worker.is_alive():
+                    logger.error(f"Shard {worker.shard_id} exited with code {worker.process.returncode}")
+                    self._leave(worker.shard_id)
+                    self._schedule_restart(worker.shard_id)
+
+            with self._lock:
+                due_shard_ids = [shard_id for shard_id, restart_at in self._restarts.items()
+                                 if restart_at <= time.monotonic()]
+                for shard_id in due_shard_ids:
+                    del self._restarts[shard_id]
+
+            for shard_id in due_shard_ids:
+                self.add_worker(shard_id)
+
+    def _schedule_restart(self, shard_id: int):
+        with self._lock:
+            self._restarts.setdefault(shard_id, time.monotonic() + self.restart_delay)
+
+    def get_owner(self, chat_id) -> Optional[int]:
+        with self._lock:
+            return self._ring.get_owner(chat_id)
+
+    def metrics(self) -> dict:
+        with self._lock:
+            return {
+                'members': self._ring.members,
+                'forwarded': self.forwarded,
+                'rejected': self.rejected,
+                'dropped': self.dropped,
+                'rebalances': self.rebalances
+            }
@@ -0,0 +1,114 @@
+import time
+import heapq
+import itertools
+import threading
+from typing import Callable
+
+from helpers.loggers import get_logger
+
+logger = get_logger(__file__)
+
+
+class Timer:
+    def __init__(self, deadline: float, callback: Callable, args: tuple, kwargs: dict):
+        self.deadline = deadline
+        self.callback = callback
+        self.args = args
+        self.kwargs = kwargs
+        self.is_cancelled = False
+
+    def cancel(self):
+        self.is_cancelled = True
+
+
+class TimerService:
+    def __init__(self):
+        """
+        Runs delayed actions on a single thread - the next-send deadlines of the word scheduler and the follow-up
+        actions (e.g. resuming a word sender after an answer), so a handler schedules the action and returns
+        instead of sleeping.
+        The callbacks run on the timer thread and must be short - a long action should be handed to
+        the chat dispatcher by the callback.
+        """
+        self._heap = []
+        self._counter = itertools.count()
+        self._condition = threading.Condition()
+        self._thread = None
+        self._is_stopped = False
+
+        self.fired = 0
+        self.failed = 0
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+
+    def start(self):
+        logger.debug("Starting timer service")
+        self._is_stopped = False
+        self._thread = threading.Thread(target=self._run, name='timer-service', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        logger.debug("Stopping timer service")
+        with self._condition:
+            self._is_stopped = True
+            self._condition.notify()
+
+        if self._thread:
+            self._thread.join()
+
+    def call_later(self, delay: float, callback: Callable, *args, **kwargs) -> Timer:
+        """
+        Calls the callback with the args after the delay.
+        :param delay: seconds from now
+        :return: Timer that can be cancelled
+        """
+        timer = Timer(time.monotonic() + delay, callback, args, kwargs)
+        with self._condition:
+            heapq.heappush(self._heap, (timer.deadline, next(self._counter), timer))
+            if self._heap[0][2] is timer:
+                self._condition.notify()
+
+        return timer
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._is_stopped:
+                    # cancelled timers stay in the heap and are skipped once they're popped
+                    while self._heap and self._heap[0][2].is_cancelled:
+                        heapq.heappop(self._heap)
+
+                    if not self._heap:
+                        self._condition.wait()
+                        continue
+
+                    timeout = self._heap[0][0] - time.monotonic()
+                    if timeout <= 0:
+                        break
+                    self._condition.wait(timeout)
+
+                if self._is_stopped:
+                    return
+
+                deadline, _, timer = heapq.heappop(self._heap)
+                self.last_lag = time.monotonic() - deadline
+                self.max_lag = max(self.max_lag, self.last_lag)
+                self.fired += 1
+
+            try:
+                timer.callback(*timer.args, **timer.kwargs)
+            except Exception as e:
+                logger.error(f"Timer callback '{getattr(timer.callback, '__name__', timer.callback)}' failed. "
+                             f"Error - {e}")
+                with self._condition:
+                    self.failed += 1
+
+    def metrics(self) -> dict:
+        with self._condition:
+            return {
+                'pending_timers': len(self._heap),
+                'fired': self.fired,
+                'failed': self.failed,
+                'last_lag': self.last_lag,
+                'max_lag': self.max_lag
+            }
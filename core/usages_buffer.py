@@ -0,0 +1,120 @@
+import time
+import threading
+
+from helpers.loggers import get_logger
+
+logger = get_logger(__file__)
+
+
+class UsagesBuffer:
+    def __init__(self, db_connector, flush_interval: float = 60, max_dirty_words: int = 1000):
+        """
+        Write-behind buffer of the words usages of all the users.
+        The latest usages value of every changed (chat_id, en_word) is kept in memory and written to the
+        'usages' table with a single batched upsert - every 'flush_interval' seconds, as soon as
+        'max_dirty_words' words are waiting, and on shutdown.
+        So a crash loses at most 'flush_interval' seconds or 'max_dirty_words' words of usages.
+        :param db_connector: StorageWrapper instance (MySQL or SQLite)
+        :param flush_interval: seconds between periodic flushes
+        :param max_dirty_words: number of waiting words that triggers an early flush
+        """
+        self.db_connector = db_connector
+        self.flush_interval = flush_interval
+        self.max_dirty_words = max_dirty_words
+
+        self._dirty_usages = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._is_stopped = False
+        self._thread = None
+
+        self.flushes = 0
+        self.flushed_words = 0
+        self.failed_flushes = 0
+        self.last_flush_duration = 0.0
+
+    def start(self):
+        logger.debug(f"Starting usages buffer (flush interval - {self.flush_interval} seconds)")
+        self._is_stopped = False
+        self._thread = threading.Thread(target=self._run, name='usages-flusher', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        logger.debug("Stopping usages buffer, flushing the remaining usages...")
+        self._is_stopped = True
+        self._wakeup.set()
+        if self._thread:
+            self._thread.join()
+
+        self.flush()
+
+    def mark_dirty(self, chat_id: int, en_word: str, usages: int):
+        with self._lock:
+            self._dirty_usages[(chat_id, en_word)] = usages
+            num_of_dirty_words = len(self._dirty_usages)
+
+        if num_of_dirty_words >= self.max_dirty_words:
+            self._wakeup.set()
+
+    def discard(self, chat_id: int, en_word: str):
+        with self._lock:
+            self._dirty_usages.pop((chat_id, en_word), None)
+
+    def flush(self, chat_id: int = None) -> bool:
+        """
+        :param chat_id: flushes only the usages of this chat (e.g. before the user is dropped from memory)
+        """
+        with self._flush_lock:
+            with self._lock:
+                if chat_id is None:
+                    dirty_usages, self._dirty_usages = self._dirty_usages, {}
+                else:
+                    dirty_usages = {key: self._dirty_usages.pop(key) for key in list(self._dirty_usages)
+                                    if key[0] == chat_id}
+
+            if not dirty_usages:
+                return True
+
+            started_at = time.perf_counter()
+            rows = [{'chat_id': chat_id, 'en_word': en_word, 'usages': usages}
+                    for (chat_id, en_word), usages in dirty_usages.items()]
+            flush_status = self.db_connector.upsert_multiple_rows(table_name='usages', keys_values=rows,
+                                                                  update_fields=['usages'])
+            self.last_flush_duration = time.perf_counter() - started_at
+
+            if not flush_status:
+                logger.error(f"Didn't manage to flush the usages of {len(rows)} words, will try again later")
+                self.failed_flushes += 1
+                with self._lock:
+                    # values that were changed in the meantime are newer than the failed ones
+                    for key, usages in dirty_usages.items():
+                        self._dirty_usages.setdefault(key, usages)
+                return False
+
+            logger.debug(f"Flushed the usages of {len(rows)} words in {self.last_flush_duration:.3f}s")
+            self.flushes += 1
+            self.flushed_words += len(rows)
+            return True
+
+    def _run(self):
+        while not self._is_stopped:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+
+            if self._is_stopped:
+                break
+
+            self.flush()
+
+    def metrics(self) -> dict:
+        with self._lock:
+            dirty_words = len(self._dirty_usages)
+
+        return {
+            'dirty_words': dirty_words,
+            'flushes': self.flushes,
+            'flushed_words': self.flushed_words,
+            'failed_flushes': self.failed_flushes,
+            'last_flush_duration': self.last_flush_duration
+        }
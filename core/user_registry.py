@@ -0,0 +1,315 @@
+import time
+import threading
+from collections import OrderedDict
+from typing import Callable, Iterator, List
+
+from helpers.loggers import get_logger
+
+logger = get_logger(__file__)
+
+
+class UserRegistry:
+    def __init__(self, max_resident_users: int = None, idle_timeout: float = None, sweep_interval: float = 60,
+                 dispatcher=None):
+        """
+        The users of the bot by their chat id. Only the users that are in use are kept in memory (resident) -
+        the rest are known by their small metadata (scheduling state, language, tracked messages) and are loaded
+        on their first interaction or scheduled word.
+        The least recently used users are dropped once there are more than 'max_resident_users', and the users
+        that weren't used for 'idle_timeout' seconds are dropped by a periodic sweep. The dirty state of a user
+        (the buffered usages) is flushed before it's dropped, and a user in the middle of a menu (its word sender
+        is paused) is dropped too - the paused state is part of its metadata, and it's restored when it's loaded.
+        Without limits every user stays in memory, like a plain dict.
+        :param max_resident_users: maximum number of users in memory, no limit if not provided
+        :param idle_timeout: seconds after which an unused user is dropped, never if not provided
+        :param sweep_interval: seconds between the sweeps of idle users
+        :param dispatcher: ChatDispatcher - when provided the users are dropped on it, so it never happens in
+        the middle of a handler of the same chat
+        """
+        self.max_resident_users = max_resident_users
+        self.idle_timeout = idle_timeout
+        self.sweep_interval = sweep_interval
+        self.dispatcher = dispatcher
+
+        self._resident = OrderedDict()
+        self._last_used = {}
+        self._known_users = {}
+        self._loading = {}
+        self._evicting = set()
+        self._load_user = None
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._is_stopped = False
+        self._thread = None
+
+        self.hits = 0
+        self.loads = 0
+        self.failed_loads = 0
+        self.evictions = 0
+        self.failed_evictions = 0
+        self.last_load_latency = 0.0
+        self.max_load_latency = 0.0
+        self._total_load_latency = 0.0
+
+    def add_known_users(self, users_metadata: dict, load_user: Callable) -> dict:
+        """
+        :param users_metadata: dict of chat_id -> metadata (with 'word_sender_active') of a user that isn't loaded
+        :param load_user: function of (chat_id, metadata) that loads the user and returns it
+        :return: dict of chat_id -> metadata of the users that weren't known before
+        """
+        with self._lock:
+            new_users_metadata = {chat_id: metadata for chat_id, metadata in users_metadata.items()
+                                  if chat_id not in self._resident and chat_id not in self._known_users}
+            self._known_users.update(new_users_metadata)
+            self._load_user = load_user
+
+        return new_users_metadata
+
+    def start(self):
+        if not self.idle_timeout and not self.max_resident_users:
+            return
+
+        logger.debug(f"Starting user registry (max resident users - {self.max_resident_users}, "
+                     f"idle timeout - {self.idle_timeout} seconds)")
+        self._is_stopped = False
+        self._thread = threading.Thread(target=self._run, name='user-registry', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._is_stopped = True
+        self._wakeup.set()
+        if self._thread:
+            self._thread.join()
+
+    def get(self, chat_id, default=None):
+        """
+        Returns the user, loads it first if it isn't in memory.
+        """
+        with self._lock:
+            user = self._resident.get(chat_id)
+            if user is not None:
+                self._resident.move_to_end(chat_id)
+                self._last_used[chat_id] = time.monotonic()
+                self.hits += 1
+                return user
+
+            if chat_id not in self._known_users or not self._load_user:
+                return default
+
+            loading = self._loading.get(chat_id)
+            is_loader = loading is None
+            if is_loader:
+                loading = self._loading[chat_id] = threading.Event()
+
+        if not is_loader:
+            loading.wait()
+            with self._lock:
+                return self._resident.get(chat_id, default)
+
+        started_at = time.perf_counter()
+        try:
+            user = self._load_user(chat_id, self._known_users[chat_id])
+        except Exception:
+            with self._lock:
+                self.failed_loads += 1
+            raise
+        finally:
+            with self._lock:
+                self._loading.pop(chat_id)
+            loading.set()
+
+        load_latency = time.perf_counter() - started_at
+        with self._lock:
+            self.loads += 1
+            self.last_load_latency = load_latency
+            self.max_load_latency = max(self.max_load_latency, load_latency)
+            self._total_load_latency += load_latency
+
+        logger.debug(f"Loaded the user of chat id '{chat_id}' in {load_latency:.3f}s")
+        return user
+
+    def __getitem__(self, chat_id):
+        user = self.get(chat_id)
+        if user is None:
+            raise KeyError(chat_id)
+        return user
+
+    def __setitem__(self, chat_id, user):
+        with self._lock:
+            self._resident[chat_id] = user
+            self._resident.move_to_end(chat_id)
+            self._last_used[chat_id] = time.monotonic()
+            self._known_users.pop(chat_id, None)
+            excess_chat_ids = self._pick_excess_users()
+
+        for excess_chat_id in excess_chat_ids:
+            self._request_eviction(excess_chat_id)
+
+    def __contains__(self, chat_id):
+        with self._lock:
+            return chat_id in self._resident or chat_id in self._known_users
+
+    def __len__(self):
+        with self._lock:
+            return len(self._resident)
+
+    def __iter__(self) -> Iterator[int]:
+        """
+        Iterates over the chat ids of the users in memory, like the keys of a dict.
+        """
+        with self._lock:
+            return iter(list(self._resident))
+
+    def items(self) -> List[tuple]:
+        """
+        :return: list of (chat_id, user) of the users in memory
+        """
+        with self._lock:
+            return list(self._resident.items())
+
+    def clear(self):
+        with self._lock:
+            self._resident.clear()
+            self._last_used.clear()
+            self._known_users.clear()
+
+    def get_chat_ids(self) -> List[int]:
+        """
+        :return: chat ids of all the users, in memory or not
+        """
+        with self._lock:
+            return list(self._resident) + list(self._known_users)
+
+    def get_active_senders(self) -> Iterator[int]:
+        """
+        Returns the chat ids of all the users whose word sender is active, without loading them.
+        """
+        with self._lock:
+            active_chat_ids = [chat_id for chat_id, user in self._resident.items() if user.word_sender_active]
+            active_chat_ids += [chat_id for chat_id, metadata in self._known_users.items()
+                                if metadata.word_sender_active]
+
+        return iter(active_chat_ids)
+
+    def _pick_excess_users(self) -> list:
+        if not self.max_resident_users:
+            return []
+
+        num_of_excess_users = len(self._resident) - len(self._evicting) - self.max_resident_users
+        excess_chat_ids = []
+        for chat_id in self._resident:
+            if len(excess_chat_ids) >= num_of_excess_users:
+                break
+            if chat_id not in self._evicting:
+                excess_chat_ids.append(chat_id)
+
+        return excess_chat_ids
+
+    def _pick_idle_users(self) -> list:
+        if not self.idle_timeout:
+            return []
+
+        idle_since = time.monotonic() - self.idle_timeout
+        idle_chat_ids = []
+        # the least recently used users come first
+        for chat_id in self._resident:
+            if self._last_used[chat_id] > idle_since:
+                break
+            if chat_id not in self._evicting:
+                idle_chat_ids.append(chat_id)
+
+        return idle_chat_ids
+
+    def _request_eviction(self, chat_id):
+        with self._lock:
+            if chat_id in self._evicting:
+                return
+            self._evicting.add(chat_id)
+
+        if self.dispatcher:
+            if self.dispatcher.submit(chat_id, self.evict, chat_id):
+                return
+            # the dispatcher is full, the next sweep tries again
+            with self._lock:
+                self._evicting.discard(chat_id)
+            return
+
+        self.evict(chat_id)
+
+    def evict(self, chat_id) -> bool:
+        """
+        Drops the user from memory after flushing its dirty state, unless it's used in the meantime.
+        """
+        try:
+            with self._lock:
+                user = self._resident.get(chat_id)
+                flush_started_at = time.monotonic()
+            if user is None:
+                return False
+
+            if not user.flush_state():
+                logger.warning(f"Couldn't flush the state of chat id '{chat_id}', keeping the user in memory")
+                with self._lock:
+                    self.failed_evictions += 1
+                return False
+
+            with self._lock:
+                if self._resident.get(chat_id) is not user or self._last_used[chat_id] > flush_started_at:
+                    return False
+
+                del self._resident[chat_id]
+                del self._last_used[chat_id]
+                self._known_users[chat_id] = user.get_metadata()
+                self.evictions += 1
+
+            logger.debug(f"Dropped the user of chat id '{chat_id}' from memory")
+            return True
+        finally:
+            with self._lock:
+                self._evicting.discard(chat_id)
+
+    def forget(self, chat_id):
+        """
+        Drops the user and its metadata, after flushing its dirty state - e.g. once the chat belongs to another
+        shard worker.
+        """
+        with self._lock:
+            user = self._resident.pop(chat_id, None)
+            self._last_used.pop(chat_id, None)
+            self._known_users.pop(chat_id, None)
+
+        if user and not user.flush_state():
+            logger.warning(f"Couldn't flush the state of chat id '{chat_id}' before forgetting it")
+
+    def sweep(self):
+        with self._lock:
+            chat_ids = self._pick_excess_users() + self._pick_idle_users()
+
+        for chat_id in dict.fromkeys(chat_ids):
+            self._request_eviction(chat_id)
+
+    def _run(self):
+        while not self._is_stopped:
+            self._wakeup.wait(self.sweep_interval)
+            if self._is_stopped:
+                break
+
+            try:
+                self.sweep()
+            except Exception as e:
+                logger.error(f"Sweeping the idle users failed. Error - {e}")
+
+    def metrics(self) -> dict:
+        with self._lock:
+            return {
+                'resident_users': len(self._resident),
+                'known_users': len(self._resident) + len(self._known_users),
+                'hits': self.hits,
+                'loads': self.loads,
+                'failed_loads': self.failed_loads,
+                'evictions': self.evictions,
+                'failed_evictions': self.failed_evictions,
+                'last_load_latency': self.last_load_latency,
+                'max_load_latency': self.max_load_latency,
+                'avg_load_latency': self._total_load_latency / self.loads if self.loads else 0.0
+            }
@@ -0,0 +1,157 @@
+import sys
+import threading
+from array import array
+from typing import Iterable, Iterator, List, Tuple
+
+from core.word_sampler import WordSampler
+
+_shared_translations = {}
+_shared_translations_lock = threading.Lock()
+
+
+def share_translations(translated_words: Iterable[str]) -> tuple:
+    """
+    Returns the single tuple instance of these translations, so users that have the same word with the same
+    translations share it (and its interned strings) instead of holding copies.
+    """
+    translated_words = tuple(sys.intern(translated_word) for translated_word in translated_words)
+    shared = _shared_translations.get(translated_words)
+    if shared is None:
+        with _shared_translations_lock:
+            shared = _shared_translations.setdefault(translated_words, translated_words)
+
+    return shared
+
+
+class UserTranslations:
+    __slots__ = ('_slots', '_words', '_translations', '_usages', '_sampler')
+
+    def __init__(self):
+        """
+        The words of a single user, stored compactly - the words are interned, the translations are shared
+        tuples and the usages are kept in an unsigned int array, all addressed by the slot of the word.
+        The exercise words are drawn by a WordSampler over the same slots, which is updated with every change.
+        """
+        self._slots = {}
+        self._words = []
+        self._translations = []
+        self._usages = array('I')
+        self._sampler = WordSampler(self._usages)
+
+    @staticmethod
+    def from_rows(translations: list = None, usages: list = None) -> "UserTranslations":
+        """
+        :param translations: rows of the translations table (en_word, translated_word)
+        :param usages: rows of the usages table (en_word, usages)
+        """
+        return UserTranslations.from_pairs(
+            ((translation['en_word'], translation['translated_word']) for translation in translations or []),
+            ((usage['en_word'], usage['usages']) for usage in usages or []))
+
+    @staticmethod
+    def from_pairs(translations: Iterable[tuple] = (), usages: Iterable[tuple] = ()) -> "UserTranslations":
+        """
+        :param translations: (en_word, translated_word) pairs
+        :param usages: (en_word, usages) pairs
+        """
+        user_translations = UserTranslations()
+
+        grouped_translations = {}
+        for en_word, translated_word in translations:
+            grouped_translations.setdefault(en_word, []).append(translated_word)
+        for en_word, translated_words in grouped_translations.items():
+            user_translations.add(en_word, translated_words)
+
+        for en_word, usages_count in usages:
+            if en_word in user_translations:
+                user_translations.set_usages(en_word, usages_count)
+
+        return user_translations
+
+    def __len__(self):
+        return len(self._words)
+
+    def __contains__(self, en_word):
+        return en_word in self._slots
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._words)
+
+    def keys(self) -> Iterator[str]:
+        return iter(self._words)
+
+    def items(self) -> Iterator[Tuple[str, tuple, int]]:
+        """
+        :return: iterator of (en_word, translated_words, usages)
+        """
+        return zip(self._words, self._translations, self._usages)
+
+    def translated_words(self, en_word: str) -> tuple:
+        return self._translations[self._slots[en_word]]
+
+    def usages(self, en_word: str) -> int:
+        return self._usages[self._slots[en_word]]
+
+    def set_usages(self, en_word: str, usages: int):
+        slot = self._slots[en_word]
+        previous_usages = self._usages[slot]
+        self._usages[slot] = usages
+        self._sampler.update(slot, previous_usages)
+
+    def increase_usages(self, en_word: str) -> int:
+        slot = self._slots[en_word]
+        self._usages[slot] += 1
+        self._sampler.update(slot, self._usages[slot] - 1)
+        return self._usages[slot]
+
+    def choose(self) -> str:
+        """
+        :return: a word drawn by its weight (see WordSampler)
+        """
+        return self._words[self._sampler.choose()]
+
+    def choose_with_distractors(self, num_of_distractors: int = 3) -> Tuple[str, List[str]]:
+        """
+        :return: tuple of (a word drawn by its weight, list of distinct other words picked uniformly)
+        """
+        chosen_slot, distractor_slots = self._sampler.choose_with_distractors(num_of_distractors)
+        return self._words[chosen_slot], [self._words[slot] for slot in distractor_slots]
+
+    def add(self, en_word: str, translated_words: Iterable[str], usages: int = 0):
+        """
+        Adds the word, or adds the translations to the translations of an existing word.
+        """
+        slot = self._slots.get(en_word)
+        if slot is not None:
+            existing_translations = self._translations[slot]
+            self._translations[slot] = share_translations(
+                existing_translations + tuple(translated_word for translated_word in translated_words
+                                              if translated_word not in existing_translations))
+            return
+
+        en_word = sys.intern(en_word)
+        self._slots[en_word] = len(self._words)
+        self._words.append(en_word)
+        self._translations.append(share_translations(translated_words))
+        self._usages.append(usages)
+        self._sampler.append()
+
+    def remove(self, en_word: str):
+        """
+        Removes the word by moving the last word into its slot, so the slots stay contiguous.
+        """
+        slot = self._slots.pop(en_word)
+        last_slot = len(self._words) - 1
+        removed_usages = self._usages[slot]
+
+        if slot != last_slot:
+            last_word = self._words[last_slot]
+            self._words[slot] = last_word
+            self._translations[slot] = self._translations[last_slot]
+            self._usages[slot] = self._usages[last_slot]
+            self._slots[last_word] = slot
+
+        self._words.pop()
+        self._translations.pop()
+        self._usages.pop()
+        self._sampler.remove(slot, removed_usages)
@@ -0,0 +1,163 @@
+import json
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+from telebot import types
+
+from helpers.loggers import get_logger
+from core.chat_dispatcher import ChatDispatcher
+from core.sharding import MEMBERSHIP_PATH
+
+logger = get_logger(__file__)
+
+
+class WebhookServer:
+    SECRET_TOKEN_HEADER = 'X-Telegram-Bot-Api-Secret-Token'
+
+    def __init__(self, bot, dispatcher: ChatDispatcher, host: str = '0.0.0.0', port: int = 8443,
+                 url_path: str = '/webhook', secret_token: str = None, membership=None):
+        """
+        A local HTTP server that receives the updates Telegram posts to the bot's webhook.
+        The server only parses an update and submits it to the chat dispatcher, which processes it on its
+        workers in the order of the chat. When the dispatcher is full the update is answered with 503,
+        so Telegram delivers it again later instead of the server piling up updates in memory.
+        Fake updates can be posted locally, e.g.
+        curl -X POST localhost:8443/webhook -d '{"update_id": 1, "message": {...}}'
+        :param bot: the bot that processes the updates
+        :param dispatcher: ChatDispatcher instance
+        :param host: listening host
+        :param port: listening port
+        :param url_path: path Telegram posts the updates to
+        :param secret_token: value of the secret token header that Telegram sends, no check if not provided
+        :param membership: ShardMembership of a shard worker - the coordinator posts the shards members to it
+        """
+        self.bot = bot
+        self.dispatcher = dispatcher
+        self.host = host
+        self.port = port
+        self.url_path = url_path
+        self.secret_token = secret_token
+        self.membership = membership
+
+        self._server = ThreadingHTTPServer((host, port), self._create_request_handler())
+        self._server.daemon_threads = True
+        self._thread = None
+        self._is_serving = False
+        self._counters_lock = threading.Lock()
+
+        self.received = 0
+        self.accepted = 0
+        self.rejected = 0
+        self.invalid = 0
+
+    def handle_update(self, body: bytes, secret_token: str = None) -> int:
+        """
+        Parses the update and submits it to the dispatcher.
+        :return: HTTP status code of the response
+        """
+        status_code = self._handle_update(body, secret_token)
+
+        with self._counters_lock:
+            self.received += 1
+            if status_code == 200:
+                self.accepted += 1
+            elif status_code == 503:
+                self.rejected += 1
+            else:
+                self.invalid += 1
+
+        return status_code
+
+    def _handle_update(self, body: bytes, secret_token: str = None) -> int:
+        if self.secret_token and secret_token != self.secret_token:
+            logger.warning("Got an update with a wrong secret token")
+            return 403
+
+        try:
+            update = types.Update.de_json(json.loads(body))
+        except (ValueError, TypeError, KeyError, AttributeError) as e:
+            logger.warning(f"Got an invalid update. Error - {e}")
+            return 400
+
+        if not self.dispatcher.submit(self.bot.get_update_chat_id(update), self.bot.process_update, update):
+            logger.warning(f"The dispatcher is full, rejecting update {update.update_id}")
+            return 503
+
+        return 200
+
+    def handle_membership(self, body: bytes, secret_token: str = None) -> int:
+        """
+        Updates the members of the shards, that the coordinator sends when a worker joins or leaves.
+        :return: HTTP status code of the response
+        """
+        if self.secret_token and secret_token != self.secret_token:
+            logger.warning("Got a shards update with a wrong secret token")
+            return 403
+
+        try:
+            members = [int(member) for member in json.loads(body)['members']]
+        except (ValueError, TypeError, KeyError) as e:
+            logger.warning(f"Got an invalid shards update. Error - {e}")
+            return 400
+
+        self.membership.update(members)
+        return 200
+
+    def _create_request_handler(self):
+        webhook_server = self
+
+        class RequestHandler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                if self.path == MEMBERSHIP_PATH and webhook_server.membership:
+                    body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                    self.send_response(webhook_server.handle_membership(
+                        body, self.headers.get(WebhookServer.SECRET_TOKEN_HEADER)))
+                    self.end_headers()
+                    return
+
+                if self.path != webhook_server.url_path:
+                    self.send_response(404)
+                    self.end_headers()
+                    return
+
+                body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                status_code = webhook_server.handle_update(body, self.headers.get(WebhookServer.SECRET_TOKEN_HEADER))
+
+                self.send_response(status_code)
+                if status_code == 503:
+                    self.send_header('Retry-After', '1')
+                self.end_headers()
+
+            def log_message(self, format, *args):
+                logger.debug(f"{self.address_string()} - {format % args}")
+
+        return RequestHandler
+
+    def serve_forever(self):
+        logger.info(f"Listening for updates on {self.host}:{self.port}{self.url_path}")
+        self._is_serving = True
+        try:
+            self._server.serve_forever()
+        finally:
+            self._is_serving = False
+
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever, name='webhook-server', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        logger.debug("Stopping webhook server...")
+        if self._is_serving:
+            self._server.shutdown()
+        self._server.server_close()
+
+    def metrics(self) -> dict:
+        with self._counters_lock:
+            counters = {
+                'received': self.received,
+                'accepted': self.accepted,
+                'rejected': self.rejected,
+                'invalid': self.invalid
+            }
+
+        return {**counters, **self.dispatcher.metrics()}
@@ -0,0 +1,122 @@
+import random
+from array import array
+from typing import List, Tuple
+
+
+class WordSampler:
+    __slots__ = ('_usages', '_size', '_tree', '_capacity', '_highest_bit')
+
+    def __init__(self, usages: array):
+        """
+        This class picks the slots of a user's words at random, weighted by 1 / (usages + 1), so rarely
+        practiced words are chosen more often.
+        It has no copy of the words - it's addressed by the slots of UserTranslations and reads the weights
+        from its usages array, which the owner changes together with the matching method here.
+        The weights are kept in a Fenwick (binary indexed) tree of doubles, so adding, removing and re-weighting
+        a slot as well as drawing a weighted slot are all O(log n), with no per-draw allocations.
+        :param usages: the usages array of the words, by slot
+        """
+        self._usages = usages
+        self._size = len(usages)
+        self._rebuild(max(self._size, 16))
+
+    def __len__(self):
+        return self._size
+
+    @staticmethod
+    def get_weight(usages: int) -> float:
+        return 1.0 / (usages + 1)
+
+    def _rebuild(self, capacity: int):
+        tree = array('d', bytes(8 * (capacity + 1)))
+        for slot in range(self._size):
+            tree[slot + 1] += self.get_weight(self._usages[slot])
+
+        for index in range(1, capacity + 1):
+            parent = index + (index & -index)
+            if parent <= capacity:
+                tree[parent] += tree[index]
+
+        self._tree = tree
+        self._capacity = capacity
+        self._highest_bit = 1 << (capacity.bit_length() - 1)
+
+    def _add_to_tree(self, slot: int, delta: float):
+        index = slot + 1
+        while index <= self._capacity:
+            self._tree[index] += delta
+            index += index & -index
+
+    def _total_weight(self) -> float:
+        total = 0.0
+        index = self._size
+        while index > 0:
+            total += self._tree[index]
+            index -= index & -index
+        return total
+
+    def _find_slot(self, target: float) -> int:
+        """
+        Returns the first slot whose prefix sum of weights is greater than the target.
+        """
+        index = 0
+        bit = self._highest_bit
+        while bit:
+            next_index = index + bit
+            if next_index <= self._capacity and self._tree[next_index] <= target:
+                index = next_index
+                target -= self._tree[next_index]
+            bit >>= 1
+
+        # guards against floating point leftovers of removed slots
+        return min(index, self._size - 1)
+
+    def append(self):
+        """
+        Adds the slot that was appended to the usages array.
+        """
+        slot = self._size
+        self._size += 1
+
+        if self._size > self._capacity:
+            self._rebuild(self._capacity * 2)
+            return
+
+        self._add_to_tree(slot, self.get_weight(self._usages[slot]))
+
+    def update(self, slot: int, previous_usages: int):
+        """
+        Re-weights the slot whose usages changed in the usages array.
+        """
+        self._add_to_tree(slot, self.get_weight(self._usages[slot]) - self.get_weight(previous_usages))
+
+    def remove(self, slot: int, removed_usages: int):
+        """
+        Removes the slot after the last slot was moved into it in the usages array, so the slots stay contiguous.
+        :param removed_usages: the usages of the removed word
+        """
+        self._size -= 1
+        last_slot = self._size
+
+        if slot != last_slot:
+            # the last slot's weight moved into the removed one
+            moved_weight = self.get_weight(self._usages[slot])
+            self._add_to_tree(slot, moved_weight - self.get_weight(removed_usages))
+            self._add_to_tree(last_slot, -moved_weight)
+        else:
+            self._add_to_tree(last_slot, -self.get_weight(removed_usages))
+
+    def choose(self) -> int:
+        return self._find_slot(random.random() * self._total_weight())
+
+    def choose_with_distractors(self, num_of_distractors: int = 3) -> Tuple[int, List[int]]:
+        """
+        Chooses a weighted slot and additional distinct slots that are picked uniformly.
+        :return: tuple of (chosen slot, list of distractor slots)
+        """
+        chosen_slot = self._find_slot(random.random() * self._total_weight())
+
+        # sample from all the slots except the chosen one, by skipping over it
+        distractor_slots = random.sample(range(self._size - 1), num_of_distractors)
+
+        return chosen_slot, [slot + 1 if slot >= chosen_slot else slot for slot in distractor_slots]
@@ -0,0 +1,99 @@
+import time
+import itertools
+import threading
+from typing import Callable
+
+from helpers.loggers import get_logger
+
+from core.timer_service import TimerService
+
+logger = get_logger(__file__)
+
+
+class WordScheduler:
+    def __init__(self, callback: Callable[[int], None], timer_service: TimerService):
+        """
+        This class owns the next-send deadline of every active user.
+        Every deadline is a timer of the timer service, whose single thread waits for the nearest one and calls
+        the callback, so the number of threads doesn't grow with the number of users.
+        :param callback: callable that gets the chat id whose deadline has passed. It runs on the timer thread
+        and must be short - the word is sent by the chat dispatcher it's handed to.
+        :param timer_service: TimerService that runs the deadlines, it's started and stopped by its owner
+        """
+        self.callback = callback
+        self.timer_service = timer_service
+
+        # chat_id -> (token, Timer), the token tells a replaced timer that fired meanwhile from the current one
+        self._timers = {}
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+        self._is_stopped = False
+
+        self.dispatched = 0
+        self.failed = 0
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+
+    def start(self):
+        logger.debug("Starting word scheduler")
+        self._is_stopped = False
+
+    def stop(self):
+        logger.debug("Stopping word scheduler")
+        with self._lock:
+            self._is_stopped = True
+            timers, self._timers = self._timers, {}
+
+        for _, timer in timers.values():
+            timer.cancel()
+
+    def schedule(self, chat_id: int, delay: float):
+        """
+        Sets (or replaces) the next-send deadline of the provided chat id.
+        :param delay: seconds from now
+        """
+        with self._lock:
+            previous_entry = self._timers.get(chat_id)
+            if previous_entry:
+                previous_entry[1].cancel()
+
+            token = next(self._counter)
+            self._timers[chat_id] = (token, self.timer_service.call_later(delay, self._fire, chat_id, token))
+
+    def cancel(self, chat_id: int):
+        with self._lock:
+            entry = self._timers.pop(chat_id, None)
+        if entry:
+            # the timer stays in the heap of the timer service and is skipped once it's popped
+            entry[1].cancel()
+
+    def is_scheduled(self, chat_id: int) -> bool:
+        return chat_id in self._timers
+
+    def _fire(self, chat_id: int, token: int):
+        with self._lock:
+            entry = self._timers.get(chat_id)
+            if entry is None or entry[0] != token or self._is_stopped:
+                return
+
+            timer = self._timers.pop(chat_id)[1]
+            self.last_lag = time.monotonic() - timer.deadline
+            self.max_lag = max(self.max_lag, self.last_lag)
+            self.dispatched += 1
+
+        try:
+            self.callback(chat_id)
+        except Exception as e:
+            logger.error(f"The scheduled word sending of chat id '{chat_id}' failed. Error - {e}")
+            with self._lock:
+                self.failed += 1
+
+    def metrics(self) -> dict:
+        with self._lock:
+            return {
+                'scheduled_users': len(self._timers),
+                'dispatched': self.dispatched,
+                'failed': self.failed,
+                'last_lag': self.last_lag,
+                'max_lag': self.max_lag
+            }
@@ -1,6 +1,9 @@
+import sys
+import copy
 import logging
 import os.path
 import platform
+import threading
 from pathlib import Path
 from logging.config import dictConfig
 
@@ -9,6 +12,9 @@ from wrappers.config_wrapper import ConfigWrapper
 
 os_system = platform.system()
 
+_logging_configured = False
+_logging_lock = threading.Lock()
+
 
 def disable_debug_mode_blocklist():
     logger_blocklist = [
@@ -25,17 +31,34 @@ def disable_debug_mode_blocklist():
         logging.getLogger(module).setLevel(logging.CRITICAL)
 
 
-def get_logger(logger_name):
-    logging_config = ConfigWrapper().get_config_file("logging")
+def configure_logging():
+    """
+    Configures the logging handlers once per process.
+    The log files are named after the main script (e.g. 'runner-info.log').
+    """
+    global _logging_configured
+
+    with _logging_lock:
+        if _logging_configured:
+            return
+
+        logging_config = copy.deepcopy(ConfigWrapper().get_config_file("logging"))
 
-    logs_directory = os.path.join(ROOT_PROJECT_DIR, 'logs')
-    if not logs_directory:
-        os.mkdir(logs_directory)
+        logs_directory = os.path.join(ROOT_PROJECT_DIR, 'logs')
+        os.makedirs(logs_directory, exist_ok=True)
 
-    [keys.update({'filename': fr'{logs_directory}/{Path(logger_name).stem}-{handler.split("_")[0]}.log'})
-     for handler, keys in logging_config['handlers'].items() if handler.endswith('handler')]
+        main_file = getattr(sys.modules.get('__main__'), '__file__', None)
+        logs_name = Path(main_file).stem if main_file else 'english_bot'
 
-    disable_debug_mode_blocklist()
+        [keys.update({'filename': fr'{logs_directory}/{logs_name}-{handler.split("_")[0]}.log'})
+         for handler, keys in logging_config['handlers'].items() if handler.endswith('handler')]
 
-    dictConfig(logging_config)
+        disable_debug_mode_blocklist()
+
+        dictConfig(logging_config)
+        _logging_configured = True
+
+
+def get_logger(logger_name):
+    configure_logging()
     return logging.getLogger(logger_name)
@@ -0,0 +1,222 @@
+import os
+import time
+import bisect
+import inspect
+import threading
+from functools import wraps
+from typing import Callable
+
+from helpers.loggers import get_logger
+
+logger = get_logger(__file__)
+
+# the hot paths are instrumented at import time, so with no port the decorators leave them untouched
+METRICS_ENABLED = bool(os.environ.get('METRICS_PORT'))
+METRICS_PREFIX = 'englishbot_'
+
+
+def format_labels(label_names: tuple, label_values: tuple, extra: str = '') -> str:
+    labels = [f'{name}="{value}"' for name, value in zip(label_names, label_values)]
+    if extra:
+        labels.append(extra)
+    return '{' + ','.join(labels) + '}' if labels else ''
+
+
+class Counter:
+    def __init__(self, name: str, documentation: str, label_names: tuple = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = label_names
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount: float = 1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for label_values, value in self._values.items():
+                lines.append(f"{self.name}{format_labels(self.label_names, label_values)} {value}")
+        return lines
+
+
+class Histogram:
+    BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+    def __init__(self, name: str, documentation: str, label_names: tuple = (), buckets: tuple = BUCKETS):
+        """
+        Counts the observations by upper bounds (seconds) - rendered cumulatively, with their sum and count.
+        """
+        self.name = name
+        self.documentation = documentation
+        self.label_names = label_names
+        self.buckets = buckets
+        # label values -> [per bucket counts (the last one is above all the bounds), sum, count]
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values):
+        bucket = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][bucket] += 1
+            series[1] += value
+            series[2] += 1
+
+    def total(self) -> float:
+        """
+        :return: the sum of the observations of all the label values
+        """
+        with self._lock:
+            return sum(total for _, total, _ in self._series.values())
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = [(label_values, list(counts), total, count)
+                      for label_values, (counts, total, count) in self._series.items()]
+
+        for label_values, counts, total, count in series:
+            cumulative_count = 0
+            for bound, bucket_count in zip(list(self.buckets) + ['+Inf'], counts):
+                cumulative_count += bucket_count
+                bucket_labels = format_labels(self.label_names, label_values, f'le="{bound}"')
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative_count}")
+            labels = format_labels(self.label_names, label_values)
+            lines.append(f"{self.name}_sum{labels} {total}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class Gauge:
+    def __init__(self, name: str, documentation: str, function: Callable[[], float]):
+        """
+        A value that is read by the function when the metrics are scraped, so it costs nothing in between.
+        """
+        self.name = name
+        self.documentation = documentation
+        self.function = function
+
+    def render(self) -> list:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} gauge",
+                f"{self.name} {float(self.function())}"]
+
+
+class ServiceCollector:
+    def __init__(self, service_name: str, metrics_function: Callable[[], dict]):
+        """
+        Exposes the numeric values of the metrics() dict of a service (e.g. the chat dispatcher) as gauges.
+        """
+        self.service_name = service_name
+        self.metrics_function = metrics_function
+
+    def render(self) -> list:
+        lines = []
+        for key, value in self.metrics_function().items():
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                name = f"{METRICS_PREFIX}{self.service_name}_{key}"
+                lines += [f"# TYPE {name} gauge", f"{name} {float(value)}"]
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def register(self, key: str, metric):
+        """
+        :return: the metric that is already registered by the key, or the provided one
+        """
+        with self._lock:
+            return self._metrics.setdefault(key, metric)
+
+    def render(self) -> str:
+        """
+        :return: the metrics in the Prometheus text exposition format
+        """
+        with self._lock:
+            metrics = list(self._metrics.values())
+
+        lines = []
+        for metric in metrics:
+            try:
+                lines += metric.render()
+            except Exception as e:
+                logger.warning(f"Couldn't render the metric '{getattr(metric, 'name', metric)}'. Error - {e}")
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
+
+
+def timed(name: str, documentation: str, enabled: bool = None):
+    """
+    Decorator that observes the duration of every call (regular or coroutine function) in the
+    '<prefix><name>_duration_seconds' histogram, labeled by its status - 'ok' or 'error' when it raised.
+    The count of the histogram is the number of calls. The function is returned as is when the metrics are disabled.
+    The histogram is registered on the first call, so when call sites share a name (e.g. the threaded and the async
+    send_message, of which a process runs one) it's described by the one that runs.
+    """
+    if not (METRICS_ENABLED if enabled is None else enabled):
+        return lambda func: func
+
+    histograms = []
+
+    def observe(duration: float, status: str):
+        if not histograms:
+            histograms.append(registry.register(name, Histogram(f"{METRICS_PREFIX}{name}_duration_seconds",
+                                                                documentation, label_names=('status',))))
+        histograms[0].observe(duration, status)
+
+    def decorator(func):
+        if inspect.iscoroutinefunction(func):
+            @wraps(func)
+            async def async_inner_func(*args, **kwargs):
+                started_at = time.perf_counter()
+                status = 'error'
+                try:
+                    result = await func(*args, **kwargs)
+                    status = 'ok'
+                    return result
+                finally:
+                    observe(time.perf_counter() - started_at, status)
+
+            return async_inner_func
+
+        @wraps(func)
+        def inner_func(*args, **kwargs):
+            started_at = time.perf_counter()
+            status = 'error'
+            try:
+                result = func(*args, **kwargs)
+                status = 'ok'
+                return result
+            finally:
+                observe(time.perf_counter() - started_at, status)
+
+        return inner_func
+
+    return decorator
+
+
+def register_gauge(name: str, documentation: str, function: Callable[[], float]):
+    if METRICS_ENABLED:
+        registry.register(name, Gauge(f"{METRICS_PREFIX}{name}", documentation, function))
+
+
+def register_service(service_name: str, metrics_function: Callable[[], dict]):
+    if METRICS_ENABLED:
+        registry.register(f"service:{service_name}", ServiceCollector(service_name, metrics_function))
+
+
+def register_histogram(name: str, histogram: Histogram):
+    """
+    Exports a histogram that is observed by a service itself (e.g. the latencies of the translation requests).
+    """
+    if METRICS_ENABLED:
+        registry.register(name, histogram)
@@ -1,10 +1,60 @@
 import string
+import threading
+from types import MappingProxyType
+from typing import Mapping
 
 from wrappers.config_wrapper import ConfigWrapper
 
+DEFAULT_LANGUAGE = 'he'
 
-def load_dictionary(lang: str):
-    return ConfigWrapper('lang').get_config_file(lang)
+_formatter = string.Formatter()
+_dictionaries = None
+_dictionaries_lock = threading.Lock()
+
+
+class PreparedTemplate(str):
+    """
+    A dictionary string with placeholders (e.g. "{chosen_en_word}") that is parsed once, when the
+    dictionaries are loaded - a broken template fails the startup instead of a user's request.
+    Formatting stays on the builtin str.format, which is faster than joining the parsed parts in Python.
+    """
+    __slots__ = ()
+
+    def __new__(cls, template: str):
+        # raises ValueError on unbalanced braces
+        list(_formatter.parse(template))
+        return super().__new__(cls, template)
+
+
+def _prepare_value(value):
+    if isinstance(value, dict):
+        return MappingProxyType({key: _prepare_value(inner_value) for key, inner_value in value.items()})
+
+    if isinstance(value, str) and '{' in value:
+        return PreparedTemplate(value)
+
+    return value
+
+
+def load_all_dictionaries() -> Mapping[str, Mapping]:
+    """
+    Loads all the dictionaries of the 'lang' folder once per process.
+    The dictionaries are read-only and their strings with placeholders are prepared templates.
+    :return: read-only mapping of language -> dictionary
+    """
+    global _dictionaries
+
+    with _dictionaries_lock:
+        if _dictionaries is None:
+            lang_config = ConfigWrapper('lang')
+            _dictionaries = MappingProxyType({lang: _prepare_value(lang_config.get_config_file(lang))
+                                              for lang in sorted(lang_config.files_by_name)})
+
+    return _dictionaries
+
+
+def load_dictionary(lang: str) -> Mapping:
+    return load_all_dictionaries()[lang]
 
 
 def is_english(text):
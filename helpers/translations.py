@@ -1,27 +1,90 @@
 import re
-from googletrans import Translator
+import os
+from concurrent.futures import ThreadPoolExecutor
+
 from retry import retry
 
 from helpers.loggers import get_logger
+from helpers.metrics import timed
+from configurations.project_config import ROOT_PROJECT_DIR
+from wrappers.translator_wrapper import TranslatorWrapper
+from wrappers.translation_cache_wrapper import TranslationCacheWrapper
 
 logger = get_logger(__file__)
 
+translation_cache = TranslationCacheWrapper(
+    db_path=os.environ.get('TRANSLATION_CACHE_PATH', os.path.join(ROOT_PROJECT_DIR, 'cache', 'translations.sqlite3')))
+
+# caps the concurrent translation requests of all the bulk imports together
+translation_executor = ThreadPoolExecutor(max_workers=int(os.environ.get('TRANSLATION_WORKERS', 8)),
+                                          thread_name_prefix='translator')
+
+# a single translator for the whole bot - its HTTP connections are kept alive between the translations
+translator = TranslatorWrapper(timeout=float(os.environ.get('TRANSLATION_TIMEOUT', 5)),
+                               max_clients=int(os.environ.get('TRANSLATION_WORKERS', 8)),
+                               failure_threshold=int(os.environ.get('TRANSLATION_FAILURE_THRESHOLD', 5)),
+                               reset_timeout=float(os.environ.get('TRANSLATION_RESET_TIMEOUT', 30)))
+
 
-@retry(exceptions=(TypeError, AttributeError), tries=5, delay=3, jitter=2)
+@retry(exceptions=(TypeError, AttributeError), tries=2, delay=1)
 def translate_it(text: str, lang_from: str, lang_to: str):
-    translator = Translator()
-    trans_obj = translator.translate(text=text,
-                                     src=lang_from,
-                                     dest=lang_to)
+    trans_obj = translator.translate(text, src=lang_from, dest=lang_to)
 
     return trans_obj.text if trans_obj and hasattr(trans_obj, 'text') else None
 
 
+@timed('get_translations', 'Getting the translations of a word, from the cache or the translation service')
+def get_translations(word, src: str = 'en', dest: str = 'he'):
+    """
+    Returns the translations of the provided word, served from the translations cache when possible.
+    A word without a translation is cached as well, only errors are not.
+    """
+    found, translations = translation_cache.get(word, src, dest)
+    if found:
+        logger.debug(f"Translations cache hit for '{word}' ({src}->{dest})")
+        return translations
+
+    return fetch_and_cache_translations(word, src, dest)
+
+
+def fetch_and_cache_translations(word, src: str = 'en', dest: str = 'he'):
+    translations = fetch_translations(word, src, dest)
+    translation_cache.set(word, src, dest, translations)
+
+    return translations
+
+
+def get_translations_in_bulk(words: list, src: str = 'en', dest: str = 'he') -> dict:
+    """
+    Returns the translations of all the provided words.
+    The cached words are served right away, the rest are translated concurrently on the translation executor.
+    :return: dict of word -> translations (None for a word without a translation). A word whose translation
+    failed is missing.
+    """
+    translations = {}
+    missing_words = []
+    for word in dict.fromkeys(words):
+        found, cached_translations = translation_cache.get(word, src, dest)
+        if found:
+            translations[word] = cached_translations
+        else:
+            missing_words.append(word)
+
+    logger.debug(f"Translating {len(missing_words)} words, {len(translations)} words were cached")
+    futures = {word: translation_executor.submit(fetch_and_cache_translations, word, src, dest)
+               for word in missing_words}
+    for word, future in futures.items():
+        try:
+            translations[word] = future.result()
+        except Exception as e:
+            logger.error(f"Couldn't get translation by the following english word: {word}. Error: {e}")
+
+    return translations
+
+
 # @retry(exceptions=Exception, tries=3, delay=3, jitter=2)
-def get_translations(word):
-    translator = Translator()
-    translator.raise_Exception = True
-    trans_obj = translator.translate(word, src='en', dest='he')
+def fetch_translations(word, src: str = 'en', dest: str = 'he'):
+    trans_obj = translator.translate(word, src=src, dest=dest)
 
     all_translations = trans_obj.extra_data.get('all-translations')
     if not all_translations:
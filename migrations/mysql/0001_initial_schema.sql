@@ -0,0 +1,22 @@
+-- The schema of the bot, as it was before the migrations were versioned.
+-- A database that already has the users table is marked as migrated to this version without running it,
+-- so this file is never changed - every later schema change is a migration of its own.
+CREATE TABLE users (
+    chat_id BIGINT NOT NULL PRIMARY KEY,
+    auto_send_active VARCHAR(5) NOT NULL DEFAULT 'False',
+    delay_time INT NOT NULL DEFAULT 20
+) DEFAULT CHARSET=utf8mb4;
+
+CREATE TABLE translations (
+    chat_id BIGINT NOT NULL,
+    en_word VARCHAR(255) NOT NULL,
+    translated_word VARCHAR(255) NOT NULL
+) DEFAULT CHARSET=utf8mb4;
+
+CREATE TABLE usages (
+    chat_id BIGINT NOT NULL,
+    en_word VARCHAR(255) NOT NULL,
+    usages INT UNSIGNED NOT NULL DEFAULT 0
+) DEFAULT CHARSET=utf8mb4;
+
+CREATE VIEW users_extended AS SELECT chat_id, auto_send_active, delay_time FROM users;
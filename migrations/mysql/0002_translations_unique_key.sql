@@ -0,0 +1,14 @@
+-- The duplicated translations are dropped, and a unique key prevents new ones. Its prefixes also serve the
+-- hot queries - the words of a chat (chat_id) and the deletion of a word (chat_id, en_word).
+-- The table is rebuilt instead of altered, since the duplicates would fail adding the key in place.
+CREATE TABLE translations_deduplicated LIKE translations;
+
+ALTER TABLE translations_deduplicated
+    ADD UNIQUE KEY translations_chat_word_translation (chat_id, en_word, translated_word);
+
+INSERT INTO translations_deduplicated (chat_id, en_word, translated_word)
+    SELECT DISTINCT chat_id, en_word, translated_word FROM translations;
+
+RENAME TABLE translations TO translations_with_duplicates, translations_deduplicated TO translations;
+
+DROP TABLE translations_with_duplicates;
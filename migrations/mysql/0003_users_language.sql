@@ -0,0 +1,4 @@
+-- The language of the user's menus and dictionaries, NULL is the default language.
+ALTER TABLE users ADD COLUMN language VARCHAR(8);
+
+CREATE OR REPLACE VIEW users_extended AS SELECT chat_id, auto_send_active, delay_time, language FROM users;
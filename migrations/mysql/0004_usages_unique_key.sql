@@ -0,0 +1,13 @@
+-- The usages of a word are upserted by the write-behind buffer, which requires a unique key on (chat_id, en_word).
+-- The duplicated rows are merged into the highest count (every row holds the whole count of its word, not an
+-- increment). The table is rebuilt instead of altered, since the duplicates would fail adding the key in place.
+CREATE TABLE usages_deduplicated LIKE usages;
+
+ALTER TABLE usages_deduplicated ADD UNIQUE KEY usages_chat_word (chat_id, en_word);
+
+INSERT INTO usages_deduplicated (chat_id, en_word, usages)
+    SELECT chat_id, en_word, MAX(usages) FROM usages GROUP BY chat_id, en_word;
+
+RENAME TABLE usages TO usages_with_duplicates, usages_deduplicated TO usages;
+
+DROP TABLE usages_with_duplicates;
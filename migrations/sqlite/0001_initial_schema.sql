@@ -0,0 +1,23 @@
+-- The schema of the embedded database, as it was before the migrations were versioned.
+-- This file is never changed - every later schema change is a migration of its own.
+CREATE TABLE IF NOT EXISTS users (
+    chat_id INTEGER PRIMARY KEY,
+    auto_send_active TEXT NOT NULL DEFAULT 'False',
+    delay_time INTEGER NOT NULL DEFAULT 20
+);
+
+CREATE TABLE IF NOT EXISTS translations (
+    chat_id INTEGER NOT NULL,
+    en_word TEXT NOT NULL,
+    translated_word TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS usages (
+    chat_id INTEGER NOT NULL,
+    en_word TEXT NOT NULL,
+    usages INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE INDEX IF NOT EXISTS translations_chat_id ON translations (chat_id);
+
+CREATE VIEW IF NOT EXISTS users_extended AS SELECT chat_id, auto_send_active, delay_time FROM users;
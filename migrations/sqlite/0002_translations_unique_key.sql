@@ -0,0 +1,10 @@
+-- The duplicated translations are dropped, and a unique index prevents new ones. Its prefixes also serve the
+-- hot queries - the words of a chat (chat_id) and the deletion of a word (chat_id, en_word) - so it replaces
+-- the chat_id index.
+DELETE FROM translations WHERE rowid NOT IN (
+    SELECT MIN(rowid) FROM translations GROUP BY chat_id, en_word, translated_word
+);
+
+CREATE UNIQUE INDEX translations_chat_word_translation ON translations (chat_id, en_word, translated_word);
+
+DROP INDEX translations_chat_id;
@@ -0,0 +1,7 @@
+-- The language of the user's menus and dictionaries, NULL is the default language.
+-- SQLite can't replace a view in place, so it's dropped and created with the new column.
+ALTER TABLE users ADD COLUMN language TEXT;
+
+DROP VIEW IF EXISTS users_extended;
+
+CREATE VIEW users_extended AS SELECT chat_id, auto_send_active, delay_time, language FROM users;
@@ -0,0 +1,8 @@
+-- The usages of a word are upserted by the write-behind buffer, which requires a unique index on
+-- (chat_id, en_word). The duplicated rows are dropped, keeping the highest count of every word (every row holds
+-- the whole count of its word, not an increment).
+DELETE FROM usages WHERE rowid NOT IN (
+    SELECT rowid FROM (SELECT rowid, MAX(usages) FROM usages GROUP BY chat_id, en_word)
+);
+
+CREATE UNIQUE INDEX usages_chat_word ON usages (chat_id, en_word);
@@ -1,36 +1,214 @@
 import os
 import sys
+import asyncio
+import argparse
+import threading
 
+from helpers import metrics
 from helpers.loggers import get_logger
+from configurations.project_config import ROOT_PROJECT_DIR
+from helpers.translations import translation_cache, translator
 
+from core.usages_buffer import UsagesBuffer
 from core.english_bot_user import EnglishBotUser
+from core.word_scheduler import WordScheduler
+from core.chat_dispatcher import ChatDispatcher
+from core.user_registry import UserRegistry
+from core.timer_service import TimerService
+from core.outbound_queue import OutboundQueue
+from core.webhook_server import WebhookServer
+from core.metrics_server import MetricsServer
+from core.sharding import ShardCoordinator, ShardMembership
+from core.async_word_scheduler import AsyncWordScheduler
 from core.english_bot_telebot_extension import EnglishBotTelebotExtension
+from core.async_english_bot_telebot_extension import AsyncEnglishBotTelebotExtension
 
 from wrappers.db_wrapper import DBWrapper
+from wrappers.sqlite_wrapper import SQLiteWrapper
 
 logger = get_logger(__file__)
 
+parser = argparse.ArgumentParser(description='English Telegram bot')
+parser.add_argument('--async-mode', action='store_true',
+                    help='run the bot on AsyncTeleBot, with coroutine handlers and word sends')
+parser.add_argument('--webhook', action='store_true',
+                    help='receive the updates with a local HTTP server instead of polling them')
+parser.add_argument('--shards', type=int,
+                    help='run the bot as this number of worker processes, each one owns a part of the chats')
+parser.add_argument('--shard-id', type=int, help=argparse.SUPPRESS)
+parser.add_argument('--shard-members', help=argparse.SUPPRESS)
+args = parser.parse_args()
+if args.async_mode and args.webhook:
+    parser.error("--webhook isn't supported in --async-mode")
+if args.shards and (args.async_mode or args.webhook):
+    parser.error("--shards isn't supported with --async-mode or --webhook")
+# a shard worker gets its updates from the coordinator, on its local webhook server
+args.webhook = args.webhook or args.shard_id is not None
+
 try:
     TOKEN = os.environ["BOT_TOKEN"]
-    MYSQL_HOST = os.environ["MYSQL_HOST"]
-    MYSQL_USER = os.environ["MYSQL_USER"]
-    MYSQL_PASS = os.environ["MYSQL_PASS"]
+    STORAGE_BACKEND = os.environ.get("STORAGE_BACKEND", "mysql")
+    if STORAGE_BACKEND == "mysql":
+        MYSQL_HOST = os.environ["MYSQL_HOST"]
+        MYSQL_USER = os.environ["MYSQL_USER"]
+        MYSQL_PASS = os.environ["MYSQL_PASS"]
+        MYSQL_POOL_SIZE = int(os.environ.get("MYSQL_POOL_SIZE", 5))
+    SQLITE_PATH = os.environ.get("SQLITE_PATH", os.path.join(ROOT_PROJECT_DIR, 'data', 'english_bot.sqlite3'))
+    CHAT_WORKERS = int(os.environ.get("CHAT_WORKERS", 8))
+    CHAT_QUEUE_SIZE = int(os.environ.get("CHAT_QUEUE_SIZE", 1000))
+    OUTBOUND_GLOBAL_RATE = float(os.environ.get("OUTBOUND_GLOBAL_RATE", 30))
+    OUTBOUND_CHAT_RATE = float(os.environ.get("OUTBOUND_CHAT_RATE", 1))
+    USAGES_FLUSH_INTERVAL = float(os.environ.get("USAGES_FLUSH_INTERVAL", 60))
+    MAX_RESIDENT_USERS = int(os.environ.get("MAX_RESIDENT_USERS", 10000))
+    USER_IDLE_TIMEOUT = float(os.environ.get("USER_IDLE_TIMEOUT", 60 * 60))
+    DEFAULT_LANGUAGE = os.environ.get("DEFAULT_LANGUAGE", "he")
+    WEBHOOK_HOST = os.environ.get("WEBHOOK_HOST", "0.0.0.0")
+    WEBHOOK_PORT = int(os.environ.get("WEBHOOK_PORT", 8443))
+    WEBHOOK_PATH = os.environ.get("WEBHOOK_PATH", "/webhook")
+    WEBHOOK_URL = os.environ.get("WEBHOOK_URL")
+    WEBHOOK_SECRET = os.environ.get("WEBHOOK_SECRET")
+    # the metrics are collected and served only when a port is set
+    METRICS_HOST = os.environ.get("METRICS_HOST", "127.0.0.1")
+    METRICS_PORT = int(os.environ.get("METRICS_PORT", 0))
 except KeyError:
-    logger.error("Please set the environment variables: MYSQL_USER, MYSQL_PASS, BOT_TOKEN")
+    logger.error("Please set the environment variables: MYSQL_HOST, MYSQL_USER, MYSQL_PASS, BOT_TOKEN")
+    sys.exit(1)
+
+if STORAGE_BACKEND not in ("mysql", "sqlite"):
+    logger.error(f"Unknown STORAGE_BACKEND '{STORAGE_BACKEND}', should be 'mysql' or 'sqlite'")
     sys.exit(1)
 
-bot = EnglishBotTelebotExtension(TOKEN)
-db_connector = DBWrapper(host=MYSQL_HOST, mysql_user=MYSQL_USER, mysql_pass=MYSQL_PASS, database='english_bot')
+
+def create_storage():
+    if STORAGE_BACKEND == "sqlite":
+        # a single node deployment - the shard workers share the file, WAL lets them read while one writes
+        return SQLiteWrapper(path=SQLITE_PATH)
+
+    return DBWrapper(host=MYSQL_HOST, mysql_user=MYSQL_USER, mysql_pass=MYSQL_PASS, database='english_bot',
+                     pool_size=MYSQL_POOL_SIZE)
+
+
+def migrate_storage(storage):
+    if not storage.apply_migrations():
+        logger.error("Couldn't bring the DB schema to the latest version")
+        storage.close()
+        sys.exit(1)
+
+
+if args.shards:
+    # the schema is migrated once, before the workers use it
+    storage = create_storage()
+    migrate_storage(storage)
+    storage.close()
+
+    # the coordinator only polls the updates and routes them, the bot runs in the workers
+    coordinator = ShardCoordinator(
+        worker_command=lambda shard_id, members: [sys.executable, os.path.abspath(__file__),
+                                                  '--shard-id', str(shard_id),
+                                                  '--shard-members', ','.join(map(str, members))],
+        num_of_workers=args.shards, base_port=WEBHOOK_PORT + 1, secret_token=WEBHOOK_SECRET,
+        env={'OUTBOUND_GLOBAL_RATE': str(OUTBOUND_GLOBAL_RATE / args.shards)})
+    metrics_server = None
+    if metrics.METRICS_ENABLED:
+        metrics.register_service('shard_coordinator', coordinator.metrics)
+        metrics_server = MetricsServer(metrics.registry, host=METRICS_HOST, port=METRICS_PORT)
+    try:
+        logger.info(f"Starting bot with {args.shards} shards... Press CTRL+C to quit.")
+        if metrics_server:
+            metrics_server.start()
+        coordinator.start()
+        coordinator.poll_updates(TOKEN)
+    except KeyboardInterrupt:
+        print('Quitting... (CTRL+C pressed)\n Exits...')
+    finally:
+        coordinator.stop()
+        if metrics_server:
+            metrics_server.stop()
+        logger.debug(f"Shard coordinator metrics - {coordinator.metrics()}")
+    sys.exit(0)
+
+shard_membership = None
+if args.shard_id is not None:
+    shard_membership = ShardMembership(args.shard_id, [int(member) for member in args.shard_members.split(',')],
+                                       on_change=EnglishBotUser.rebalance_users)
+
+if args.async_mode:
+    bot = AsyncEnglishBotTelebotExtension(TOKEN, lang=DEFAULT_LANGUAGE)
+    word_scheduler = AsyncWordScheduler(callback=bot.send_scheduled_word)
+    # the users are loaded at startup - loading them on demand would block the event loop on the DB
+    chat_dispatcher = timer_service = outbound_queue = user_registry = None
+else:
+    # the handlers and the word sends of a chat run one at a time on the chat dispatcher workers
+    chat_dispatcher = ChatDispatcher(max_workers=CHAT_WORKERS, max_queue_size=CHAT_QUEUE_SIZE)
+    timer_service = TimerService()
+    outbound_queue = OutboundQueue(global_rate=OUTBOUND_GLOBAL_RATE, chat_rate=OUTBOUND_CHAT_RATE)
+    bot = EnglishBotTelebotExtension(TOKEN, lang=DEFAULT_LANGUAGE, threaded=False, outbound_queue=outbound_queue)
+    # the word deadlines are timers of the timer service, its thread only hands the words to the dispatcher
+    word_scheduler = WordScheduler(callback=EnglishBotUser.dispatch_scheduled_word, timer_service=timer_service)
+    # only the users in use are kept in memory, the rest are loaded on their next message or word
+    user_registry = UserRegistry(max_resident_users=MAX_RESIDENT_USERS, idle_timeout=USER_IDLE_TIMEOUT,
+                                 dispatcher=chat_dispatcher)
+
+db_connector = create_storage()
+if args.shard_id is None:
+    migrate_storage(db_connector)
+usages_buffer = UsagesBuffer(db_connector, flush_interval=USAGES_FLUSH_INTERVAL)
+
+webhook_server = None
+if args.webhook:
+    webhook_server = WebhookServer(bot, chat_dispatcher, host=WEBHOOK_HOST, port=WEBHOOK_PORT, url_path=WEBHOOK_PATH,
+                                   secret_token=WEBHOOK_SECRET, membership=shard_membership)
+
+metrics_server = None
+if metrics.METRICS_ENABLED:
+    # every shard worker serves its own metrics, on the ports after the coordinator's
+    metrics_server = MetricsServer(metrics.registry, host=METRICS_HOST,
+                                   port=METRICS_PORT if args.shard_id is None else METRICS_PORT + 1 + args.shard_id)
+    metrics.register_gauge('active_users', 'Users in memory', lambda: len(EnglishBotUser.active_users))
+    metrics.register_gauge('active_word_senders', 'Users whose words are sent automatically',
+                           lambda: word_scheduler.metrics()['scheduled_users'])
+    metrics.register_gauge('threads', 'Threads alive', threading.active_count)
+    metrics.register_service('db_pool', db_connector.pool_metrics)
+    services = {'word_scheduler': word_scheduler, 'usages_buffer': usages_buffer, 'translator': translator,
+                'translation_cache': translation_cache, 'chat_dispatcher': chat_dispatcher,
+                'timer_service': timer_service, 'outbound_queue': outbound_queue, 'user_registry': user_registry,
+                'webhook': webhook_server}
+    for service_name, service in services.items():
+        if service is not None:
+            metrics.register_service(service_name, service.metrics)
+    metrics.register_histogram('translation_request', translator.latencies)
+
+
+async def run_async_bot():
+    try:
+        await bot.infinity_polling()
+    finally:
+        await bot.close()
 
 
 if __name__ == '__main__':
     try:
-        logger.info('Starting bot... Press CTRL+C to quit.')
+        logger.info(f"Starting bot{' (async mode)' if args.async_mode else ''}... Press CTRL+C to quit.")
+        if metrics_server:
+            metrics_server.start()
 
-        EnglishBotUser.load_users_and_global_instances(bot, db_connector)
+        EnglishBotUser.load_users_and_global_instances(bot, db_connector, word_scheduler, usages_buffer,
+                                                       chat_dispatcher, timer_service, user_registry,
+                                                       shard_membership)
+        usages_buffer.start()
 
         bot.init_handlers()
-        bot.infinity_polling()
+        if args.async_mode:
+            asyncio.run(run_async_bot())
+        else:
+            outbound_queue.start()
+            chat_dispatcher.start()
+            timer_service.start()
+            user_registry.start()
+            if args.webhook:
+                bot.run_webhook(webhook_server, webhook_url=WEBHOOK_URL)
+            else:
+                bot.infinity_polling()
     except KeyboardInterrupt:
         print('Quitting... (CTRL+C pressed)\n Exits...')
     except Exception as e:  # Catch-all for unexpected exceptions, with stack trace
@@ -38,6 +216,34 @@ if __name__ == '__main__':
     finally:
         print('Existing...')
 
-        bot.close()
-        db_connector.close_connection()
+        if metrics_server:
+            metrics_server.stop()
+
+        if args.webhook:
+            webhook_server.stop()
+            logger.debug(f"Webhook metrics - {webhook_server.metrics()}")
+        if timer_service:
+            timer_service.stop()
+            logger.debug(f"Timer service metrics - {timer_service.metrics()}")
+        if user_registry is not None:
+            user_registry.stop()
+            logger.debug(f"User registry metrics - {user_registry.metrics()}")
+        if chat_dispatcher:
+            chat_dispatcher.stop(timeout=30)
+            logger.debug(f"Chat dispatcher metrics - {chat_dispatcher.metrics()}")
+        if outbound_queue:
+            outbound_queue.stop()
+            logger.debug(f"Outbound queue metrics - {outbound_queue.metrics()}")
+
+        logger.debug(f"Word scheduler metrics - {word_scheduler.metrics()}")
+        logger.debug(f"Translations cache metrics - {translation_cache.metrics()}")
+        logger.debug(f"Translator metrics - {translator.metrics()}")
+        translation_cache.close()
+
+        if not args.async_mode:
+            bot.close()
+        usages_buffer.stop()
+        logger.debug(f"Usages buffer metrics - {usages_buffer.metrics()}")
+        logger.debug(f"DB pool metrics - {db_connector.pool_metrics()}")
+        db_connector.close()
         sys.exit(0)
@@ -0,0 +1,46 @@
+import unittest
+from unittest import mock
+
+from core.user_registry import UserRegistry
+from core.english_bot_user import EnglishBotUser
+from core.async_word_scheduler import AsyncWordScheduler
+from core.async_english_bot_telebot_extension import AsyncEnglishBotTelebotExtension
+
+
+class AsyncEnglishBotTelebotExtensionCloseTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self._active_users = EnglishBotUser.active_users
+        self._word_scheduler = EnglishBotUser.word_scheduler
+
+        EnglishBotUser.active_users = UserRegistry()
+        EnglishBotUser.word_scheduler = AsyncWordScheduler(callback=mock.AsyncMock())
+
+        self.bot = AsyncEnglishBotTelebotExtension('123:token')
+        self.bot._delete_messages = mock.AsyncMock()
+        self.bot.close_session = mock.AsyncMock()
+
+    def tearDown(self):
+        EnglishBotUser.active_users = self._active_users
+        EnglishBotUser.word_scheduler = self._word_scheduler
+
+    async def test_close_cleans_the_chats_of_the_resident_users(self):
+        users = [EnglishBotUser(chat_id) for chat_id in (1, 2)]
+        for user in users:
+            user.messages.extend([10, 11])
+
+        await self.bot.close()
+
+        self.assertCountEqual([call.args for call in self.bot._delete_messages.await_args_list],
+                              [(1, [10, 11]), (2, [10, 11])])
+        self.assertTrue(all(not user.messages for user in users))
+        self.bot.close_session.assert_awaited_once()
+
+    async def test_close_without_users(self):
+        await self.bot.close()
+
+        self.bot._delete_messages.assert_not_awaited()
+        self.bot.close_session.assert_awaited_once()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,70 @@
+import unittest
+from unittest import mock
+
+from wrappers.db_wrapper import DBWrapper
+
+
+class FakeCursor:
+    """
+    Mimics the connector's prepared cursor, which prepares the statement again when it executes another
+    string object than the last one (it checks 'operation is not self._executed').
+    """
+    def __init__(self):
+        self._executed = None
+        self.prepares = 0
+        self.with_rows = True
+        self.column_names = ('chat_id',)
+
+    def execute(self, operation, params=None):
+        if operation is not self._executed:
+            self.prepares += 1
+            self._executed = operation
+
+    def fetchall(self):
+        return [(1,)]
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self):
+        self.prepared_cursors = []
+
+    def cursor(self, prepared: bool = False, buffered: bool = False):
+        cursor = FakeCursor()
+        if prepared:
+            self.prepared_cursors.append(cursor)
+        return cursor
+
+    def commit(self):
+        pass
+
+
+class DBWrapperPreparedStatementsTest(unittest.TestCase):
+    def setUp(self):
+        self.connection = FakeConnection()
+        self.db = DBWrapper('host', 'user', 'pass', 'database', pool_size=1)
+        mock.patch.object(self.db.pool, '_new_connection', return_value=self.connection).start()
+        self.addCleanup(mock.patch.stopall)
+
+    def test_equal_commands_are_prepared_once(self):
+        table_name = 'translations'
+        first_command = f"SELECT * FROM {table_name} WHERE chat_id = %s"
+        second_command = f"SELECT * FROM {table_name} WHERE chat_id = %s"
+        self.assertIsNot(first_command, second_command)
+
+        self.assertEqual(self.db.execute_command(first_command, (1,)), [{'chat_id': 1}])
+        self.assertEqual(self.db.execute_command(second_command, (2,)), [{'chat_id': 1}])
+
+        self.assertEqual(len(self.connection.prepared_cursors), 1)
+        self.assertEqual(self.connection.prepared_cursors[0].prepares, 1)
+
+    def test_unprepared_commands_keep_no_cursor(self):
+        self.db.execute_command("UPDATE users SET delay_time = %s", (5,), prepare=False)
+
+        self.assertEqual(self.connection.prepared_cursors, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
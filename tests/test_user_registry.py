@@ -0,0 +1,32 @@
+import unittest
+
+from core.user_registry import UserRegistry
+
+
+class FakeUser:
+    def flush_state(self) -> bool:
+        return True
+
+
+class UserRegistryTest(unittest.TestCase):
+    def test_iterates_over_the_resident_chat_ids(self):
+        registry = UserRegistry()
+        registry[1] = FakeUser()
+        registry[2] = FakeUser()
+        registry.add_known_users({3: None}, load_user=lambda chat_id, metadata: None)
+
+        self.assertEqual(list(registry), [1, 2])
+
+    def test_iteration_is_a_snapshot(self):
+        registry = UserRegistry()
+        registry[1] = FakeUser()
+
+        for chat_id in registry:
+            registry.forget(chat_id)
+            registry[chat_id + 1] = FakeUser()
+
+        self.assertEqual(list(registry), [2])
+
+
+if __name__ == '__main__':
+    unittest.main()
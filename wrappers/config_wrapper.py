@@ -3,6 +3,7 @@ import sys
 import yaml
 import logging
 import platform
+import threading
 from pathlib import Path
 
 from configurations.project_config import ROOT_PROJECT_DIR
@@ -11,29 +12,45 @@ from configurations.project_config import ROOT_PROJECT_DIR
 class ConfigWrapper:
     os_system = platform.system()
 
+    # process-wide registry of the parsed files - path -> (modification time, data)
+    _parsed_files = {}
+    _registry_lock = threading.Lock()
+
     def __init__(self, configurations_folder: str = 'configurations'):
         """
-        This class loads all our configurations yaml file and saves them as dictionary so we can use them quickly
+        This class loads our configurations yaml files and saves them as dictionary so we can use them quickly
         without open every time some configuration file.
+        The files are parsed lazily, once per process, and shared by all the instances - a file is parsed again
+        only if it was modified since.
         """
         self.configurations_folder = os.path.join(ROOT_PROJECT_DIR, configurations_folder)
 
         self.file_list = [
             f for f in Path(self.configurations_folder).iterdir() if f.is_file()
         ]
-        self.all_data = self.parse_all_yaml_files()
+        self.files_by_name = {file.stem: file for file in self.file_list}
 
-    def parse_all_yaml_files(self) -> dict:
+    @property
+    def all_data(self) -> dict:
+        return self.parse_all_yaml_files()
+
+    @staticmethod
+    def parse_yaml_file(file: Path):
         """
-        This method parses all the yaml files into a dict.
-        :return: all files data as dict
+        Returns the data of the yaml file from the registry, parses it if it wasn't parsed yet or was modified.
+        :param file: yaml file path
+        :return: the file data
         """
-        all_files_data = {}
+        modification_time = file.stat().st_mtime
+
+        with ConfigWrapper._registry_lock:
+            parsed_file = ConfigWrapper._parsed_files.get(file)
+            if parsed_file and parsed_file[0] == modification_time:
+                return parsed_file[1]
 
-        for file in self.file_list:
             with open(file, 'r', encoding='utf8') as stream:
                 try:
-                    all_files_data[file.stem] = yaml.safe_load(stream)
+                    data = yaml.safe_load(stream)
                 except yaml.YAMLError:
                     logging.exception(
                         f"There was an issue with {file} file. "
@@ -42,12 +59,21 @@ class ConfigWrapper:
                     )
                     sys.exit(1)
 
-        return all_files_data
+            ConfigWrapper._parsed_files[file] = (modification_time, data)
+            return data
+
+    def parse_all_yaml_files(self) -> dict:
+        """
+        This method parses all the yaml files into a dict.
+        :return: all files data as dict
+        """
+        return {file.stem: self.parse_yaml_file(file) for file in self.file_list}
 
     def get_config_file(self, config_file_name: str) -> dict:
         """
         Returns data of the provided config file name.
+        The data is shared by the whole process, so it must not be modified.
         :param config_file_name: configurations yaml file name
         :return: dict
         """
-        return self.all_data[config_file_name]
+        return self.parse_yaml_file(self.files_by_name[config_file_name])
@@ -5,21 +5,201 @@ __author__ = 'Tony Schneider'
 __email__ = 'tonysch05@gmail.com'
 
 import sys
+import time
+import queue
+import threading
 from retry import retry
-from typing import List, Dict
+from typing import List, Iterator
+from contextlib import contextmanager
+from collections import OrderedDict
 from mysql.connector import Error as MySQLError
 from mysql.connector import connect as MySQLConnection
 
 from helpers.loggers import get_logger
+from helpers.metrics import timed
+from wrappers.storage_wrapper import StorageWrapper
 from wrappers.exceptions_wrapper import ExceptionDecorator
 
 logger = get_logger(__file__)
 
 
-class DBWrapper:
-    def __init__(self, host: str, mysql_user: str, mysql_pass: str, database: str):
+class ConnectionPool:
+    def __init__(self, config: dict, pool_size: int = 5, checkout_timeout: float = 10,
+                 health_check_interval: float = 30, max_prepared_statements: int = 32):
         """
-        This class wraps all MySQL functionality.
+        Thread-safe pool of persistent MySQL connections.
+        Connections are created lazily up to 'pool_size', and a connection that was idle for more than
+        'health_check_interval' seconds is pinged (and reconnected if it went stale) before it's handed out.
+        :param config: mysql connector configuration
+        :param pool_size: maximum number of open connections
+        :param checkout_timeout: seconds to wait for a free connection before giving up
+        :param health_check_interval: idle seconds after which a connection is pinged on checkout
+        :param max_prepared_statements: maximum number of prepared statements that are kept per connection
+        """
+        self._config = config
+        self.pool_size = pool_size
+        self.checkout_timeout = checkout_timeout
+        self.health_check_interval = health_check_interval
+        self.max_prepared_statements = max_prepared_statements
+
+        self._prepared_cursors = {}
+        self._idle_connections = queue.LifoQueue(maxsize=pool_size)
+        self._lock = threading.Lock()
+        self._created_connections = 0
+        self._active_connections = 0
+
+        self.checkouts = 0
+        self.reconnects = 0
+        self.total_wait_time = 0.0
+        self.max_wait_time = 0.0
+
+    def _new_connection(self):
+        logger.debug(f"Opening a new pooled MySQL connection ({self._created_connections}/{self.pool_size})")
+        return MySQLConnection(**self._config)
+
+    def _ensure_alive(self, connection, last_used: float):
+        if time.monotonic() - last_used < self.health_check_interval:
+            return connection
+
+        try:
+            connection.ping(reconnect=False)
+        except MySQLError:
+            logger.warning("Pooled MySQL connection went stale, reconnecting...")
+            self.reconnects += 1
+            # the prepared statements belonged to the server session that went stale
+            self._prepared_cursors.pop(id(connection), None)
+            connection.reconnect(attempts=3, delay=1)
+
+        return connection
+
+    def checkout(self):
+        started_at = time.monotonic()
+
+        try:
+            connection, last_used = self._idle_connections.get_nowait()
+        except queue.Empty:
+            connection = None
+            with self._lock:
+                can_create = self._created_connections < self.pool_size
+                if can_create:
+                    self._created_connections += 1
+
+            if can_create:
+                try:
+                    connection = self._new_connection()
+                except MySQLError:
+                    with self._lock:
+                        self._created_connections -= 1
+                    raise
+                last_used = time.monotonic()
+            else:
+                try:
+                    connection, last_used = self._idle_connections.get(timeout=self.checkout_timeout)
+                except queue.Empty:
+                    raise TimeoutError(f"No free MySQL connection after {self.checkout_timeout} seconds")
+
+        try:
+            connection = self._ensure_alive(connection, last_used)
+        except MySQLError:
+            self._discard(connection)
+            raise
+
+        waited = time.monotonic() - started_at
+        with self._lock:
+            self._active_connections += 1
+            self.checkouts += 1
+            self.total_wait_time += waited
+            self.max_wait_time = max(self.max_wait_time, waited)
+
+        return connection
+
+    def release(self, connection, broken: bool = False) -> None:
+        with self._lock:
+            self._active_connections -= 1
+
+        if broken:
+            self._discard(connection)
+            return
+
+        self._idle_connections.put_nowait((connection, time.monotonic()))
+
+    def get_prepared_cursor(self, connection, command: str) -> tuple:
+        """
+        Returns a prepared statement cursor of the command on the provided connection.
+        The cursors are kept per connection (least recently used ones are closed), so a command is parsed
+        by the server once per connection instead of on every execution. The commands whose text varies with the
+        number of their values (multi-row VALUES lists) aren't prepared, so they don't evict the reused ones.
+        :return: tuple of (command, cursor) - the cursor must execute the returned command object, since the
+        connector prepares the statement again whenever it gets another string object, even an equal one
+        """
+        connection_cursors = self._prepared_cursors.setdefault(id(connection), OrderedDict())
+
+        prepared_statement = connection_cursors.get(command)
+        if prepared_statement:
+            connection_cursors.move_to_end(command)
+            return prepared_statement
+
+        prepared_statement = connection_cursors[command] = (command, connection.cursor(prepared=True))
+        if len(connection_cursors) > self.max_prepared_statements:
+            _, (_, evicted_cursor) = connection_cursors.popitem(last=False)
+            evicted_cursor.close()
+
+        return prepared_statement
+
+    def _discard(self, connection) -> None:
+        with self._lock:
+            self._created_connections -= 1
+            self._prepared_cursors.pop(id(connection), None)
+
+        try:
+            connection.close()
+        except MySQLError:
+            pass
+
+    @contextmanager
+    def connection(self):
+        connection = self.checkout()
+        broken = False
+        try:
+            yield connection
+        except (MySQLError, OSError):
+            broken = not connection.is_connected()
+            raise
+        finally:
+            self.release(connection, broken=broken)
+
+    def metrics(self) -> dict:
+        with self._lock:
+            return {
+                'pool_size': self.pool_size,
+                'open_connections': self._created_connections,
+                'active_connections': self._active_connections,
+                'idle_connections': self._idle_connections.qsize(),
+                'checkouts': self.checkouts,
+                'reconnects': self.reconnects,
+                'avg_checkout_wait_time': self.total_wait_time / self.checkouts if self.checkouts else 0.0,
+                'max_checkout_wait_time': self.max_wait_time
+            }
+
+    def close(self) -> None:
+        while True:
+            try:
+                connection, _ = self._idle_connections.get_nowait()
+            except queue.Empty:
+                break
+            self._discard(connection)
+
+
+class DBWrapper(StorageWrapper):
+    MIGRATIONS_DIRECTORY = 'mysql'
+
+    def __init__(self, host: str, mysql_user: str, mysql_pass: str, database: str, pool_size: int = None,
+                 health_check_interval: float = 30):
+        """
+        The MySQL storage backend.
+        :param pool_size: when provided, the commands are executed over a pool of persistent connections
+        instead of opening a new connection per command.
+        :param health_check_interval: idle seconds after which a pooled connection is pinged before reuse
         """
         self.host = host
         self.database = database
@@ -27,7 +207,8 @@ class DBWrapper:
         self.mysql_pass = mysql_pass
         self._config = self.set_config()
         self.mysql_connector = None
-        self.mysql_cursor = None
+        self.pool = ConnectionPool(self._config, pool_size=pool_size,
+                                   health_check_interval=health_check_interval) if pool_size else None
 
     def set_config(self) -> dict:
         return {
@@ -51,95 +232,98 @@ class DBWrapper:
     def close_connection(self) -> None:
         self.mysql_connector.close()
 
-    @ExceptionDecorator(exceptions=[Exception])
-    @retry(exceptions=Exception, tries=3, delay=2)
-    def execute_command(self, command: str):
-        output = True
-        self.create_connection()
-        logger.debug(f"MySQL: executes '{command}' command")
+    def close(self) -> None:
+        if self.pool:
+            self.pool.close()
+        elif self.mysql_connector:
+            self.close_connection()
 
-        self.mysql_cursor = self.mysql_connector.cursor(buffered=True, dictionary=True)
-        self.mysql_cursor.execute(command)
-        if 'SELECT' in command:
-            output = self.mysql_cursor.fetchall()
-        self.mysql_connector.commit()
-        self.close_connection()
-        return output
+    def pool_metrics(self) -> dict:
+        return self.pool.metrics() if self.pool else {}
 
-    def insert_row(self, table_name: str, keys_values: dict):
-        fields = ",".join(keys_values.keys())
-        values = ','.join([f'"{value}"' for value in keys_values.values()])
-        add_row_command = f"INSERT INTO {table_name} ({fields}) VALUES({values})"
-
-        return self.execute_command(add_row_command)
-
-    def insert_multiple_rows(self, table_name: str, keys_values: List[Dict]):
-        fields = ",".join(keys_values[0].keys())
-        values = []
-        for row in keys_values:
-            values.append('(' + ','.join([f'"{value}"' for value in row.values()]) + ')')
-
-        add_rows_command = f"INSERT INTO {table_name} ({fields}) VALUES {','.join(values)}"
-
-        return self.execute_command(add_rows_command)
-
-    def update_field(self, table_name: str, field: str, value, condition_field: str, condition_value):
-        update_field_command = f"UPDATE {table_name} SET {field} = '{value}' WHERE {condition_field}='{condition_value}'"
-
-        return self.execute_command(update_field_command)
-
-    def increment_field(self, table_name: str, field: str, condition_field: str, condition_value):
-        update_field_command = f"UPDATE {table_name} SET {field} = {field} + 1 WHERE {condition_field}='{condition_value}'"
-
-        return self.execute_command(update_field_command)
-
-    def decrement_field(self, table_name: str, field: str, condition_field: str, condition_value):
-        update_field_command = f"UPDATE {table_name} SET {field} = {field} - 1 WHERE {condition_field}='{condition_value}'"
-
-        return self.execute_command(update_field_command)
-
-    def remove_row_if_exists(self, table_name: str, field_condition: str, value_condition):
-        remove_row_command = f"DELETE FROM {table_name} WHERE {field_condition}='{value_condition}'"
-
-        return self.execute_command(remove_row_command)
-
-    def get_all_values_by_field(self, table_name: str, field: str = None, condition_field=None, condition_value=None,
-                                first_item=False, order_by_field: str = None):
-        get_all_values_by_field_command = f"SELECT {field if field else '*'} FROM {table_name}"
-
-        if condition_field:
-            get_all_values_by_field_command += f" WHERE {condition_field}='{condition_value}'"
-
-        if order_by_field:
-            get_all_values_by_field_command += f" ORDER BY {order_by_field}"
-
-        result = self.execute_command(get_all_values_by_field_command)
-
-        if field:
-            result = [item[field] for item in result]
-
-        return (result[0] if first_item else result) if result else False
-
-    def get_specific_field_value(self, table_name: str, field_to_get: str, field_condition: str, value_condition):
-        get_specific_field_value_command = f"SELECT {field_to_get} FROM {table_name} WHERE {field_condition}='{value_condition}'"
-
-        return self.execute_command(get_specific_field_value_command)
+    def _run_command(self, connection, command: str, params=None, many: bool = False, prepare: bool = True):
+        output = True
+        prepared = False
+
+        if many:
+            # executemany batches the rows of an INSERT into a single multi-row statement
+            cursor = connection.cursor()
+            cursor.executemany(command, params)
+        elif self.pool and params and prepare:
+            prepared_command, cursor = self.pool.get_prepared_cursor(connection, command)
+            prepared = True
+            cursor.execute(prepared_command, params)
+        else:
+            cursor = connection.cursor(buffered=True)
+            cursor.execute(command, params)
 
-    def delete_by_field(self, table_name: str, field_condition: str, value_condition, second_field_condition: str=None, second_value_condition=None):
-        delete_row_by_field_command = f"DELETE FROM {table_name} WHERE {field_condition}='{value_condition}'"
+        try:
+            if cursor.with_rows:
+                output = [dict(zip(cursor.column_names, row)) for row in cursor.fetchall()]
+            connection.commit()
+        finally:
+            if not prepared:
+                cursor.close()
 
-        if second_field_condition:
-            delete_row_by_field_command += f"AND {second_field_condition}='{second_value_condition}'"
+        return output
 
-        return self.execute_command(delete_row_by_field_command)
+    @ExceptionDecorator(exceptions=[Exception])
+    @timed('execute_command', 'Executing a DB command on MySQL, including its retries on errors (up to 3 tries)')
+    @retry(exceptions=Exception, tries=3, delay=2)
+    def execute_command(self, command: str, params=None, many: bool = False, prepare: bool = True):
+        """
+        Executes the command with its values bound as parameters.
+        :param params: tuple of values for the command placeholders (list of tuples when 'many' is set)
+        :param many: executes the command once per params tuple in a batch
+        :param prepare: keep the command as a prepared statement of the pooled connection (see get_prepared_cursor)
+        """
+        logger.debug(f"MySQL: executes '{command}' command")
 
-    def update_multiple_rows(self, table_name: str, keys_values: dict):
-        update_multiple_rows_command = f"UPDATE {table_name} SET usages = CASE en_word"
+        if self.pool:
+            with self.pool.connection() as connection:
+                return self._run_command(connection, command, params, many, prepare)
 
-        for en_word, usages in keys_values.items():
-            update_multiple_rows_command += f" WHEN {en_word} THEN {usages}"
+        self.create_connection()
+        try:
+            return self._run_command(self.mysql_connector, command, params, many, prepare)
+        finally:
+            self.close_connection()
 
-        keys = "'" + "', '".join(keys_values.keys()) + "'"
-        update_multiple_rows_command += f" ELSE usages END WHERE en_word IN({keys});"
+    def stream_command(self, command: str, params=None, batch_size: int = 1000, as_tuples: bool = False) -> Iterator:
+        logger.debug(f"MySQL: streams '{command}' command")
+        connection = self.pool.checkout() if self.pool else MySQLConnection(**self._config)
+        is_exhausted = False
 
-        return self.execute_command(update_multiple_rows_command)
+        try:
+            # unbuffered - the rows stay on the server until they're fetched
+            cursor = connection.cursor()
+            cursor.execute(command, params)
+            column_names = cursor.column_names
+
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+
+                if as_tuples:
+                    yield from rows
+                else:
+                    for row in rows:
+                        yield dict(zip(column_names, row))
+
+            is_exhausted = True
+            cursor.close()
+        finally:
+            if self.pool:
+                # a connection that has unread rows can't run other commands
+                self.pool.release(connection, broken=not is_exhausted)
+            else:
+                connection.close()
+
+    def has_table(self, table_name: str) -> bool:
+        return bool(self.execute_command("SELECT 1 FROM information_schema.tables "
+                                         "WHERE table_schema = DATABASE() AND table_name = %s", (table_name,)))
+
+    def build_upsert_command(self, table_name: str, fields: List[str], values: str, update_fields: List[str]) -> str:
+        updates = ','.join([f"{field} = VALUES({field})" for field in update_fields])
+        return f"INSERT INTO {table_name} ({','.join(fields)}) VALUES {values} ON DUPLICATE KEY UPDATE {updates}"
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+__author__ = 'Tony Schneider'
+__email__ = 'tonysch05@gmail.com'
+
+import os
+import sqlite3
+import threading
+from typing import List, Iterator
+
+from helpers.loggers import get_logger
+from helpers.metrics import timed
+from wrappers.storage_wrapper import StorageWrapper
+from wrappers.exceptions_wrapper import ExceptionDecorator
+
+logger = get_logger(__file__)
+
+
+class SQLiteWrapper(StorageWrapper):
+    PLACEHOLDER = '?'
+    MIGRATIONS_DIRECTORY = 'sqlite'
+
+    def __init__(self, path: str, mmap_size: int = 256 * 2 ** 20, busy_timeout: float = 5):
+        """
+        The embedded SQLite storage backend, for single node deployments - no server and no network round trip
+        per query. The database is in WAL mode (readers don't block the writer) and memory mapped, and every
+        thread has its own connection.
+        :param path: the database file, created if it doesn't exist (the schema by 'apply_migrations')
+        :param mmap_size: bytes of the database file that are memory mapped
+        :param busy_timeout: seconds a write waits for another connection's write to finish
+        """
+        self.path = path
+        self.mmap_size = mmap_size
+        self.busy_timeout = busy_timeout
+
+        self._local = threading.local()
+        self._connections = []
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(self.path, timeout=self.busy_timeout, check_same_thread=False)
+        connection.execute("PRAGMA journal_mode=WAL")
+        # with WAL a commit is durable once the WAL is checkpointed, without an fsync per transaction
+        connection.execute("PRAGMA synchronous=NORMAL")
+        connection.execute(f"PRAGMA mmap_size={int(self.mmap_size)}")
+        return connection
+
+    def _get_connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, 'connection', None)
+        if connection is not None:
+            return connection
+
+        logger.debug(f"Opening a new SQLite connection to '{self.path}' ({threading.current_thread().name})")
+        connection = self._connect()
+        self._local.connection = connection
+        with self._lock:
+            self._connections.append(connection)
+
+        return connection
+
+    def close(self) -> None:
+        with self._lock:
+            connections, self._connections = self._connections, []
+
+        for connection in connections:
+            connection.close()
+        self._local = threading.local()
+
+    @ExceptionDecorator(exceptions=[sqlite3.Error])
+    @timed('execute_command', 'Executing a DB command on the SQLite database file')
+    def execute_command(self, command: str, params=None, many: bool = False, prepare: bool = True):
+        # the statements cache of sqlite3 is managed by the module, so 'prepare' has no effect here
+        logger.debug(f"SQLite: executes '{command}' command")
+        connection = self._get_connection()
+        output = True
+
+        try:
+            if many:
+                cursor = connection.executemany(command, params)
+            else:
+                cursor = connection.execute(command, params or ())
+
+            if cursor.description:
+                column_names = [column[0] for column in cursor.description]
+                output = [dict(zip(column_names, row)) for row in cursor.fetchall()]
+            cursor.close()
+            connection.commit()
+        except sqlite3.Error:
+            connection.rollback()
+            raise
+
+        return output
+
+    def stream_command(self, command: str, params=None, batch_size: int = 1000, as_tuples: bool = False) -> Iterator:
+        logger.debug(f"SQLite: streams '{command}' command")
+        # a connection of its own - the rows are read from a WAL snapshot while the thread's connection writes
+        connection = self._connect()
+
+        try:
+            cursor = connection.execute(command, params or ())
+            column_names = [column[0] for column in cursor.description]
+
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+
+                if as_tuples:
+                    yield from rows
+                else:
+                    for row in rows:
+                        yield dict(zip(column_names, row))
+        finally:
+            connection.close()
+
+    def has_table(self, table_name: str) -> bool:
+        return bool(self.execute_command("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?",
+                                         (table_name,)))
+
+    def build_upsert_command(self, table_name: str, fields: List[str], values: str, update_fields: List[str]) -> str:
+        # unlike MySQL the conflicting unique key is named - it's made of the fields that aren't updated
+        key_fields = [field for field in fields if field not in update_fields]
+        updates = ','.join([f"{field} = excluded.{field}" for field in update_fields])
+        return f"INSERT INTO {table_name} ({','.join(fields)}) VALUES {values} " \
+               f"ON CONFLICT ({','.join(key_fields)}) DO UPDATE SET {updates}"
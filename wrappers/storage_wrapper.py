@@ -0,0 +1,231 @@
+import os
+from abc import ABC, abstractmethod
+from typing import List, Dict, Iterator
+
+from helpers.loggers import get_logger
+from configurations.project_config import ROOT_PROJECT_DIR
+
+logger = get_logger(__file__)
+
+
+class StorageWrapper(ABC):
+    """
+    The storage operations of the bot, built as parameterized SQL over 'execute_command' of the backend.
+    A backend provides the execution, the placeholder of its driver, its upsert syntax and its schema migrations.
+    """
+    PLACEHOLDER = '%s'
+    MIGRATIONS_DIRECTORY = None
+
+    @abstractmethod
+    def execute_command(self, command: str, params=None, many: bool = False, prepare: bool = True):
+        """
+        Executes the command with its values bound as parameters.
+        :param params: tuple of values for the command placeholders (list of tuples when 'many' is set)
+        :param many: executes the command once per params tuple in a batch
+        :param prepare: whether a backend that keeps prepared statements may keep this one - False for a command
+        whose text changes with the number of its values, which would evict the statements that are reused
+        :return: list of row dicts for a query, True for any other command, False on an error
+        """
+
+    @abstractmethod
+    def build_upsert_command(self, table_name: str, fields: List[str], values: str, update_fields: List[str]) -> str:
+        """
+        :param values: the VALUES rows placeholders
+        :return: INSERT command whose rows overwrite the 'update_fields' of existing rows with the same unique key
+        """
+
+    @abstractmethod
+    def stream_command(self, command: str, params=None, batch_size: int = 1000, as_tuples: bool = False) -> Iterator:
+        """
+        Executes the query and yields its rows as they're read, 'batch_size' rows at a time - so a large result
+        is processed with bounded memory instead of being loaded at once. The query holds a connection of its
+        own until the rows are exhausted (or the generator is closed), and errors are raised to the consumer.
+        :param as_tuples: yields tuples in the order of the selected fields instead of dicts
+        """
+
+    @abstractmethod
+    def has_table(self, table_name: str) -> bool:
+        pass
+
+    def close(self) -> None:
+        pass
+
+    def get_migrations(self) -> List[tuple]:
+        """
+        :return: sorted list of (version, name, statements) of the migration files of the backend, which are
+        named '<version>_<name>.sql'
+        """
+        migrations_directory = os.path.join(ROOT_PROJECT_DIR, 'migrations', self.MIGRATIONS_DIRECTORY)
+        migrations = []
+        for file_name in os.listdir(migrations_directory):
+            if not file_name.endswith('.sql'):
+                continue
+
+            version, name = file_name[:-len('.sql')].split('_', 1)
+            with open(os.path.join(migrations_directory, file_name), encoding='utf8') as migration_file:
+                sql = '\n'.join(line for line in migration_file if not line.lstrip().startswith('--'))
+            statements = [statement.strip() for statement in sql.split(';') if statement.strip()]
+            migrations.append((int(version), name, statements))
+
+        return sorted(migrations)
+
+    def apply_migrations(self) -> bool:
+        """
+        Brings the schema to the latest version by running the migrations that weren't applied yet, in order.
+        The applied versions are kept in the 'schema_migrations' table. A database that was created before the
+        migrations were versioned (it has the users table) is marked as migrated to the first version, so the first
+        migration is the legacy schema and never changes - every later change is a migration of its own.
+        """
+        migrations = self.get_migrations()
+
+        if not self.has_table('schema_migrations'):
+            is_existing_database = self.has_table('users')
+            if not self.execute_command("CREATE TABLE schema_migrations (version INT NOT NULL PRIMARY KEY, "
+                                        "name VARCHAR(255) NOT NULL)"):
+                return False
+            if is_existing_database and migrations:
+                first_version, first_name, _ = migrations[0]
+                logger.info(f"Marking the existing database as migrated to version {first_version}")
+                if not self.insert_row(table_name='schema_migrations', keys_values={'version': first_version,
+                                                                                   'name': first_name}):
+                    return False
+
+        applied_migrations = self.execute_command("SELECT version FROM schema_migrations")
+        if applied_migrations is False:
+            return False
+        applied_versions = {migration['version'] for migration in applied_migrations}
+
+        for version, name, statements in migrations:
+            if version in applied_versions:
+                continue
+
+            logger.info(f"Applying schema migration {version} ({name})")
+            for statement in statements:
+                if self.execute_command(statement) is False:
+                    logger.error(f"Schema migration {version} ({name}) failed on - {statement}")
+                    return False
+
+            if not self.insert_row(table_name='schema_migrations', keys_values={'version': version, 'name': name}):
+                return False
+
+        return True
+
+    def pool_metrics(self) -> dict:
+        return {}
+
+    def _placeholders(self, num_of_values: int) -> str:
+        return ','.join([self.PLACEHOLDER] * num_of_values)
+
+    def insert_row(self, table_name: str, keys_values: dict):
+        fields = ",".join(keys_values.keys())
+        add_row_command = f"INSERT INTO {table_name} ({fields}) VALUES({self._placeholders(len(keys_values))})"
+
+        return self.execute_command(add_row_command, tuple(keys_values.values()))
+
+    def insert_multiple_rows(self, table_name: str, keys_values: List[Dict]):
+        fields = ",".join(keys_values[0].keys())
+        add_rows_command = f"INSERT INTO {table_name} ({fields}) VALUES ({self._placeholders(len(keys_values[0]))})"
+
+        return self.execute_command(add_rows_command, [tuple(row.values()) for row in keys_values], many=True)
+
+    def update_field(self, table_name: str, field: str, value, condition_field: str, condition_value):
+        update_field_command = f"UPDATE {table_name} SET {field} = {self.PLACEHOLDER} " \
+                               f"WHERE {condition_field} = {self.PLACEHOLDER}"
+
+        return self.execute_command(update_field_command, (value, condition_value))
+
+    def increment_field(self, table_name: str, field: str, condition_field: str, condition_value):
+        update_field_command = f"UPDATE {table_name} SET {field} = {field} + 1 " \
+                               f"WHERE {condition_field} = {self.PLACEHOLDER}"
+
+        return self.execute_command(update_field_command, (condition_value,))
+
+    def decrement_field(self, table_name: str, field: str, condition_field: str, condition_value):
+        update_field_command = f"UPDATE {table_name} SET {field} = {field} - 1 " \
+                               f"WHERE {condition_field} = {self.PLACEHOLDER}"
+
+        return self.execute_command(update_field_command, (condition_value,))
+
+    def remove_row_if_exists(self, table_name: str, field_condition: str, value_condition):
+        remove_row_command = f"DELETE FROM {table_name} WHERE {field_condition} = {self.PLACEHOLDER}"
+
+        return self.execute_command(remove_row_command, (value_condition,))
+
+    def get_rows_by_field(self, table_name: str, condition_field: str, condition_value):
+        """
+        Unlike 'get_all_values_by_field', an error (False) isn't mixed up with no matching rows ([]).
+        """
+        get_rows_command = f"SELECT * FROM {table_name} WHERE {condition_field} = {self.PLACEHOLDER}"
+
+        return self.execute_command(get_rows_command, (condition_value,))
+
+    def get_all_values_by_field(self, table_name: str, field: str = None, condition_field=None, condition_value=None,
+                                first_item=False, order_by_field: str = None):
+        get_all_values_by_field_command = f"SELECT {field if field else '*'} FROM {table_name}"
+        params = None
+
+        if condition_field:
+            get_all_values_by_field_command += f" WHERE {condition_field} = {self.PLACEHOLDER}"
+            params = (condition_value,)
+
+        if order_by_field:
+            get_all_values_by_field_command += f" ORDER BY {order_by_field}"
+
+        result = self.execute_command(get_all_values_by_field_command, params)
+
+        if field and result:
+            result = [item[field] for item in result]
+
+        return (result[0] if first_item else result) if result else False
+
+    def stream_all_values(self, table_name: str, fields: List[str] = None, order_by_field: str = None,
+                          batch_size: int = 1000, as_tuples: bool = False) -> Iterator:
+        """
+        Streams all the rows of the table (see 'stream_command').
+        :param fields: the fields to select, all of them if not provided
+        """
+        stream_all_values_command = f"SELECT {','.join(fields) if fields else '*'} FROM {table_name}"
+
+        if order_by_field:
+            stream_all_values_command += f" ORDER BY {order_by_field}"
+
+        return self.stream_command(stream_all_values_command, batch_size=batch_size, as_tuples=as_tuples)
+
+    def get_specific_field_value(self, table_name: str, field_to_get: str, field_condition: str, value_condition):
+        get_specific_field_value_command = f"SELECT {field_to_get} FROM {table_name} " \
+                                           f"WHERE {field_condition} = {self.PLACEHOLDER}"
+
+        return self.execute_command(get_specific_field_value_command, (value_condition,))
+
+    def delete_by_field(self, table_name: str, field_condition: str, value_condition, second_field_condition: str=None, second_value_condition=None):
+        delete_row_by_field_command = f"DELETE FROM {table_name} WHERE {field_condition} = {self.PLACEHOLDER}"
+        params = (value_condition,)
+
+        if second_field_condition:
+            delete_row_by_field_command += f" AND {second_field_condition} = {self.PLACEHOLDER}"
+            params += (second_value_condition,)
+
+        return self.execute_command(delete_row_by_field_command, params)
+
+    def update_multiple_rows(self, table_name: str, keys_values: dict):
+        cases = ' '.join([f'WHEN {self.PLACEHOLDER} THEN {self.PLACEHOLDER}'] * len(keys_values))
+        update_multiple_rows_command = f"UPDATE {table_name} SET usages = CASE en_word {cases} ELSE usages END " \
+                                       f"WHERE en_word IN({self._placeholders(len(keys_values))})"
+
+        params = tuple(value for item in keys_values.items() for value in item) + tuple(keys_values.keys())
+
+        return self.execute_command(update_multiple_rows_command, params, prepare=False)
+
+    def upsert_multiple_rows(self, table_name: str, keys_values: List[Dict], update_fields: List[str]):
+        """
+        Inserts all the rows with a single parameterized statement, rows whose unique key already exists
+        get their 'update_fields' overwritten instead.
+        """
+        fields = list(keys_values[0].keys())
+        row_placeholders = '(' + self._placeholders(len(fields)) + ')'
+        upsert_rows_command = self.build_upsert_command(table_name, fields,
+                                                        ','.join([row_placeholders] * len(keys_values)), update_fields)
+
+        params = tuple(value for row in keys_values for value in row.values())
+
+        return self.execute_command(upsert_rows_command, params, prepare=False)
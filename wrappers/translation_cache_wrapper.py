@@ -0,0 +1,134 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Optional, List, Tuple
+
+from helpers.loggers import get_logger
+
+logger = get_logger(__file__)
+
+
+class TranslationCacheWrapper:
+    def __init__(self, db_path: str, max_size: int = 10000, ttl: float = 30 * 24 * 60 * 60,
+                 negative_ttl: float = 24 * 60 * 60):
+        """
+        This class caches translations by (word, src, dest) in an in-memory LRU that is backed by an
+        on-disk SQLite store, so the translations survive restarts and are shared by all the users.
+        A word without a translation is cached as well (negative caching) with its own shorter TTL.
+        :param db_path: path of the SQLite file
+        :param max_size: maximum number of entries that are kept in memory
+        :param ttl: seconds a found translation is valid
+        :param negative_ttl: seconds a "no translation" result is valid
+        """
+        self.db_path = db_path
+        self.max_size = max_size
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._connection = None
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+
+    def _get_connection(self) -> sqlite3.Connection:
+        if not self._connection:
+            os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+            self._connection = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._connection.execute("CREATE TABLE IF NOT EXISTS translations_cache ("
+                                     "word TEXT NOT NULL, src TEXT NOT NULL, dest TEXT NOT NULL, "
+                                     "translations TEXT, stored_at REAL NOT NULL, "
+                                     "PRIMARY KEY (word, src, dest))")
+            self._connection.commit()
+
+        return self._connection
+
+    def _is_expired(self, translations: Optional[list], stored_at: float) -> bool:
+        ttl = self.ttl if translations else self.negative_ttl
+        return time.time() - stored_at > ttl
+
+    def _remember(self, key: tuple, translations: Optional[list], stored_at: float):
+        self._entries[key] = (translations, stored_at)
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def get(self, word: str, src: str, dest: str) -> Tuple[bool, Optional[List[str]]]:
+        """
+        :return: tuple of (found, translations). translations is None for a cached "no translation" result.
+        """
+        key = (word, src, dest)
+
+        with self._lock:
+            from_disk = False
+            entry = self._entries.get(key)
+            if entry:
+                self._entries.move_to_end(key)
+            else:
+                try:
+                    row = self._get_connection().execute(
+                        "SELECT translations, stored_at FROM translations_cache WHERE word=? AND src=? AND dest=?",
+                        key).fetchone()
+                except sqlite3.Error as e:
+                    logger.warning(f"Couldn't read the translations cache. Error - {e}")
+                    row = None
+
+                if row:
+                    entry = (json.loads(row[0]) if row[0] else None, row[1])
+                    self._remember(key, *entry)
+                    from_disk = True
+
+            if not entry or self._is_expired(*entry):
+                self._entries.pop(key, None)
+                self.misses += 1
+                return False, None
+
+            translations, _ = entry
+            self.hits += 1
+            if from_disk:
+                self.disk_hits += 1
+            if not translations:
+                self.negative_hits += 1
+
+            return True, translations
+
+    def set(self, word: str, src: str, dest: str, translations: Optional[List[str]]):
+        key = (word, src, dest)
+        stored_at = time.time()
+
+        with self._lock:
+            self._remember(key, translations, stored_at)
+
+            try:
+                connection = self._get_connection()
+                connection.execute("REPLACE INTO translations_cache (word, src, dest, translations, stored_at) "
+                                   "VALUES (?, ?, ?, ?, ?)",
+                                   (*key, json.dumps(translations, ensure_ascii=False) if translations else None,
+                                    stored_at))
+                connection.commit()
+            except sqlite3.Error as e:
+                logger.warning(f"Couldn't store '{word}' in the translations cache. Error - {e}")
+
+    def metrics(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'hits': self.hits,
+                'disk_hits': self.disk_hits,
+                'negative_hits': self.negative_hits,
+                'misses': self.misses,
+                'hit_ratio': self.hits / lookups if lookups else 0.0
+            }
+
+    def close(self):
+        with self._lock:
+            if self._connection:
+                self._connection.close()
+                self._connection = None
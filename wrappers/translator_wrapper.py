@@ -0,0 +1,170 @@
+import time
+import queue
+import threading
+
+import httpx
+from googletrans import Translator
+
+from helpers.loggers import get_logger
+from helpers.metrics import Histogram, METRICS_PREFIX
+
+logger = get_logger(__file__)
+
+
+class TranslationServiceUnavailable(Exception):
+    pass
+
+
+class TranslatorWrapper:
+    LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+    # the circuit state as a number, so it's exported as a gauge
+    CIRCUIT_STATES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+    def __init__(self, timeout: float = 5, max_clients: int = 8, failure_threshold: int = 5,
+                 reset_timeout: float = 30):
+        """
+        A thread-safe translator that is shared by the whole bot.
+        The googletrans Translator instances (and the keep-alive connections of their HTTP clients) are created
+        once and reused - each one serves a single request at a time, so the pool holds up to 'max_clients'.
+        After 'failure_threshold' failed requests in a row the circuit opens, and for 'reset_timeout' seconds
+        the requests fail right away instead of waiting on a service that is down. Then a single request is let
+        through, and its result closes the circuit or opens it again.
+        :param timeout: seconds of a single translation request
+        :param max_clients: maximum number of translators, i.e. concurrent translation requests
+        :param failure_threshold: failures in a row that open the circuit
+        :param reset_timeout: seconds the circuit stays open
+        """
+        self.timeout = timeout
+        self.max_clients = max_clients
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+
+        self._clients = queue.LifoQueue()
+        self._num_of_clients = 0
+        self._lock = threading.Lock()
+
+        self.state = self.CLOSED
+        self._consecutive_failures = 0
+        self._opened_at = 0.0
+        self._is_probing = False
+
+        self.requests = 0
+        self.failures = 0
+        self.timeouts = 0
+        self.rejected = 0
+        self.max_latency = 0.0
+        self.latencies = Histogram(f"{METRICS_PREFIX}translation_request_duration_seconds",
+                                   'A request to the translation service', label_names=('status',),
+                                   buckets=self.LATENCY_BUCKETS)
+
+    def _acquire_client(self) -> Translator:
+        try:
+            return self._clients.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            is_creatable = self._num_of_clients < self.max_clients
+            if is_creatable:
+                self._num_of_clients += 1
+
+        if is_creatable:
+            logger.debug(f"Creating translator client {self._num_of_clients}/{self.max_clients}")
+            try:
+                return Translator(raise_exception=True, timeout=self.timeout)
+            except Exception:
+                # the client wasn't created, so its place in the pool is freed
+                with self._lock:
+                    self._num_of_clients -= 1
+                raise
+
+        try:
+            return self._clients.get(timeout=self.timeout)
+        except queue.Empty:
+            raise TranslationServiceUnavailable("All the translator clients are busy")
+
+    def _allow_request(self) -> bool:
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+
+            if self.state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+
+            if self.state == self.HALF_OPEN and not self._is_probing:
+                self._is_probing = True
+                return True
+
+            self.rejected += 1
+            return False
+
+    def _record_result(self, latency: float, error: Exception = None):
+        with self._lock:
+            self.requests += 1
+            self.latencies.observe(latency, 'error' if error else 'ok')
+            self.max_latency = max(self.max_latency, latency)
+            self._is_probing = False
+
+            if not error:
+                if self.state != self.CLOSED:
+                    logger.info("The translation service is back, closing the circuit")
+                self.state = self.CLOSED
+                self._consecutive_failures = 0
+                return
+
+            self.failures += 1
+            if isinstance(error, httpx.TimeoutException):
+                self.timeouts += 1
+
+            self._consecutive_failures += 1
+            if self.state == self.HALF_OPEN or self._consecutive_failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    logger.warning(f"The translation service failed {self._consecutive_failures} times in a row, "
+                                   f"opening the circuit for {self.reset_timeout} seconds")
+                self.state = self.OPEN
+                self._opened_at = time.monotonic()
+
+    def translate(self, text: str, src: str = 'en', dest: str = 'he'):
+        """
+        Translates the text with one of the pooled translators.
+        :raise TranslationServiceUnavailable: while the circuit is open
+        """
+        if not self._allow_request():
+            raise TranslationServiceUnavailable(f"The translation service is unavailable, "
+                                                f"skipping the translation of '{text}'")
+
+        try:
+            client = self._acquire_client()
+        except TranslationServiceUnavailable:
+            with self._lock:
+                self._is_probing = False
+            raise
+
+        started_at = time.perf_counter()
+        try:
+            result = client.translate(text, src=src, dest=dest)
+        except Exception as e:
+            self._record_result(time.perf_counter() - started_at, e)
+            raise
+        else:
+            self._record_result(time.perf_counter() - started_at)
+            return result
+        finally:
+            self._clients.put(client)
+
+    def metrics(self) -> dict:
+        with self._lock:
+            return {
+                'state': self.state,
+                'circuit_state': self.CIRCUIT_STATES[self.state],
+                'clients': self._num_of_clients,
+                'requests': self.requests,
+                'failures': self.failures,
+                'timeouts': self.timeouts,
+                'rejected': self.rejected,
+                'avg_latency': self.latencies.total() / self.requests if self.requests else 0.0,
+                'max_latency': self.max_latency
+            }